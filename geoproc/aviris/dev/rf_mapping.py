@@ -3,6 +3,8 @@ import matplotlib.pyplot as plt
 import numpy as np
 from typing import List, Tuple, Union
 from geoproc.data.sampling import get_binned_sampling
+from geoproc.aviris.manager import AvirisDataManager
+from geoproc.util.artifacts import ArtifactStore
 from framework.estimator.base import EstimatorBase
 import os, sys, pickle
 
@@ -37,7 +39,7 @@ if __name__ == '__main__':
     n_bins = 16
     n_samples_per_bin = 250
 
-    save_weights_file = f"{outDir}/aviris.{modelType}-{version}-{n_samples_per_bin}.pkl"
+    save_weights_file = f"{outDir}/aviris.{modelType}-{version}-{n_samples_per_bin}"
 
     print("Reading Data")
     yTrainFile = os.path.join(outDir, f"{aviris_tile}_Avg-Chl_{version}.nc")
@@ -73,11 +75,8 @@ if __name__ == '__main__':
     print(f" ----> TRAIN SCORE: MSE= {mse_train:.2f}")
 
     if plot_image:
-        x_valid_mask = valid_mask.values.reshape([valid_mask.shape[0], 1])
-        image_xdata =  np.where( x_valid_mask, x_data_full.values, 0.0 )
-        result_image = estimator.predict( image_xdata )
-        image_prediction = np.where( x_valid_mask.squeeze(), result_image, np.nan )
-        constructed_image: xa.DataArray = xa.DataArray( image_prediction.reshape(x_data_raw.shape[1:]), dims=['y', 'x'], coords=dict(x=x_data_raw.x, y=x_data_raw.y), name="constructed_image" )
+        mgr = AvirisDataManager( nbands )
+        constructed_image: xa.DataArray = mgr.predict_blocks( estimator, x_data_raw, name="constructed_image", valid_mask=valid_mask.values.reshape( x_data_raw.shape[1:] ) )
         save_image_file = f"{outDir}/aviris-image.{modelType}-{version}-{n_samples_per_bin}.nc"
         print(f"Saving constructed_image to {save_image_file} ")
         constructed_image.to_netcdf( save_image_file )
@@ -96,8 +95,7 @@ if __name__ == '__main__':
         if show_plots: plt.show()
         plt.close( fig )
 
-    filehandler = open(save_weights_file, "wb")
-    pickle.dump(estimator.instance.feature_importances_, filehandler)
+    ArtifactStore.save( save_weights_file, dict( feature_importances=estimator.instance.feature_importances_ ), model_type=modelType, version=version, mse_train=float(mse_train) )
     print(f"Saved {modelType} Estimator to file {save_weights_file}")
 
 
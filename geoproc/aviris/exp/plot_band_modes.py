@@ -26,7 +26,7 @@ nodata_val = int( input_bands.attrs['data_ignore_value'] )
 target_bands = mgr.read(target_file, nodata_val )
 (norm_target_bands, target_scaling) = mgr.normalize( target_bands )
 
-x_data_train, y_data_train = mgr.restructure_for_training( norm_input_bands, norm_target_bands )
+x_data_train, y_data_train = mgr.restructure_for_training( norm_input_bands, norm_target_bands, output_path=os.path.join( outDir, f"{aviris_tile}_training" ) )
 ( x_binned_training, y_binned_training ) = mgr.get_binned_sampling( x_data_train, y_data_train, n_bins, n_samples_per_bin )
 
 regress_components, mse = mgr.regress(x_binned_training, y_binned_training )
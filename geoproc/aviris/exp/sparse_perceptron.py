@@ -15,6 +15,7 @@ fit_params = dict(
     mse_thresh=0.2,
     sparsity=500.0,
     max_iter=500000,
+    solver='fista',
 )
 
 input_file = os.path.join(DATA_DIR, f"{aviris_tile}_rfl_v2p9", f"{aviris_tile}_corr_v2p9_img")
@@ -28,7 +29,7 @@ nodata_val = int(input_bands.attrs['data_ignore_value'])
 target_bands: xa.DataArray = mgr.read(target_file, nodata_val)
 (norm_target_bands, target_scaling) = mgr.normalize(target_bands)
 
-x_data_train, y_data_train = mgr.restructure_for_training(norm_input_bands, norm_target_bands)
+x_data_train, y_data_train = mgr.restructure_for_training( norm_input_bands, norm_target_bands, output_path=os.path.join( outDir, f"{aviris_tile}_training" ) )
 (x_binned_training, y_binned_training) = mgr.get_binned_sampling(x_data_train, y_data_train, n_samples_per_bin=n_samples_per_bin)
 regress_components, mse0, full_estimator = mgr.regress(x_binned_training, y_binned_training)
 
@@ -34,7 +34,7 @@ nodata_val = int( input_bands.attrs['data_ignore_value'] )
 target_bands: xa.DataArray = mgr.read(target_file, nodata_val )
 (norm_target_bands, target_scaling) = mgr.normalize( target_bands )
 
-x_data_train, y_data_train = mgr.restructure_for_training( norm_input_bands, norm_target_bands )
+x_data_train, y_data_train = mgr.restructure_for_training( norm_input_bands, norm_target_bands, output_path=os.path.join( outDir, f"{aviris_tile}_training" ) )
 ( x_binned_training, y_binned_training ) = mgr.get_binned_sampling( x_data_train, y_data_train, n_bins, n_samples_per_bin )
 
 regress_components, mse0, full_estimator = mgr.regress(x_binned_training, y_binned_training )
@@ -52,19 +52,10 @@ if plot_components:
     mgr.plot_components( np.vstack([full_comps,sparse_comps]), [ regress_title, f"Sparse Regression, MSE={mse1:.2f}" ], highlight=selected_bands  )
 
 if plot_images:
-    idims = norm_target_bands.dims[1:]
-    icoords = { idims[i]: norm_input_bands.coords[idims[i]] for i in [0,1] }
-    ishape = norm_input_bands.shape[1:]
     iattrs = dict( transform = input_bands.transform, crs = input_bands.crs )
-
-    image_xdata = norm_input_bands.stack(samples=idims).transpose()
-    predict_input = image_xdata.fillna(0.0)
-
-    sparse_result = sparse_estimator.predict( predict_input.isel( band=selected_bands ).values )
-    full_result = full_estimator.predict( predict_input.values )
-
-    sparse_image: xa.DataArray = post_process( xa.DataArray( sparse_result.reshape(ishape), dims=idims, coords=icoords, name="sparse_regression_image" ), iattrs )
-    full_image: xa.DataArray = post_process( xa.DataArray( full_result.reshape(ishape), dims=idims, coords=icoords, name="full_regression_image" ), iattrs )
+    all_pixels = np.ones( norm_input_bands.shape[1:], dtype=bool )
+    sparse_image: xa.DataArray = post_process( mgr.predict_blocks( sparse_estimator, norm_input_bands.isel( band=selected_bands ), name="sparse_regression_image", nproc=1, valid_mask=all_pixels ), iattrs )
+    full_image: xa.DataArray = post_process( mgr.predict_blocks( full_estimator, norm_input_bands, name="full_regression_image", nproc=1, valid_mask=all_pixels ), iattrs )
 
     fig, ax = plt.subplots(2)
     sparse_image.plot.imshow( ax=ax[1], yincrease=False, cmap="jet", vmin=-3, vmax=3 )
@@ -1,18 +1,28 @@
 import xarray as xa
 import numpy as np
-from typing import List, Union, Tuple, Optional
+from typing import List, Union, Tuple, Optional, Iterator
 from sklearn.linear_model import LinearRegression
-import os, math
+import os, math, json
 
+_estimator, _method = None, None
+
+def _init_estimator( estimator, method: str ):
+    global _estimator, _method
+    _estimator, _method = estimator, method
+
+def _apply_batch( samples: np.ndarray ) -> np.ndarray:
+    result = np.asarray( getattr( _estimator, _method )( samples ), dtype=np.float32 )
+    return result.reshape( samples.shape[0], -1 )
 
 class AvirisDataManager:
 
-    def __init__(self, nbands: int = -1, name = "band_data" ):
+    def __init__(self, nbands: int = -1, name = "band_data", block_size: int = 1024 ):
         self.nbands = nbands
         self.name = name
+        self.block_size = block_size
 
     def get_indices(self, valid_mask: np.ndarray) -> np.ndarray:
-        return np.extract(valid_mask, np.array(range(valid_mask.size)))
+        return np.flatnonzero( valid_mask )
 
     def normalize( self, input_bands: xa.DataArray, uniform = False ) -> Tuple[xa.DataArray,Optional[xa.DataArray]]:
         axes = {} if uniform else dict(dim=['x', 'y'])
@@ -28,47 +38,121 @@ class AvirisDataManager:
         diff = x - y
         return math.sqrt( np.mean( diff * diff ) )
 
-    def read( self, filepath: str, ignore_value = None ) -> xa.DataArray:
-        full_input_bands: xa.DataArray = xa.open_rasterio( filepath )
-        nodata_value = int(full_input_bands.attrs['data_ignore_value']) if ignore_value is None else ignore_value
-        raw_input_bands = full_input_bands[0:self.nbands,:,:]
-        input_bands: xa.DataArray = raw_input_bands.where(raw_input_bands != nodata_value, float('nan') )
+    def read( self, filepath: str, ignore_value = None, **kwargs ) -> xa.DataArray:
+        """ Lazily reads the selected bands and spatial window as a dask-backed float32 array with nodata masked to nan.
+              bands:  band indices ( list or slice, default: the first nbands )
+              window: pixel window ( (y0,y1), (x0,x1) )
+              chunks: dask chunking ( default: all selected bands x block_size x block_size ) """
+        bands = kwargs.get( 'bands', slice( 0, self.nbands ) )
+        window = kwargs.get( 'window', None )
+        chunks = kwargs.get( 'chunks', dict( band=-1, y=self.block_size, x=self.block_size ) )
+        full_input_bands: xa.DataArray = self.open_rasterio( filepath )
+        nodata_value = self.nodata_value( full_input_bands ) if ignore_value is None else ignore_value
+        raw_input_bands = full_input_bands.isel( band=bands )
+        if window is not None:
+            raw_input_bands = raw_input_bands.isel( y=slice(*window[0]), x=slice(*window[1]) )
+        raw_input_bands = raw_input_bands.chunk( chunks ).astype( np.float32 )
+        input_bands: xa.DataArray = raw_input_bands.where( raw_input_bands != nodata_value )
+        input_bands.attrs.update( raw_input_bands.attrs )
         input_bands.name = self.name
         return input_bands
 
-    def get_binned_sampling(self, x_data_train: xa.DataArray, y_data_train: xa.DataArray, n_bins: int=16, n_samples_per_bin: int = 50) -> Tuple[xa.DataArray, xa.DataArray]:
-        training_indices = []
-        samples_axis = y_data_train[y_data_train.dims[0]]
-        groupby = samples_axis.groupby_bins(y_data_train, n_bins)
-        for sbin in groupby:
-            binned_indices: xa.DataArray = sbin[1].astype(np.int64)
-            ns = binned_indices.size
-            if ns <= n_samples_per_bin:
-                training_indices.append(binned_indices.values)
-            else:
-                selection_indices = np.linspace(0, ns - 1, n_samples_per_bin).astype(np.int64)
-                sample_indices = binned_indices.isel(samples=selection_indices)
-                training_indices.append(sample_indices.values)
-            print(f"  *  Bin range = {sbin[0]}; NSamples total = {ns}, actual = {training_indices[-1].size} ")
-
-        np_training_indices = np.concatenate(training_indices)
+    @staticmethod
+    def open_rasterio( filepath: str ) -> xa.DataArray:
+        """ Lazy rasterio-backed array: xarray's open_rasterio where it still exists, else rioxarray's """
+        if hasattr( xa, 'open_rasterio' ): return xa.open_rasterio( filepath )
+        import rioxarray
+        return rioxarray.open_rasterio( filepath )
+
+    @staticmethod
+    def nodata_value( input_bands: xa.DataArray ):
+        """ The ENVI data_ignore_value, falling back to the raster's nodata ( _FillValue or nodatavals ) """
+        attrs = input_bands.attrs
+        if 'data_ignore_value' in attrs: return int( attrs['data_ignore_value'] )
+        if '_FillValue' in attrs: return attrs['_FillValue']
+        return attrs.get( 'nodatavals', [ None ] )[0]
+
+    def iter_blocks( self, input_bands: xa.DataArray, block_size: int = None ) -> Iterator[Tuple[slice,slice,np.ndarray]]:
+        """ Streams ( y_slice, x_slice, block ) spatial blocks of a (band,y,x) array, reading one block at a time """
+        bs = self.block_size if block_size is None else block_size
+        ny, nx = input_bands.shape[-2:]
+        for iy in range( 0, ny, bs ):
+            for ix in range( 0, nx, bs ):
+                ys, xs = slice( iy, min( iy + bs, ny ) ), slice( ix, min( ix + bs, nx ) )
+                yield ys, xs, np.asarray( input_bands[ ..., ys, xs ].values, dtype=np.float32 )
+
+    def get_binned_sampling(self, x_data_train: xa.DataArray, y_data_train: xa.DataArray, n_bins: int=16, n_samples_per_bin: int = 50, **kwargs) -> Tuple[xa.DataArray, xa.DataArray]:
+        from geoproc.data.sampling import get_binned_sample_indices
+        np_training_indices = get_binned_sample_indices( y_data_train.values, n_bins, n_samples_per_bin, **kwargs )
         x_data_binned = x_data_train.isel(samples=np_training_indices, drop=True)
         y_data_binned = y_data_train.isel(samples=np_training_indices, drop=True)
         print(f"Using {y_data_binned.size} samples out of {y_data_train.size}: {(y_data_binned.size * 100.0) / y_data_train.size:.2f}%")
         return x_data_binned, y_data_binned
 
-    def restructure_for_training(self, x_data_array: xa.DataArray, y_data_array: xa.DataArray, transpose = True ) ->  Tuple[xa.DataArray, xa.DataArray]:
+    def restructure_for_training(self, x_data_array: xa.DataArray, y_data_array: xa.DataArray, transpose = True, output_path: str = None ) ->  Tuple[xa.DataArray, xa.DataArray]:
+        """ Stacks the valid ( all finite ) pixels of the (band,y,x) input and target arrays into (samples,band) and (samples)
+            training arrays.  With output_path the samples are streamed block by block to memory-mapped files instead
+            ( see extract_training_samples ) and the returned arrays are views of those files. """
+        if output_path is not None:
+            x_samples, y_samples, sample_indices = self.extract_training_samples( x_data_array, y_data_array, output_path )
+            band_dim = x_data_array.dims[0]
+            coords = dict( samples=np.arange( y_samples.shape[0] ) )
+            x_data = xa.DataArray( x_samples, dims=[ 'samples', band_dim ], coords={ band_dim: x_data_array[band_dim].values, **coords } )
+            return ( x_data if transpose else x_data.transpose() ), xa.DataArray( y_samples, dims=[ 'samples' ], coords=coords )
         dims = x_data_array.dims[1:]
         x_stacked_data, y_stacked_data = x_data_array.stack( samples=dims ), y_data_array.stack( samples=dims ).squeeze()
-        x_undef = np.isnan( x_stacked_data.values.sum( axis=0 ) )
-        y_undef = np.isnan( y_stacked_data.values )
-        valid_mask = np.logical_not( np.logical_or( x_undef, y_undef ) )
-        x_stacked_data_masked = x_stacked_data.isel(samples=self.get_indices(valid_mask))
-        y_stacked_data_masked = y_stacked_data.isel(samples=self.get_indices(valid_mask))
+        valid_mask = np.isfinite( x_stacked_data.values ).all( axis=0 ) & np.isfinite( y_stacked_data.values )
+        valid_indices = self.get_indices( valid_mask )
+        x_stacked_data_masked = x_stacked_data.isel( samples=valid_indices )
+        y_stacked_data_masked = y_stacked_data.isel( samples=valid_indices )
         samples_coord = np.array(range(x_stacked_data_masked.shape[1]))
         if transpose: x_stacked_data_masked = x_stacked_data_masked.transpose()
         return x_stacked_data_masked.assign_coords(samples=samples_coord), y_stacked_data_masked.assign_coords(samples=samples_coord)
 
+    def extract_training_samples( self, x_data_array: xa.DataArray, y_data_array: xa.DataArray, output_path: str, block_size: int = None ) -> Tuple[np.memmap, np.memmap, np.ndarray]:
+        """ Streams spatial blocks of the (band,y,x) input and target arrays, writing the valid samples as packed float32
+            (n_samples, n_bands) and (n_samples,) matrices to memory-mapped files at output_path.  Samples are written one
+            row of blocks at a time in row-major pixel order, the order of restructure_for_training's in-memory result.
+            Returns ( x_samples, y_samples, sample_indices ), where sample_indices are the flat (y*nx + x) pixel indices. """
+        nbands, nx = x_data_array.shape[0], x_data_array.shape[-1]
+        nsamples, sample_indices = 0, []
+        with open( output_path + ".x.f32", "wb" ) as x_file, open( output_path + ".y.f32", "wb" ) as y_file:
+            def write_strip( strip: List[Tuple[np.ndarray,np.ndarray,np.ndarray]] ) -> int:
+                if len( strip ) == 0: return 0
+                x_strip, y_strip, indices = [ np.concatenate( part ) for part in zip( *strip ) ]
+                order = np.argsort( indices, kind='stable' )
+                x_file.write( np.ascontiguousarray( x_strip[ order ] ).tobytes() )
+                y_file.write( y_strip[ order ].tobytes() )
+                sample_indices.append( indices[ order ] )
+                return order.size
+            strip, strip_rows = [], None
+            for ys, xs, x_block in self.iter_blocks( x_data_array, block_size ):
+                if ys != strip_rows:
+                    nsamples += write_strip( strip )
+                    strip, strip_rows = [], ys
+                y_block = np.asarray( y_data_array[ ..., ys, xs ].values, dtype=np.float32 ).reshape( x_block.shape[-2:] )
+                iy, ix = np.nonzero( np.isfinite( x_block ).all( axis=0 ) & np.isfinite( y_block ) )
+                strip.append( ( x_block[ :, iy, ix ].transpose(), y_block[ iy, ix ], ( iy + ys.start ) * nx + ( ix + xs.start ) ) )
+            nsamples += write_strip( strip )
+        sample_indices = np.concatenate( sample_indices ) if len( sample_indices ) else np.empty( [0], np.int64 )
+        np.save( output_path + ".indices.npy", sample_indices )
+        with open( output_path + ".json", "w" ) as meta_file:
+            json.dump( dict( nsamples=nsamples, nbands=nbands, shape=list( x_data_array.shape[-2:] ) ), meta_file )
+        print( f"Extracted {nsamples} valid samples out of {x_data_array.shape[-2]*nx} to {output_path}" )
+        return self.open_training_samples( output_path )
+
+    def open_training_samples( self, output_path: str ) -> Tuple[np.memmap, np.memmap, np.ndarray]:
+        """ Memory-maps a sample set written by extract_training_samples """
+        with open( output_path + ".json" ) as meta_file:
+            meta = json.load( meta_file )
+        nsamples, nbands = meta['nsamples'], meta['nbands']
+        sample_indices = np.load( output_path + ".indices.npy", mmap_mode='r' )
+        if nsamples == 0:
+            return np.empty( [0,nbands], np.float32 ), np.empty( [0], np.float32 ), sample_indices
+        x_samples = np.memmap( output_path + ".x.f32", dtype=np.float32, mode='r', shape=( nsamples, nbands ) )
+        y_samples = np.memmap( output_path + ".y.f32", dtype=np.float32, mode='r', shape=( nsamples, ) )
+        return x_samples, y_samples, sample_indices
+
     def regress( self, x_data_train: xa.DataArray, y_data_train: xa.DataArray, **kwargs ) -> Tuple[np.ndarray,float,LinearRegression]:
         x, y = x_data_train.values, y_data_train.values
         estimator: LinearRegression = LinearRegression()
@@ -113,6 +197,100 @@ class AvirisDataManager:
         mixing: np.ndarray = ica.mixing_
         return ( np_reduced_data, comps, mixing )
 
+    def valid_samples( self, block: np.ndarray, valid_mask: np.ndarray = None ) -> Tuple[np.ndarray,np.ndarray]:
+        """ Returns the (n_valid, n_bands) samples of a (band,y,x) block and the (y*x) validity mask: pixels with all bands
+            finite, or the pixels of the given (y,x) valid_mask ( with nan band values zero-filled ) """
+        samples = block.reshape( block.shape[0], -1 ).transpose()
+        if valid_mask is None:
+            valid = np.isfinite( samples ).all( axis=1 )
+            return samples[valid], valid
+        valid = np.asarray( valid_mask, dtype=bool ).reshape(-1)
+        return np.nan_to_num( samples[valid], nan=0.0 ), valid
+
+    def apply_blocks( self, estimator, method: str, input_bands: xa.DataArray, n_outputs: int, output_path: str = None, **kwargs ) -> np.ndarray:
+        """ Applies estimator.<method> ( predict, transform, ... ) to the valid pixels of each tile of a (band,y,x) array in
+            fixed-size batches, optionally on a process pool ( the estimator is sent once to each worker ), and writes the
+            results ( nan elsewhere ) into a preallocated (n_outputs,y,x) array, in memory or as a .npy memmap at output_path.
+              valid_mask: (y,x) boolean mask of the pixels to process ( default: pixels with all bands finite )
+              nproc: number of processes ( default: 1 = in-process )
+              batch_size: max samples per estimator call
+              block_size: tile size """
+        from multiprocessing import Pool
+        nproc = kwargs.get( 'nproc', 1 )
+        batch_size = kwargs.get( 'batch_size', 50000 )
+        block_size = kwargs.get( 'block_size', self.block_size )
+        valid_mask = kwargs.get( 'valid_mask', None )
+        ny, nx = input_bands.shape[-2:]
+        if output_path is None:   result = np.empty( [ n_outputs, ny, nx ], np.float32 )
+        else:                     result = np.lib.format.open_memmap( output_path, mode='w+', dtype=np.float32, shape=( n_outputs, ny, nx ) )
+        pool = Pool( nproc, initializer=_init_estimator, initargs=( estimator, method ) ) if nproc > 1 else None
+        if pool is None: _init_estimator( estimator, method )
+        try:
+            for ys, xs, block in self.iter_blocks( input_bands, block_size ):
+                samples, valid = self.valid_samples( block, None if valid_mask is None else valid_mask[ ys, xs ] )
+                block_result = np.full( [ valid.size, n_outputs ], np.nan, np.float32 )
+                if samples.shape[0] > 0:
+                    batches = [ samples[ i: i + batch_size ] for i in range( 0, samples.shape[0], batch_size ) ]
+                    results = pool.map( _apply_batch, batches ) if pool is not None else [ _apply_batch( batch ) for batch in batches ]
+                    block_result[ valid ] = np.concatenate( results )
+                result[ :, ys, xs ] = block_result.transpose().reshape( n_outputs, block.shape[1], block.shape[2] )
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        if output_path is not None: result.flush()
+        return result
+
+    def transform_blocks( self, estimator, input_bands: xa.DataArray, n_components: int, output_path: str = None, **kwargs ) -> xa.DataArray:
+        """ Applies a fitted decomposition/embedding block-by-block ( see apply_blocks ), returning a (component,y,x) array """
+        ydim, xdim = input_bands.dims[-2:]
+        reduced_data = self.apply_blocks( estimator, 'transform', input_bands, n_components, output_path, **kwargs )
+        coords = { 'component': np.arange( n_components ), ydim: input_bands.coords[ydim], xdim: input_bands.coords[xdim] }
+        return xa.DataArray( reduced_data, dims=[ 'component', ydim, xdim ], coords=coords, name=kwargs.get( 'name', "reduced_data" ) )
+
+    def pca_blocks( self, input_bands: xa.DataArray, n_components: int, output_path: str = None, **kwargs ) -> Tuple[xa.DataArray,np.ndarray,np.ndarray]:
+        """ Out-of-core PCA of a (band,y,x) array: spatial blocks are fed to an IncrementalPCA ( nan pixels are skipped ),
+            then the reduced components are written block-by-block.  Returns ( reduced_data, components, explained_variance_ratio ) """
+        from sklearn.decomposition import IncrementalPCA
+        block_size = kwargs.get( 'block_size', self.block_size )
+        batch_size = max( kwargs.get( 'batch_size', 100000 ), n_components )
+        ipca = IncrementalPCA( n_components=n_components )
+        batch, batch_len = [], 0
+        for ys, xs, block in self.iter_blocks( input_bands, block_size ):
+            samples, valid = self.valid_samples( block )
+            batch.append( samples )
+            batch_len += samples.shape[0]
+            if batch_len >= batch_size:
+                ipca.partial_fit( np.concatenate( batch ) )
+                batch, batch_len = [], 0
+        if batch_len >= n_components:   ipca.partial_fit( np.concatenate( batch ) )
+        elif batch_len > 0:             print( f"Skipping final PCA batch of {batch_len} samples (fewer than n_components)" )
+        reduced_data = self.transform_blocks( ipca, input_bands, n_components, output_path, block_size=block_size )
+        return ( reduced_data, ipca.components_, ipca.explained_variance_ratio_ )
+
+    def ica_blocks( self, input_bands: xa.DataArray, n_components: int, output_path: str = None, **kwargs ) -> Tuple[xa.DataArray,np.ndarray,np.ndarray]:
+        """ Out-of-core ICA of a (band,y,x) array: FastICA is fit on an evenly strided subsample ( max_samples ) of the valid pixels,
+            then the sources are written block-by-block.  Returns ( reduced_data, components, mixing ) """
+        from sklearn.decomposition import FastICA
+        block_size = kwargs.get( 'block_size', self.block_size )
+        max_samples = kwargs.get( 'max_samples', 200000 )
+        stride = max( ( input_bands.shape[-2] * input_bands.shape[-1] ) // max_samples, 1 )
+        training_samples = [ self.valid_samples( block )[0][::stride] for ys, xs, block in self.iter_blocks( input_bands, block_size ) ]
+        ica: FastICA = FastICA( n_components=n_components, random_state = 0, whiten = True )
+        ica.fit( np.concatenate( training_samples ) )
+        reduced_data = self.transform_blocks( ica, input_bands, n_components, output_path, block_size=block_size )
+        return ( reduced_data, ica.components_, ica.mixing_ )
+
+    def predict_blocks( self, estimator, input_bands: xa.DataArray, output_path: str = None, **kwargs ) -> xa.DataArray:
+        """ Full-scene inference: predicts the valid pixels of each tile in fixed-size batches on a process pool
+            ( nproc, default: cpu_count ) into a preallocated (y,x) raster ( see apply_blocks ) """
+        from multiprocessing import cpu_count
+        ydim, xdim = input_bands.dims[-2:]
+        kwargs['nproc'] = kwargs.get( 'nproc', cpu_count() )
+        prediction = self.apply_blocks( estimator, 'predict', input_bands, 1, output_path, **kwargs )[0]
+        coords = { ydim: input_bands.coords[ydim], xdim: input_bands.coords[xdim] }
+        return xa.DataArray( prediction, dims=[ ydim, xdim ], coords=coords, name=kwargs.get( 'name', "prediction" ) )
+
 if __name__ == '__main__':
     DATA_DIR = "/Users/tpmaxwel/Dropbox/Tom/Data/Aviris"
     outDir = "/Users/tpmaxwel/Dropbox/Tom/InnovationLab/results/Aviris"
@@ -16,15 +16,30 @@ class LinearPerceptron:
         self.E = self.maxeig()
         self.XY = np.matmul( self.X, self.Y )
 
-    def maxeig(self) -> float:
-        w, v = LA.eig(self.XXt)
-        return w.max()
+    def maxeig(self, max_iter: int = 200, tol: float = 1e-8 ) -> float:
+        """ Largest eigenvalue of the (symmetric, positive semi-definite) Gram matrix by power iteration """
+        v = np.ones( [ self.XXt.shape[0] ] ) / math.sqrt( self.XXt.shape[0] )
+        eig = 0.0
+        for iL in range( max_iter ):
+            Av = np.matmul( self.XXt, v )
+            norm = LA.norm( Av )
+            if norm == 0.0: return 0.0
+            new_eig = float( np.dot( v, Av ) )
+            v = Av / norm
+            if abs( new_eig - eig ) <= tol * abs( new_eig ): return new_eig
+            eig = new_eig
+        return eig
 
     def h( self, Z: np.ndarray, threshold: float ) -> np.ndarray:
         if threshold == 0.0: return Z
-        return np.select( [Z < -threshold, Z < threshold], [Z + threshold, 0], Z - threshold  )
+        return np.sign( Z ) * np.maximum( np.abs( Z ) - threshold, 0.0 )
 
     def fit(self, **params ):
+        """ Proximal-gradient (lasso) fit.
+              solver:         'ista' (default) or 'fista' ( Nesterov momentum )
+              weights:        initial weights ( warm start )
+              tol:            relative weight change at which to stop ( checked every iteration )
+              check_interval: iterations between mse checks """
         W = params.get( 'weights', np.zeros( [ self.X.shape[0] ] ) )
         intertia = params.get( 'inertia', 0.01 )
         L =  self.E * ( 1 + intertia )
@@ -32,14 +47,29 @@ class LinearPerceptron:
         threshold = sparsity / L
         max_iter = params.get( 'max_iter', 1000000 )
         mse_thresh = params.get( 'mse_thresh', 0.5 )
+        solver = params.get( 'solver', 'ista' ).lower()
+        tol = params.get( 'tol', 1e-6 if solver == 'fista' else 0.0 )
+        check_interval = params.get( 'check_interval', 100 if solver == 'fista' else 5000 )
+        Y, t = W, 1.0
         mse = 0.0
 
         for iL in range(max_iter):
-            DW = np.matmul( self.XXt, W ) - self.XY
-            Z = W - DW/L
-            W = self.h( Z, threshold )
+            DW = np.matmul( self.XXt, Y ) - self.XY
+            W1 = self.h( Y - DW/L, threshold )
+            if solver == 'fista':
+                t1 = ( 1.0 + math.sqrt( 1.0 + 4.0 * t * t ) ) / 2.0
+                Y, t = W1 + ( (t - 1.0) / t1 ) * ( W1 - W ), t1
+            else:
+                Y = W1
+            rel_change = LA.norm( W1 - W ) / max( LA.norm( W1 ), 1e-12 )
+            W = W1
 
-            if iL % 5000 == 0:
+            if rel_change <= tol:
+                mse = self.get_error( W )
+                print( f" ** Iteration {iL}, mse = {mse:.4f}: Converged (relative change = {rel_change:.2e})." )
+                break
+
+            if iL % check_interval == 0:
                 mse = self.get_error( W )
                 print( f" ** Iteration {iL}, mse = {mse:.4f}" )
                 if mse < mse_thresh:
@@ -47,6 +77,16 @@ class LinearPerceptron:
                     break
         return W, mse
 
+    def fit_path(self, sparsities: List[float], **params ) -> List[Tuple[float,np.ndarray,float]]:
+        """ Fits a sequence of sparsity values ( best ordered from most to least sparse ), warm starting each fit from the previous weights """
+        results = []
+        W = params.pop( 'weights', None )
+        for sparsity in sparsities:
+            if W is not None: params['weights'] = W
+            W, mse = self.fit( sparsity=sparsity, **params )
+            results.append( ( sparsity, W, mse ) )
+        return results
+
     def get_error(self, W: np.ndarray ):
         P = np.matmul( W, self.X )
         return self.mean_squared_error( P, self.Y )
@@ -0,0 +1,97 @@
+import numpy as np
+from typing import List, Union, Tuple, Optional, Sequence
+from scipy import linalg
+import math, itertools
+
+class GramRegression:
+    """
+    Least squares regression on any subset of bands from precomputed Gram matrices.
+
+    XtX = Xc'Xc and Xty = Xc'yc ( centered, for a fitted intercept as in sklearn LinearRegression ) are accumulated once
+    over all bands ( in row chunks, so x may be a memmap ); each band subset is then solved by slicing these matrices.
+
+    Parameters
+    ----------
+    x : ndarray ( n_samples, n_bands )
+    y : ndarray ( n_samples, )
+    fit_intercept : bool, optional
+    chunk_size : int, optional
+        Rows accumulated per step.
+    """
+
+    def __init__(self, x: np.ndarray, y: np.ndarray, fit_intercept: bool = True, chunk_size: int = 100000 ):
+        self.fit_intercept = fit_intercept
+        self.nsamples, self.nbands = x.shape
+        XtX = np.zeros( [ self.nbands, self.nbands ] )
+        Xty = np.zeros( [ self.nbands ] )
+        Xs = np.zeros( [ self.nbands ] )
+        ys, yty = 0.0, 0.0
+        for i0 in range( 0, self.nsamples, chunk_size ):
+            xc = np.asarray( x[ i0: i0 + chunk_size ], dtype=np.float64 )
+            yc = np.asarray( y[ i0: i0 + chunk_size ], dtype=np.float64 ).reshape(-1)
+            XtX += np.matmul( xc.transpose(), xc )
+            Xty += np.matmul( xc.transpose(), yc )
+            Xs += xc.sum( axis=0 )
+            ys += yc.sum()
+            yty += np.dot( yc, yc )
+        self.x_mean = Xs / self.nsamples if fit_intercept else np.zeros( [ self.nbands ] )
+        self.y_mean = ys / self.nsamples if fit_intercept else 0.0
+        self.XtX = XtX - self.nsamples * np.outer( self.x_mean, self.x_mean )
+        self.Xty = Xty - self.nsamples * self.x_mean * self.y_mean
+        self.yty = yty - self.nsamples * self.y_mean * self.y_mean
+
+    def rmse( self, rss: float ) -> float:
+        return math.sqrt( max( rss, 0.0 ) / self.nsamples )
+
+    def solve( self, bands: Sequence[int] = None ) -> Tuple[np.ndarray,float,float]:
+        """ Returns ( coefficients, intercept, rms error ) of the regression on the given bands ( default: all bands ) """
+        bands = np.arange( self.nbands ) if bands is None else np.asarray( bands )
+        G, b = self.XtX[ np.ix_( bands, bands ) ], self.Xty[ bands ]
+        try:
+            coef = linalg.cho_solve( linalg.cho_factor( G ), b )
+        except linalg.LinAlgError:
+            coef = linalg.lstsq( G, b )[0]
+        rss = self.yty - np.dot( coef, b )
+        intercept = self.y_mean - np.dot( self.x_mean[ bands ], coef )
+        return coef, intercept, self.rmse( rss )
+
+    def forward_selection( self, n_select: int, candidates: Sequence[int] = None ) -> Tuple[List[int],List[float]]:
+        """ Greedy forward band selection using rank-one Cholesky updates.
+            Returns the selected bands ( in order of selection ) and the rms error after each selection. """
+        candidates = list( range( self.nbands ) if candidates is None else candidates )
+        diag = np.diag( self.XtX )
+        L = np.zeros( [ 0, 0 ] )
+        z = np.zeros( [ 0 ] )
+        selected, errors = [], []
+        for iS in range( min( n_select, len(candidates) ) ):
+            cands = np.array( candidates )
+            if len( selected ):
+                l = linalg.solve_triangular( L, self.XtX[ np.ix_( selected, cands ) ], lower=True )
+                d2 = diag[ cands ] - ( l * l ).sum( axis=0 )
+                r = self.Xty[ cands ] - np.matmul( z, l )
+            else:
+                l = np.zeros( [ 0, cands.size ] )
+                d2, r = diag[ cands ].copy(), self.Xty[ cands ].copy()
+            valid = d2 > 1e-12 * diag[ cands ].max()
+            if not valid.any(): break
+            gains = np.where( valid, r * r / np.where( valid, d2, 1.0 ), -np.inf )
+            iC = int( np.argmax( gains ) )
+            d = math.sqrt( d2[iC] )
+            L = np.block( [ [ L, np.zeros( [ L.shape[0], 1 ] ) ], [ l[ :, iC ].reshape( 1, -1 ), np.array( [[ d ]] ) ] ] )
+            z = np.append( z, r[iC] / d )
+            selected.append( int( cands[iC] ) )
+            candidates.remove( int( cands[iC] ) )
+            errors.append( self.rmse( self.yty - np.dot( z, z ) ) )
+        return selected, errors
+
+    def best_subset( self, n_select: int, candidates: Sequence[int] = None ) -> Tuple[List[int],float]:
+        """ Exhaustive search over all n_select-band subsets of the candidates; returns the best subset and its rms error """
+        candidates = list( range( self.nbands ) if candidates is None else candidates )
+        best_bands, best_error = None, float('inf')
+        for bands in itertools.combinations( candidates, n_select ):
+            G, b = self.XtX[ np.ix_( bands, bands ) ], self.Xty[ list(bands) ]
+            try:                        coef = linalg.cho_solve( linalg.cho_factor( G ), b )
+            except linalg.LinAlgError:  continue
+            error = self.rmse( self.yty - np.dot( coef, b ) )
+            if error < best_error: best_bands, best_error = list( bands ), error
+        return best_bands, best_error
@@ -1,25 +1,57 @@
 #! /usr/bin/env python
 from glob import glob
 from typing import Dict, List, Tuple, Union, Optional
-import sys, time, shutil
-import xarray as xa
-import subprocess
+import sys, time, shutil, json
+from osgeo import gdal
 from multiprocessing import Pool, Lock, cpu_count
 import os.path
+gdal.UseExceptions()
 
 globallock = Lock()
 
+def default_nthreads( nproc: int ) -> int:
+    """ Warp threads per process, so that nproc concurrent warps don't oversubscribe the cpus """
+    return max( cpu_count() // nproc, 1 )
+
 class AvirisWarp:
 
-    def __init__(self, outputDir: str):
+    def __init__(self, outputDir: str, **kwargs ):
         self.outputDir = outputDir
+        self.warp_memory = kwargs.get( 'warp_memory', 2048 )              # MB
+        self.nthreads = kwargs.get( 'nthreads' )                          # default: cpu_count() shared among the processes
+        self.blocksize = kwargs.get( 'blocksize', 512 )
+        self.inventory_file = os.path.join( outputDir, "warp_inventory.json" )
+        self.inventory: Dict[str,Dict] = self.read_inventory()
+
+    def read_inventory(self) -> Dict[str,Dict]:
+        if os.path.isfile( self.inventory_file ):
+            try:
+                with open( self.inventory_file ) as f: return json.load( f )
+            except Exception as err:
+                print( f"Error reading inventory file {self.inventory_file}: {err}" )
+        return {}
+
+    def write_inventory(self):
+        os.makedirs( self.outputDir, mode=0o777, exist_ok=True )
+        tmp_file = self.inventory_file + ".tmp"
+        with open( tmp_file, "w" ) as f: json.dump( self.inventory, f, indent=1 )
+        os.replace( tmp_file, self.inventory_file )
+
+    def update_inventory(self, output_file: str, shape: Tuple[int,int,int] ):
+        self.inventory[ output_file ] = dict( size=os.path.getsize(output_file), mtime=os.path.getmtime(output_file), shape=list(shape) )
 
     def needs_processing(self, output_file ) -> bool:
+        record = self.inventory.get( output_file )
+        if record is not None and os.path.isfile( output_file ) and ( os.path.getsize( output_file ) == record['size'] ):
+            return False
         try:
-            test_data = xa.open_rasterio(output_file)
+            dataset: gdal.Dataset = gdal.Open( output_file )
+            shape = ( dataset.RasterCount, dataset.RasterYSize, dataset.RasterXSize )
+            dataset = None
         except:
             if os.path.isfile(output_file): os.remove(output_file)
             return True
+        self.update_inventory( output_file, shape )
         return False
 
     def get_unprocessed_filepaths(self, files_glob: str ) -> List[str]:
@@ -30,40 +62,56 @@ class AvirisWarp:
             output_file_path = os.path.join(output_dir, output_file)
             if self.needs_processing(output_file_path):
                 filtered_file_list.append( input_file )
-        print( f"Processing {len(filtered_file_list)} files out of {len(filelist)}, files requiring processing = {[os.path.basename(f) for f in filelist]}")
+        self.write_inventory()
+        print( f"Processing {len(filtered_file_list)} files out of {len(filelist)}, files requiring processing = {[os.path.basename(f) for f in filtered_file_list]}")
         return filtered_file_list
 
     def process_files( self, files_glob: str, **kwargs ):
         files_list = self.get_unprocessed_filepaths( files_glob )
-        nproc = kwargs.get('np', cpu_count() )
-        print( f"Using {nproc} processors to process {len(files_list)} files from the glob '{files_glob}'")
-        p = Pool( processes=nproc )
-        p.map( self.process_file, files_list )
-        p.close()
-        p.join()
-
-    def process_file( self, input_file: str ):
+        nproc = int( kwargs.get('np', max( cpu_count() // 4, 1 ) ) )
+        if self.nthreads is None: self.nthreads = default_nthreads( nproc )
+        print( f"Using {nproc} processes ({self.nthreads} warp threads each) to process {len(files_list)} files from the glob '{files_glob}'")
+        with Pool( processes=nproc ) as p:
+            for result in p.imap_unordered( self.process_file, files_list ):
+                if result is not None:
+                    output_file_path, shape = result
+                    self.update_inventory( output_file_path, shape )
+                    self.write_inventory()
+
+    def warp_threads(self) -> str:
+        return 'ALL_CPUS' if self.nthreads is None else str( self.nthreads )
+
+    def warp_options(self) -> gdal.WarpOptions:
+        creation_options = [ 'COMPRESS=LZW', 'BIGTIFF=YES', 'TILED=YES', f'BLOCKXSIZE={self.blocksize}', f'BLOCKYSIZE={self.blocksize}' ]
+        return gdal.WarpOptions( format='GTiff', creationOptions=creation_options, warpMemoryLimit=self.warp_memory,
+                                 multithread=True, warpOptions=[ f'NUM_THREADS={self.warp_threads()}' ] )
+
+    def process_file( self, input_file: str ) -> Optional[Tuple[str,Tuple[int,int,int]]]:
         input_dir, output_dir, output_file = self.get_file_paths(input_file)
         output_file_path = os.path.join( output_dir, output_file )
-        if not self.needs_processing( output_file_path ):
-            globallock.acquire()
-            print( f"Skipping file {input_file}: Processed file already exists at {output_file_path}")
-            globallock.release()
-        else:
+        globallock.acquire()
+        print(f"Processing file '{input_file}'")
+        globallock.release()
+
+        self.copy_files( os.path.join( input_dir, "*README*" ), output_dir )
+        t0 = time.time()
+        gdal.SetConfigOption( 'GDAL_NUM_THREADS', self.warp_threads() )
+        gdal.SetCacheMax( self.warp_memory * 1024 * 1024 )
+        try:
+            dataset: gdal.Dataset = gdal.Warp( output_file_path, input_file, options=self.warp_options() )
+            shape = ( dataset.RasterCount, dataset.RasterYSize, dataset.RasterXSize )
+            dataset = None
+        except Exception as err:
             globallock.acquire()
-            print(f"Processing file '{input_file}'")
+            print( f"Error when processing file '{input_file}': {err}" )
             globallock.release()
+            if os.path.isfile( output_file_path ): os.remove( output_file_path )
+            return None
 
-            self.copy_files( f"input_dir/*README*", output_dir )
-            t0 = time.time()
-
-            args = [ 'gdalwarp', '-co', 'COMPRESS=LZW', '-co', 'BIGTIFF=YES', input_file, output_file_path ]
-            rv = subprocess.call(args)
-
-            globallock.acquire()
-            if rv == 0:    print( f"File '{output_file}' generated in {(time.time()-t0)/60.0:.2f} minutes in output-dir {output_dir}." )
-            else:          print( f"Error when processing file '{input_file}'" )
-            globallock.release()
+        globallock.acquire()
+        print( f"File '{output_file}' generated in {(time.time()-t0)/60.0:.2f} minutes in output-dir {output_dir}." )
+        globallock.release()
+        return output_file_path, shape
 
     def get_file_paths( self, input_file: str ) -> Tuple[str,str,str]:
         infile_dir, infile_name = os.path.split(input_file)
@@ -86,19 +134,20 @@ class AvirisWarp:
 def main(argv):
     if len(argv) < 3:
         binary = os.path.basename(argv[0])
-        print( "Usage: {} <files_glob> <output_dir> [ <nproc> ]".format(binary) )
+        print( "Usage: {} <files_glob> <output_dir> [ <nproc> [ <nthreads> [ <warp_memory_mb> ] ] ]".format(binary) )
         sys.exit(0)
 
     t0 = time.time()
-    kwargs = {}
+    kwargs, wargs = {}, {}
     files_glob = argv[1]
     output_dir = argv[2]
-    if len(argv) > 3:
-        kwargs['np'] = argv[3]
+    if len(argv) > 3: kwargs['np'] = argv[3]
+    if len(argv) > 4: wargs['nthreads'] = argv[4]
+    if len(argv) > 5: wargs['warp_memory'] = int( argv[5] )
 
-    awarp = AvirisWarp( output_dir )
+    awarp = AvirisWarp( output_dir, **wargs )
     awarp.process_files( files_glob.replace('"', ''), **kwargs )
     print( f"Files processed in {(time.time()-t0)/60.0:.2f} minutes to output-dir {output_dir}.")
 
 if __name__ == '__main__':
-    main(sys.argv)
\ No newline at end of file
+    main(sys.argv)
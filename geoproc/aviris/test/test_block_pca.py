@@ -0,0 +1,40 @@
+import xarray as xa
+import numpy as np
+from sklearn.decomposition import PCA
+from geoproc.aviris.manager import AvirisDataManager
+
+def band_cube( nbands: int = 6, ny: int = 20, nx: int = 30, seed: int = 0 ) -> xa.DataArray:
+    rng = np.random.default_rng( seed )
+    mixing = rng.normal( size=( nbands, 3 ) )
+    sources = rng.normal( size=( 3, ny * nx ) ) * np.array( [ [5.0], [2.0], [1.0] ] )
+    data = ( mixing @ sources ).reshape( nbands, ny, nx ) + 0.01 * rng.normal( size=( nbands, ny, nx ) )
+    return xa.DataArray( data.astype( np.float32 ), dims=[ 'band', 'y', 'x' ], coords=dict( y=np.arange( ny ), x=np.arange( nx ) ) )
+
+def dense_pca( cube: xa.DataArray, n_components: int ) -> PCA:
+    """ The original compute_pca path: the whole cube reshaped into one dense ( pixel, band ) matrix """
+    pca = PCA( n_components=n_components )
+    pca.fit_transform( cube.values.reshape( cube.shape[0], -1 ).transpose() )
+    return pca
+
+def aligned( components: np.ndarray, reference: np.ndarray ) -> np.ndarray:
+    return components * np.sign( np.sum( components * reference, axis=1, keepdims=True ) )
+
+def test_pca_blocks_matches_dense_pca():
+    cube = band_cube()
+    pca = dense_pca( cube, 3 )
+    reduced, components, evr = AvirisDataManager( block_size=7 ).pca_blocks( cube, 3, batch_size=10000 )
+    assert np.allclose( aligned( components, pca.components_ ), pca.components_, atol=1e-4 )
+    assert np.allclose( evr, pca.explained_variance_ratio_, atol=1e-5 )
+    expected = pca.transform( cube.values.reshape( cube.shape[0], -1 ).transpose() ).transpose().reshape( 3, *cube.shape[1:] )
+    signs = np.sign( np.sum( components * pca.components_, axis=1 ) )
+    assert np.allclose( reduced.values * signs[:,None,None], expected, atol=1e-3 )
+
+def test_pca_blocks_batched_and_nan_pixels():
+    cube = band_cube()
+    full_rank = dense_pca( cube, cube.shape[0] )
+    reduced, components, evr = AvirisDataManager( block_size=7 ).pca_blocks( cube, cube.shape[0], batch_size=100 )
+    assert np.allclose( evr, full_rank.explained_variance_ratio_, atol=1e-4 )
+    cube[ 2, 3, 4 ] = np.nan
+    reduced, components, evr = AvirisDataManager( block_size=7 ).pca_blocks( cube, 3 )
+    assert np.isnan( reduced.values[ :, 3, 4 ] ).all()
+    assert np.isfinite( reduced.values ).sum() == 3 * ( cube.shape[1] * cube.shape[2] - 1 )
@@ -0,0 +1,46 @@
+import numpy as np
+from numpy import linalg as LA
+from geoproc.aviris.perceptron import LinearPerceptron
+
+def lasso_problem( nsamples: int = 200, nfeatures: int = 12, seed: int = 0 ):
+    rng = np.random.default_rng( seed )
+    x = rng.normal( size=( nsamples, nfeatures ) )
+    weights = np.zeros( nfeatures )
+    weights[:4] = [ 2.0, -1.5, 1.0, 0.5 ]
+    return x, x @ weights + 0.05 * rng.normal( size=nsamples )
+
+def ista_reference( x: np.ndarray, y: np.ndarray, sparsity: float, niter: int, inertia: float = 0.01 ) -> np.ndarray:
+    """ The original LinearPerceptron.fit loop: full eigen decomposition and np.select soft thresholding """
+    X = x.transpose()
+    XXt, XY = X @ x, X @ y
+    L = LA.eig( XXt )[0].max() * ( 1 + inertia )
+    threshold = sparsity / L
+    W = np.zeros( X.shape[0] )
+    for iL in range( niter ):
+        Z = W - ( XXt @ W - XY ) / L
+        W = np.select( [Z < -threshold, Z < threshold], [Z + threshold, 0], Z - threshold )
+    return W
+
+def test_maxeig_matches_eig():
+    x, y = lasso_problem()
+    perceptron = LinearPerceptron( x, y )
+    assert np.isclose( perceptron.E, LA.eig( perceptron.XXt )[0].max(), rtol=1e-6 )
+
+def test_soft_threshold_matches_select():
+    x, y = lasso_problem()
+    Z = np.linspace( -3, 3, 61 )
+    expected = np.select( [Z < -0.7, Z < 0.7], [Z + 0.7, 0], Z - 0.7 )
+    assert np.allclose( LinearPerceptron( x, y ).h( Z, 0.7 ), expected )
+
+def test_ista_matches_original_loop():
+    x, y = lasso_problem()
+    W, mse = LinearPerceptron( x, y ).fit( sparsity=5.0, max_iter=300, mse_thresh=-1.0 )
+    assert np.allclose( W, ista_reference( x, y, 5.0, 300 ), atol=1e-6 )
+
+def test_fista_converges_to_ista_solution():
+    x, y = lasso_problem()
+    perceptron = LinearPerceptron( x, y )
+    W_fista, mse = perceptron.fit( sparsity=5.0, solver='fista', tol=1e-12, max_iter=5000, mse_thresh=-1.0 )
+    assert np.allclose( W_fista, ista_reference( x, y, 5.0, 5000 ), atol=1e-6 )
+    W_path = perceptron.fit_path( [ 50.0, 5.0 ], solver='fista', tol=1e-12, max_iter=5000, mse_thresh=-1.0 )[-1][1]
+    assert np.allclose( W_path, W_fista, atol=1e-6 )
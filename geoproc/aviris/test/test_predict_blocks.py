@@ -0,0 +1,25 @@
+import xarray as xa
+import numpy as np
+from sklearn.linear_model import LinearRegression
+from geoproc.aviris.manager import AvirisDataManager
+
+def test_predict_blocks_matches_masked_dense_prediction():
+    rng = np.random.default_rng( 0 )
+    nbands, ny, nx = 5, 17, 23
+    x_data_raw = xa.DataArray( rng.normal( size=( nbands, ny, nx ) ), dims=[ 'band', 'y', 'x' ], coords=dict( y=np.arange( ny ), x=np.arange( nx ) ) )
+    x_data_raw[ 1, 2, 3 ] = np.nan
+    y_valid = rng.random( ( ny, nx ) ) > 0.2
+    y_valid[ 2, 3 ] = False
+    estimator = LinearRegression().fit( rng.normal( size=( 50, nbands ) ), rng.normal( size=50 ) )
+
+    # The original rf_mapping path: pixels selected by the target's valid mask, nan inputs zero-filled
+    x_data_full = x_data_raw.stack( samples=( 'y', 'x' ) ).transpose()
+    x_valid_mask = y_valid.reshape( [ -1, 1 ] )
+    image_prediction = np.where( x_valid_mask.squeeze(), estimator.predict( np.where( x_valid_mask, x_data_full.values, 0.0 ) ), np.nan )
+    expected = image_prediction.reshape( ny, nx )
+
+    mgr = AvirisDataManager( nbands, block_size=8 )
+    result = mgr.predict_blocks( estimator, x_data_raw, nproc=1, batch_size=20, valid_mask=y_valid )
+    assert np.allclose( result.values, expected, equal_nan=True, atol=1e-5 )
+    default = mgr.predict_blocks( estimator, x_data_raw, nproc=1 )
+    assert np.isnan( default.values[ 2, 3 ] ) and np.isfinite( default.values ).sum() == ny * nx - 1
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from geoproc.aviris.manager import AvirisDataManager
+rasterio = pytest.importorskip( "rasterio" )
+pytest.importorskip( "dask" )
+
+NODATA = -9999
+
+@pytest.fixture
+def scene( tmp_path ):
+    """ A small int16 (band,y,x) GTiff scene with ENVI-style data_ignore_value tag and a few nodata pixels """
+    from rasterio.transform import from_origin
+    data = np.random.default_rng(0).integers( 0, 1000, size=( 6, 23, 17 ) ).astype( np.int16 )
+    data[ 2, 4, 5 ] = data[ :, 10, 11 ] = NODATA
+    data[ 0, 0, 0 ] = 7
+    path = str( tmp_path / "scene.tif" )
+    with rasterio.open( path, "w", driver="GTiff", count=6, height=23, width=17, dtype="int16",
+                        transform=from_origin( 500000, 4000000, 30, 30 ), crs="EPSG:32611", nodata=NODATA ) as dst:
+        dst.write( data )
+        dst.update_tags( data_ignore_value=str( NODATA ) )
+    return path, data
+
+def expected( data: np.ndarray ) -> np.ndarray:
+    result = data.astype( np.float32 )
+    result[ data == NODATA ] = np.nan
+    return result
+
+def test_read_is_lazy_float32_and_masked( scene ):
+    path, data = scene
+    mgr = AvirisDataManager( block_size=8 )
+    bands = mgr.read( path )
+    assert bands.dtype == np.float32
+    assert bands.chunks is not None
+    assert bands.chunks[1] == ( 8, 8, 7 ) and bands.chunks[0] == ( 5, )
+    assert bands.name == "band_data"
+    np.testing.assert_array_equal( bands.values, expected( data )[ :5 ] )
+
+def test_read_bands_and_window( scene ):
+    path, data = scene
+    mgr = AvirisDataManager( nbands=3, block_size=8 )
+    assert mgr.read( path ).shape == ( 3, 23, 17 )
+    subset = mgr.read( path, bands=[ 1, 2, 5 ], window=( ( 3, 12 ), ( 4, 15 ) ) )
+    assert subset.shape == ( 3, 9, 11 ) and subset.chunks is not None
+    np.testing.assert_array_equal( subset.values, expected( data )[ [ 1, 2, 5 ], 3:12, 4:15 ] )
+    sliced = mgr.read( path, bands=slice( 2, 4 ), window=( ( 0, 5 ), ( 0, 6 ) ) )
+    np.testing.assert_array_equal( sliced.values, expected( data )[ 2:4, 0:5, 0:6 ] )
+
+def test_read_ignore_value_override( scene ):
+    path, data = scene
+    bands = AvirisDataManager( block_size=8 ).read( path, ignore_value=7, bands=[ 0 ] )
+    assert np.isnan( bands.values[ 0, 0, 0 ] )
+    assert bands.values[ 0, 10, 11 ] == NODATA
+
+def test_iter_blocks_covers_the_scene( scene ):
+    path, data = scene
+    mgr = AvirisDataManager( block_size=8 )
+    bands = mgr.read( path )
+    result = np.full( bands.shape, -1, np.float32 )
+    for ys, xs, block in mgr.iter_blocks( bands, 6 ):
+        assert isinstance( block, np.ndarray ) and block.dtype == np.float32
+        assert block.shape[1] <= 6 and block.shape[2] <= 6
+        result[ :, ys, xs ] = block
+    np.testing.assert_array_equal( result, expected( data )[ :5 ] )
@@ -0,0 +1,43 @@
+import numpy as np
+import math, itertools
+from sklearn.linear_model import LinearRegression
+from geoproc.aviris.regression import GramRegression
+
+def regression_problem( nsamples: int = 300, nbands: int = 8, seed: int = 0 ):
+    rng = np.random.default_rng( seed )
+    x = rng.normal( size=( nsamples, nbands ) ) + rng.normal( size=nbands )
+    y = x @ rng.normal( size=nbands ) + 3.0 + 0.1 * rng.normal( size=nsamples )
+    return x, y
+
+def sklearn_rmse( x: np.ndarray, y: np.ndarray, bands ) -> float:
+    estimator = LinearRegression().fit( x[ :, bands ], y )
+    diff = estimator.predict( x[ :, bands ] ) - y
+    return math.sqrt( np.mean( diff * diff ) )
+
+def test_solve_matches_linear_regression():
+    x, y = regression_problem()
+    regression = GramRegression( x, y, chunk_size=64 )
+    for bands in ( None, [ 2 ], [ 0, 5, 7 ], [ 6, 1, 3, 4 ] ):
+        selection = list( range( x.shape[1] ) ) if bands is None else bands
+        estimator = LinearRegression().fit( x[ :, selection ], y )
+        coef, intercept, error = regression.solve( bands )
+        assert np.allclose( coef, estimator.coef_, atol=1e-8 )
+        assert np.isclose( intercept, estimator.intercept_, atol=1e-8 )
+        assert np.isclose( error, sklearn_rmse( x, y, selection ), rtol=1e-6 )
+
+def test_forward_selection_matches_refitting():
+    x, y = regression_problem()
+    regression = GramRegression( x, y )
+    selected, errors = regression.forward_selection( 4 )
+    reference = []
+    for iS in range( 4 ):
+        remaining = [ band for band in range( x.shape[1] ) if band not in reference ]
+        reference.append( min( remaining, key=lambda band: sklearn_rmse( x, y, reference + [ band ] ) ) )
+        assert np.isclose( errors[iS], sklearn_rmse( x, y, reference ), rtol=1e-6 )
+    assert selected == reference
+
+def test_best_subset_matches_exhaustive_refitting():
+    x, y = regression_problem( nbands=6 )
+    bands, error = GramRegression( x, y ).best_subset( 2 )
+    reference = min( itertools.combinations( range( 6 ), 2 ), key=lambda subset: sklearn_rmse( x, y, list( subset ) ) )
+    assert bands == list( reference ) and np.isclose( error, sklearn_rmse( x, y, list( reference ) ), rtol=1e-6 )
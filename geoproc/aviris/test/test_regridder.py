@@ -0,0 +1,49 @@
+import os
+import numpy as np
+import pytest
+from multiprocessing import cpu_count
+
+pytest.importorskip( "osgeo" )
+rasterio = pytest.importorskip( "rasterio" )
+from geoproc.aviris import regridder
+from geoproc.aviris.regridder import AvirisWarp, default_nthreads
+
+def write_tif( path: str, shape=( 3, 4, 5 ) ):
+    with rasterio.open( path, "w", driver="GTiff", count=shape[0], height=shape[1], width=shape[2], dtype="float32" ) as dst:
+        dst.write( np.zeros( shape, dtype=np.float32 ) )
+
+@pytest.fixture
+def flight_files( tmp_path ):
+    """ Two input images ( never read here ): the first already warped to a valid output file, the second not """
+    input_dir = tmp_path / "input" / "f190101" / "refl"
+    input_dir.mkdir( parents=True )
+    for name in [ "ang1_img", "ang2_img" ]: ( input_dir / name ).write_bytes( b"" )
+    output_dir = tmp_path / "output"
+    ( output_dir / "f190101" / "refl" ).mkdir( parents=True )
+    write_tif( str( output_dir / "f190101" / "refl" / "ang1.tif" ) )
+    return str( input_dir / "*_img" ), str( output_dir )
+
+def test_default_threads_share_cpus():
+    for nproc in [ 1, 2, max( cpu_count() // 4, 1 ), cpu_count(), 2 * cpu_count() ]:
+        assert 1 <= nproc * default_nthreads( nproc ) <= max( cpu_count(), nproc )
+    assert AvirisWarp( "unused" ).warp_threads() == 'ALL_CPUS'
+    assert AvirisWarp( "unused", nthreads=3 ).warp_threads() == '3'
+
+def test_inventory_skips_by_size( flight_files, monkeypatch ):
+    files_glob, output_dir = flight_files
+    output_file = os.path.join( output_dir, "f190101", "refl", "ang1.tif" )
+    unprocessed = AvirisWarp( output_dir ).get_unprocessed_filepaths( files_glob )
+    assert [ os.path.basename( path ) for path in unprocessed ] == [ "ang2_img" ]
+    record = AvirisWarp( output_dir ).inventory[ output_file ]
+    assert ( record['size'], record['shape'] ) == ( os.path.getsize( output_file ), [ 3, 4, 5 ] )
+
+    def no_open( path ): raise AssertionError( f"{path} opened" )
+    monkeypatch.setattr( regridder.gdal, "Open", no_open )
+    unprocessed = AvirisWarp( output_dir ).get_unprocessed_filepaths( files_glob )
+    assert [ os.path.basename( path ) for path in unprocessed ] == [ "ang2_img" ]
+    monkeypatch.undo()
+
+    with open( output_file, "r+b" ) as f: f.truncate( 100 )
+    unprocessed = AvirisWarp( output_dir ).get_unprocessed_filepaths( files_glob )
+    assert sorted( os.path.basename( path ) for path in unprocessed ) == [ "ang1_img", "ang2_img" ]
+    assert not os.path.isfile( output_file )
@@ -0,0 +1,38 @@
+import numpy as np
+import xarray as xa
+from geoproc.aviris.manager import AvirisDataManager
+
+def training_arrays( nbands: int = 4, ny: int = 11, nx: int = 13, seed: int = 0 ):
+    rng = np.random.default_rng( seed )
+    x = rng.normal( size=( nbands, ny, nx ) ).astype( np.float32 )
+    y = rng.normal( size=( 1, ny, nx ) ).astype( np.float32 )
+    x[ 1, 2, 3 ] = x[ 3, 7, 0 ] = x[ 0, 10, 12 ] = np.nan
+    y[ 0, 5, 5 ] = y[ 0, 0, 0 ] = np.nan
+    coords = dict( y=np.arange( ny ), x=np.arange( nx ) )
+    return ( xa.DataArray( x, dims=[ 'band', 'y', 'x' ], coords=dict( band=np.arange( 1, nbands + 1 ), **coords ) ),
+             xa.DataArray( y, dims=[ 'band', 'y', 'x' ], coords=dict( band=[ 1 ], **coords ) ) )
+
+def test_memmap_samples_match_in_memory( tmp_path ):
+    x_data, y_data = training_arrays()
+    mgr = AvirisDataManager( block_size=4 )
+    x_train, y_train = mgr.restructure_for_training( x_data, y_data )
+    x_samples, y_samples, indices = mgr.extract_training_samples( x_data, y_data, str( tmp_path / "samples" ) )
+    valid = np.isfinite( x_data.values ).all( axis=0 ) & np.isfinite( y_data.values[0] )
+    assert isinstance( x_samples, np.memmap ) and isinstance( y_samples, np.memmap )
+    assert np.array_equal( indices, np.flatnonzero( valid ) )
+    assert np.array_equal( x_samples, x_train.values ) and np.array_equal( y_samples, y_train.values )
+    reopened = mgr.open_training_samples( str( tmp_path / "samples" ) )
+    assert all( np.array_equal( a, b ) for a, b in zip( reopened, ( x_samples, y_samples, indices ) ) )
+
+def test_restructure_for_training_out_of_core( tmp_path ):
+    x_data, y_data = training_arrays()
+    mgr = AvirisDataManager( block_size=5 )
+    for transpose in [ True, False ]:
+        x_train, y_train = mgr.restructure_for_training( x_data, y_data, transpose )
+        x_mapped, y_mapped = mgr.restructure_for_training( x_data, y_data, transpose, output_path=str( tmp_path / "training" ) )
+        assert x_mapped.dims == x_train.dims and np.array_equal( x_mapped.band.values, x_train.band.values )
+        assert np.array_equal( x_mapped.values, x_train.values ) and np.array_equal( y_mapped.values, y_train.values )
+        assert np.array_equal( x_mapped.samples.values, x_train.samples.values )
+    x_binned, y_binned = mgr.get_binned_sampling( *mgr.restructure_for_training( x_data, y_data, output_path=str( tmp_path / "training" ) ), 4, 3 )
+    x_ref, y_ref = mgr.get_binned_sampling( *mgr.restructure_for_training( x_data, y_data ), 4, 3 )
+    assert np.array_equal( x_binned.values, x_ref.values ) and np.array_equal( y_binned.values, y_ref.values )
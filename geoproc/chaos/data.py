@@ -26,3 +26,12 @@ class ProjectDataSource(DataSource):
         dataset: xa.Dataset = xa.open_dataset( self.dataFile, decode_times=False )
         return dataset
 
+    def getTimeSeries( self, dim: str = "time", **kwargs ) -> Dict[str,xa.DataArray]:
+        """ All complete ( nan-free ) 1-D series of the dataset along dim, e.g. every CVDP index time series """
+        dataset = self.getDataset( **kwargs )
+        series = {}
+        for name, variable in dataset.data_vars.items():
+            if ( variable.dims == ( dim, ) ) and ( variable.dtype.kind == 'f' ) and bool( np.isfinite( variable.values ).all() ):
+                series[ name ] = variable
+        return series
+
@@ -1,21 +1,88 @@
 from geoproc.chaos.data import ProjectDataSource
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.spatial import cKDTree
 import numpy as np
 import xarray as xa
 import matplotlib.pyplot as plt
+from typing import List, Dict, Tuple, Optional, Sequence
 
-npoints = 24
-start = 0
-series_name = "pdo_timeseries_mon"  #  "amo_timeseries_mon", "pdo_timeseries_mon", "indian_ocean_dipole", "nino34"
-source = ProjectDataSource( "HadISST_1.cvdp_data.1980-2017" )
-dset: xa.Dataset = source.getDataset( )
-variable: xa.DataArray = dset[ series_name ]
-if npoints <= 0:
-    x = variable[:-1]
-    y = variable[1:]
-else:
-    x = variable[start:npoints]
-    y = variable[start+1:npoints+1]
-
-plt.scatter( x, y, s=10 )
-plt.plot(x, y, 'C3', lw=1)
-plt.show()
\ No newline at end of file
+def delay_embedding( series: np.ndarray, dim: int, lag: int = 1 ) -> np.ndarray:
+    """ Delay vectors [ x(t), x(t+lag), ..., x(t+(dim-1)*lag) ] of a series ( or of each row of a ( series, time ) array ),
+        as a zero-copy ( ..., n_vectors, dim ) strided view of the input """
+    window = ( dim - 1 ) * lag + 1
+    return sliding_window_view( series, window, axis=-1 )[ ..., ::lag ]
+
+def recurrence_matrix( embedding: np.ndarray, radius: float = None ) -> np.ndarray:
+    """ Boolean matrix of pairs of delay vectors closer than radius ( default: 10% of the attractor's largest extent ),
+        found with a KD-tree ball query """
+    if radius is None: radius = 0.1 * np.ptp( embedding, axis=0 ).max()
+    pairs = cKDTree( embedding ).query_pairs( radius, output_type='ndarray' )
+    recurrences = np.eye( embedding.shape[0], dtype=bool )
+    recurrences[ pairs[:,0], pairs[:,1] ] = True
+    recurrences[ pairs[:,1], pairs[:,0] ] = True
+    return recurrences
+
+def recurrence_rate( embedding: np.ndarray, radius: float = None ) -> float:
+    """ Fraction of recurrent pairs, counted with the KD-tree without forming the recurrence matrix """
+    if radius is None: radius = 0.1 * np.ptp( embedding, axis=0 ).max()
+    n = embedding.shape[0]
+    npairs = cKDTree( embedding ).count_neighbors( cKDTree( embedding ), radius )
+    return ( npairs - n ) / float( n * ( n - 1 ) )
+
+def nearest_neighbors( embedding: np.ndarray, k: int = 1, theiler: int = 0 ) -> Tuple[np.ndarray,np.ndarray]:
+    """ Distances and indices of the k nearest neighbors of each delay vector, excluding itself and the vectors
+        less than theiler steps away in time """
+    nquery = min( k + 2 * theiler + 1, embedding.shape[0] )
+    distances, indices = cKDTree( embedding ).query( embedding, nquery )
+    distances, indices = distances.reshape( embedding.shape[0], -1 ), indices.reshape( embedding.shape[0], -1 )
+    valid = np.abs( indices - np.arange( embedding.shape[0] )[:,None] ) > theiler
+    order = np.argsort( ~valid, axis=1, kind='stable' )[ :, :k ]
+    distances, indices = np.take_along_axis( distances, order, 1 ), np.take_along_axis( indices, order, 1 )
+    return distances, indices
+
+def false_nearest_neighbors( series: np.ndarray, dims: Sequence[int], lag: int = 1, rtol: float = 10.0, theiler: int = 0 ) -> np.ndarray:
+    """ Fraction of false nearest neighbors ( Kennel et al. ) for each embedding dimension: neighbors in dimension d whose
+        separation grows by more than rtol times their distance when the ( d+1 )th delay coordinate is added """
+    fractions = []
+    for dim in dims:
+        n = series.size - dim * lag
+        embedding = delay_embedding( series, dim, lag )[ :n ]
+        distances, indices = nearest_neighbors( embedding, 1, theiler )
+        growth = np.abs( series[ np.arange( n ) + dim * lag ] - series[ indices[:,0] + dim * lag ] )
+        fractions.append( np.mean( growth > rtol * np.maximum( distances[:,0], 1e-12 ) ) )
+    return np.array( fractions )
+
+def embedding_statistics( series: Dict[str,xa.DataArray], dims: Sequence[int] = ( 2, 3, 4, 5, 6 ), lag: int = 1, **kwargs ) -> xa.Dataset:
+    """ False nearest neighbor fraction, recurrence rate and mean nearest neighbor distance of the ( standardized ) delay
+        embeddings of every series, for each dimension.  Series of equal length share one strided embedding view. """
+    theiler = kwargs.get( 'theiler', lag )
+    names = list( series.keys() )
+    data = np.stack( [ series[name].values for name in names ] ).astype( np.float64 )
+    data = ( data - data.mean( axis=1, keepdims=True ) ) / data.std( axis=1, keepdims=True )
+    fnn = np.stack( [ false_nearest_neighbors( row, dims, lag, kwargs.get( 'rtol', 10.0 ), theiler ) for row in data ] )
+    rates, nn_distances = np.zeros( fnn.shape ), np.zeros( fnn.shape )
+    for iDim, dim in enumerate( dims ):
+        embeddings = delay_embedding( data, dim, lag )
+        for iSeries in range( len( names ) ):
+            rates[ iSeries, iDim ] = recurrence_rate( embeddings[iSeries], kwargs.get( 'radius', None ) )
+            nn_distances[ iSeries, iDim ] = nearest_neighbors( embeddings[iSeries], 1, theiler )[0].mean()
+    coords = dict( series=names, dim=list( dims ) )
+    return xa.Dataset( dict( fnn=( ( "series", "dim" ), fnn ), recurrence_rate=( ( "series", "dim" ), rates ), nn_distance=( ( "series", "dim" ), nn_distances ) ),
+                       coords=coords, attrs=dict( lag=lag, theiler=theiler ) )
+
+if __name__ == "__main__":
+    npoints = 24
+    start = 0
+    series_name = "pdo_timeseries_mon"  #  "amo_timeseries_mon", "pdo_timeseries_mon", "indian_ocean_dipole", "nino34"
+    source = ProjectDataSource( "HadISST_1.cvdp_data.1980-2017" )
+    dset: xa.Dataset = source.getDataset( )
+    variable: xa.DataArray = dset[ series_name ]
+    embedding = delay_embedding( variable.values, 2, 1 )
+    if npoints > 0: embedding = embedding[ start:npoints ]
+
+    print( embedding_statistics( source.getTimeSeries() ).to_dataframe() )
+
+    x, y = embedding[:,0], embedding[:,1]
+    plt.scatter( x, y, s=10 )
+    plt.plot(x, y, 'C3', lw=1)
+    plt.show()
@@ -0,0 +1,72 @@
+import numpy as np
+import xarray as xa
+import pytest
+from geoproc.chaos.phase_space import delay_embedding, recurrence_matrix, recurrence_rate, nearest_neighbors, false_nearest_neighbors, embedding_statistics
+
+def logistic_map( n: int = 300, r: float = 3.9, x0: float = 0.4 ) -> np.ndarray:
+    series = np.empty( n )
+    series[0] = x0
+    for i in range( 1, n ): series[i] = r * series[i-1] * ( 1.0 - series[i-1] )
+    return series
+
+def distances( embedding: np.ndarray ) -> np.ndarray:
+    return np.sqrt( ( ( embedding[:,None,:] - embedding[None,:,:] ) ** 2 ).sum( axis=-1 ) )
+
+def reference_nearest( embedding: np.ndarray, theiler: int ) -> np.ndarray:
+    dist = distances( embedding )
+    return np.array( [ min( dist[i,j] for j in range( len( embedding ) ) if abs( i - j ) > theiler ) for i in range( len( embedding ) ) ] )
+
+def reference_fnn( series: np.ndarray, dim: int, lag: int, rtol: float, theiler: int ) -> float:
+    n = series.size - dim * lag
+    embedding = np.array( [ [ series[ t + i * lag ] for i in range( dim ) ] for t in range( n ) ] )
+    dist, nfalse = distances( embedding ), 0
+    for t in range( n ):
+        candidates = [ j for j in range( n ) if abs( t - j ) > theiler ]
+        j = min( candidates, key=lambda j: dist[t,j] )
+        nfalse += abs( series[ t + dim * lag ] - series[ j + dim * lag ] ) > rtol * max( dist[t,j], 1e-12 )
+    return nfalse / n
+
+@pytest.mark.parametrize( "dim,lag", [ ( 1, 1 ), ( 3, 1 ), ( 4, 3 ) ] )
+def test_delay_embedding( dim, lag ):
+    series = np.sin( 0.3 * np.arange( 40 ) )
+    embedding = delay_embedding( series, dim, lag )
+    expected = np.array( [ [ series[ t + i * lag ] for i in range( dim ) ] for t in range( series.size - ( dim - 1 ) * lag ) ] )
+    assert embedding.shape == expected.shape and np.array_equal( embedding, expected )
+    rows = np.stack( [ series, 2 * series ] )
+    assert np.array_equal( delay_embedding( rows, dim, lag ), np.stack( [ expected, 2 * expected ] ) )
+    assert np.shares_memory( embedding, series )
+
+def test_recurrence_matrix_and_rate():
+    embedding = np.ascontiguousarray( delay_embedding( logistic_map( 200 ), 2 ) )
+    for radius in [ None, 0.05 ]:
+        recurrences = recurrence_matrix( embedding, radius )
+        r = 0.1 * np.ptp( embedding, axis=0 ).max() if radius is None else radius
+        expected = distances( embedding ) <= r
+        assert np.array_equal( recurrences, recurrences.T ) and recurrences.diagonal().all()
+        assert np.array_equal( recurrences, expected )
+        n = embedding.shape[0]
+        assert np.isclose( recurrence_rate( embedding, radius ), ( expected.sum() - n ) / ( n * ( n - 1 ) ) )
+
+@pytest.mark.parametrize( "theiler", [ 0, 2 ] )
+def test_nearest_neighbors( theiler ):
+    embedding = np.ascontiguousarray( delay_embedding( logistic_map( 150 ), 3 ) )
+    dist, indices = nearest_neighbors( embedding, 1, theiler )
+    assert np.allclose( dist[:,0], reference_nearest( embedding, theiler ) )
+    assert ( np.abs( indices[:,0] - np.arange( embedding.shape[0] ) ) > theiler ).all()
+
+@pytest.mark.parametrize( "lag,theiler", [ ( 1, 0 ), ( 2, 2 ) ] )
+def test_false_nearest_neighbors( lag, theiler ):
+    series = logistic_map( 150 ) + 0.01 * np.sin( np.arange( 150 ) )
+    dims = [ 1, 2, 3 ]
+    fnn = false_nearest_neighbors( series, dims, lag, 5.0, theiler )
+    assert np.allclose( fnn, [ reference_fnn( series, dim, lag, 5.0, theiler ) for dim in dims ] )
+    assert fnn[0] > fnn[-1]
+
+def test_embedding_statistics():
+    series = dict( logistic=xa.DataArray( logistic_map( 120 ) ), sine=xa.DataArray( np.sin( 0.2 * np.arange( 120 ) ) ) )
+    stats = embedding_statistics( series, dims=( 2, 3 ) )
+    assert stats.fnn.shape == ( 2, 2 ) and list( stats.series.values ) == [ "logistic", "sine" ]
+    row = series["sine"].values
+    row = ( row - row.mean() ) / row.std()
+    assert np.allclose( stats.fnn.sel( series="sine" ), false_nearest_neighbors( row, ( 2, 3 ), 1, 10.0, 1 ) )
+    assert np.isclose( stats.recurrence_rate.sel( series="sine", dim=3 ), recurrence_rate( np.ascontiguousarray( delay_embedding( row, 3 ) ) ) )
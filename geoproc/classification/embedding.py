@@ -0,0 +1,71 @@
+import xarray as xa
+import numpy as np
+from typing import List, Union, Tuple, Optional
+from geoproc.aviris.manager import AvirisDataManager
+from geoproc.data.sampling import get_binned_sample_indices
+from geoproc.util.artifacts import ArtifactStore
+import time
+
+class UMAPEmbedding:
+    """
+    Full-scene UMAP embedding of a (band,y,x) array: UMAP ( approximate nearest neighbors via pynndescent ) is fit on a
+    subsample of the valid pixels stratified by brightness, and all pixels are then embedded with the fitted model's
+    transform in parallel batches, tile by tile, into a (component,y,x) array aligned with the input grid.
+    """
+
+    def __init__(self, n_components: int = 3, block_size: int = 512, **umap_args ):
+        self.n_components = n_components
+        self.umap_args = umap_args
+        self.mgr = AvirisDataManager( block_size=block_size )
+        self.mapper = None
+
+    def get_training_samples( self, band_data: xa.DataArray, n_samples: int, n_bins: int = 16 ) -> np.ndarray:
+        """ Two passes over the tiles: the first collects the brightness ( band mean ) of each valid pixel, the second gathers
+            the spectra of a brightness-stratified selection of n_samples pixels """
+        brightness, flat_indices = [], []
+        nx = band_data.shape[-1]
+        for ys, xs, block in self.mgr.iter_blocks( band_data ):
+            iy, ix = np.nonzero( np.isfinite( block ).all( axis=0 ) )
+            brightness.append( block[ :, iy, ix ].mean( axis=0 ) )
+            flat_indices.append( ( iy + ys.start ) * nx + ( ix + xs.start ) )
+        flat_indices = np.concatenate( flat_indices )
+        selection = get_binned_sample_indices( np.concatenate( brightness ), n_bins, max( n_samples // n_bins, 1 ) )
+        selected = np.sort( flat_indices[ selection ] )
+        samples = []
+        for ys, xs, block in self.mgr.iter_blocks( band_data ):
+            block_indices = selected[ ( selected >= ys.start * nx ) & ( selected < ys.stop * nx ) ]
+            iy, ix = block_indices // nx - ys.start, block_indices % nx
+            in_block = ( ix >= xs.start ) & ( ix < xs.stop )
+            samples.append( block[ :, iy[in_block], ix[in_block] - xs.start ].transpose() )
+        return np.concatenate( samples )
+
+    def fit( self, band_data: xa.DataArray, n_samples: int = 100000, n_bins: int = 16 ):
+        import umap
+        t0 = time.time()
+        training_samples = self.get_training_samples( band_data, n_samples, n_bins )
+        t1 = time.time()
+        print( f"Selected {training_samples.shape[0]} training samples in {t1-t0:.1f} sec, now fitting umap to {self.n_components} dims" )
+        self.mapper = umap.UMAP( n_components=self.n_components, **self.umap_args ).fit( training_samples )
+        print( f"Completed umap fitting in {time.time()-t1:.1f} sec" )
+        return self.mapper
+
+    def transform( self, band_data: xa.DataArray, output_path: str = None, **kwargs ) -> xa.DataArray:
+        """ Embeds every valid pixel ( nan elsewhere ); kwargs: nproc, batch_size ( see AvirisDataManager.apply_blocks ) """
+        from multiprocessing import cpu_count
+        t0 = time.time()
+        kwargs['nproc'] = kwargs.get( 'nproc', cpu_count() )
+        kwargs['batch_size'] = kwargs.get( 'batch_size', 20000 )
+        embedding = self.mgr.transform_blocks( self.mapper, band_data, self.n_components, output_path, name="embedding", **kwargs )
+        print( f"Completed umap transform of {band_data.shape[-2]*band_data.shape[-1]} pixels in {time.time()-t0:.1f} sec" )
+        return embedding
+
+    def save( self, path: str, **metadata ) -> ArtifactStore:
+        return ArtifactStore.save_umap( path, self.mapper, **metadata )
+
+    def run( self, band_data: xa.DataArray, path: str, n_samples: int = 100000, **kwargs ) -> ArtifactStore:
+        """ Fits, saves the model to an ArtifactStore at path, and writes the full-scene embedding directly into the store """
+        self.fit( band_data, n_samples, kwargs.pop( 'n_bins', 16 ) )
+        store = self.save( path, **kwargs.pop( 'metadata', {} ) )
+        self.transform( band_data, store.path_for( 'embedding' ), **kwargs )
+        store.register( 'embedding' )
+        return store
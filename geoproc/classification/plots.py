@@ -12,8 +12,6 @@ import matplotlib.cm
 import plotly
 import plotly.graph_objs as go
 from matplotlib.patches import Patch
-from umap.nndescent import initialise_search, initialized_nnd_search
-from umap.utils import deheap_sort, submatrix
 
 
 fire_cmap = matplotlib.colors.LinearSegmentedColormap.from_list("fire", colorcet.fire)
@@ -30,11 +28,9 @@ darkpurple_cmap = matplotlib.colors.LinearSegmentedColormap.from_list(
     "darkpurple", colorcet.linear_bmw_5_95_c89
 )
 
-plt.register_cmap("fire", fire_cmap)
-plt.register_cmap("darkblue", darkblue_cmap)
-plt.register_cmap("darkgreen", darkgreen_cmap)
-plt.register_cmap("darkred", darkred_cmap)
-plt.register_cmap("darkpurple", darkpurple_cmap)
+for _cmap in [fire_cmap, darkblue_cmap, darkgreen_cmap, darkred_cmap, darkpurple_cmap]:
+    if hasattr(matplotlib, "colormaps"): matplotlib.colormaps.register(_cmap, force=True)
+    else:                                plt.register_cmap(_cmap.name, _cmap)
 
 
 def _to_hex(arr):
@@ -131,6 +127,28 @@ def _get_extent(points):
 
     return extent
 
+def _get_extent_chunked(points, chunk_size):
+    """Compute bounds on a chunked ( memmap or dask ) space, one chunk at a time"""
+    mins, maxs = np.full(2, np.inf), np.full(2, -np.inf)
+    for i0 in range(0, points.shape[0], chunk_size):
+        chunk = np.asarray(points[i0:i0 + chunk_size, :2], dtype=np.float64)
+        mins = np.fmin(mins, np.nanmin(chunk, axis=0))
+        maxs = np.fmax(maxs, np.nanmax(chunk, axis=0))
+    return _get_extent(np.stack([mins, maxs]))
+
+def _value_range_chunked(values, chunk_size):
+    min_val, max_val = np.inf, -np.inf
+    for i0 in range(0, values.shape[0], chunk_size):
+        chunk = np.asarray(values[i0:i0 + chunk_size], dtype=np.float64)
+        min_val, max_val = min(min_val, np.nanmin(chunk)), max(max_val, np.nanmax(chunk))
+    return min_val, max_val
+
+def _value_categories(values, min_val, max_val, nlevels=256):
+    """Bin values into nlevels categories without hashing the raw values"""
+    bin_size = (max_val - min_val) / (nlevels - 1.0) if max_val > min_val else 1.0
+    codes = np.clip(np.round((values - min_val) / bin_size), 0, nlevels - 1).astype(np.int16)
+    return pd.Categorical.from_codes(codes, categories=np.arange(nlevels))
+
 def _embed_datashader_in_an_axis(datashader_image, ax):
     img_rev = datashader_image.data[::-1]
     mpl_img = np.dstack([_blue(img_rev), _green(img_rev), _red(img_rev)])
@@ -262,3 +280,69 @@ def datashade_points(
     plt.show()
     return ax
 
+
+def datashade_points_chunked(
+    points,
+    ax=None,
+    values=None,
+    cmap="Blues",
+    background="white",
+    vrange = None,
+    width=800,
+    height=800,
+    chunk_size=5000000 ):
+    """ Variant of datashade_points for chunked or memory-mapped ( or dask ) point and value arrays: the canvas aggregation
+        is accumulated one chunk at a time, so memory is bounded by chunk_size and the canvas size rather than the number of points.
+        Values are always binned to 256 levels ( vectorized, as in datashade_points for >= 256 unique values ). """
+
+    if ax is None:
+        dpi = plt.rcParams["figure.dpi"]
+        fig = plt.figure(figsize=(width / dpi, height / dpi))
+        ax = fig.add_subplot(111)
+
+    extent = _get_extent_chunked(points, chunk_size)
+    canvas = ds.Canvas(
+        plot_width=width,
+        plot_height=height,
+        x_range=(extent[0], extent[1]),
+        y_range=(extent[2], extent[3]),
+    )
+    if values is not None:
+        if values.shape[0] != points.shape[0]:
+            raise ValueError(
+                "Values must have a value for "
+                "each sample (size mismatch: {} {})".format(
+                    values.shape[0], points.shape[0]
+                )
+            )
+        (min_val, max_val) = _value_range_chunked(values, chunk_size) if vrange is None else vrange
+
+    aggregation = None
+    for i0 in range(0, points.shape[0], chunk_size):
+        chunk = np.asarray(points[i0:i0 + chunk_size, :2])
+        valid = np.isfinite(chunk).all(axis=1)
+        data = pd.DataFrame(chunk[valid], columns=("x", "y"))
+        if values is not None:
+            chunk_values = np.asarray(values[i0:i0 + chunk_size])[valid]
+            valid_values = np.isfinite(chunk_values)
+            data = data[valid_values]
+            data["val_cat"] = _value_categories(chunk_values[valid_values], min_val, max_val)
+            chunk_aggregation = canvas.points(data, "x", "y", agg=ds.count_cat("val_cat"))
+        else:
+            chunk_aggregation = canvas.points(data, "x", "y", agg=ds.count())
+        if aggregation is None: aggregation = chunk_aggregation
+        else:                   aggregation.data += chunk_aggregation.data
+
+    if values is not None:
+        color_key = _to_hex(plt.get_cmap(cmap)(np.linspace(0, 1, 256)))
+        result = tf.shade(aggregation, color_key=color_key, how="eq_hist")
+    else:
+        result = tf.shade(aggregation, cmap=plt.get_cmap(cmap))
+
+    if background is not None:
+        result = tf.set_background(result, background)
+
+    _embed_datashader_in_an_axis(result, ax)
+    ax.set(xticks=[], yticks=[])
+    plt.show()
+    return ax
@@ -0,0 +1,55 @@
+import numpy as np
+import xarray as xa
+import pytest
+from geoproc.classification.embedding import UMAPEmbedding
+from geoproc.util.artifacts import ArtifactStore
+
+class FakeMapper:
+    """ Stands in for a fitted umap.UMAP: a fixed linear projection, recording the size of each transform call """
+    n_components, n_neighbors = 2, 5
+
+    def __init__(self, nbands: int ):
+        self.projection = np.arange( nbands * self.n_components, dtype=np.float32 ).reshape( nbands, self.n_components ) / nbands
+        self.embedding_ = np.ones( [ 10, self.n_components ], np.float32 )
+        self.batches = []
+
+    def transform(self, samples: np.ndarray ) -> np.ndarray:
+        self.batches.append( samples.shape[0] )
+        return samples @ self.projection
+
+@pytest.fixture
+def band_data() -> xa.DataArray:
+    data = np.random.default_rng(0).random( [ 4, 37, 29 ] ).astype( np.float32 )
+    data[ :, 3, 5 ] = np.nan
+    data[ 2, 20:24, 10 ] = np.nan
+    return xa.DataArray( data, dims=[ 'band', 'y', 'x' ], coords=dict( y=np.arange( 37 ), x=np.arange( 29 ) ) )
+
+def expected_embedding( band_data: xa.DataArray, mapper: FakeMapper ) -> np.ndarray:
+    data = band_data.values
+    result = np.einsum( 'byx,bc->cyx', data, mapper.projection )
+    result[ :, ~np.isfinite( data ).all( axis=0 ) ] = np.nan
+    return result
+
+@pytest.mark.parametrize( "nproc", [ 1, 2 ] )
+def test_transform_is_batched_and_tiled( band_data, nproc ):
+    embedder = UMAPEmbedding( n_components=2, block_size=16 )
+    embedder.mapper = FakeMapper( band_data.shape[0] )
+    embedding = embedder.transform( band_data, nproc=nproc, batch_size=50 )
+    assert embedding.dims == ( 'component', 'y', 'x' )
+    np.testing.assert_array_equal( embedding.coords['x'], band_data.coords['x'] )
+    np.testing.assert_allclose( embedding.values, expected_embedding( band_data, embedder.mapper ), rtol=1e-5 )
+    if nproc == 1:
+        assert max( embedder.mapper.batches ) <= 50
+        assert sum( embedder.mapper.batches ) == np.isfinite( band_data.values ).all( axis=0 ).sum()
+
+def test_transform_into_store( band_data, tmp_path ):
+    embedder = UMAPEmbedding( n_components=2, block_size=16 )
+    embedder.mapper = FakeMapper( band_data.shape[0] )
+    store = embedder.save( str( tmp_path / "umap" ), tile="t0" )
+    embedder.transform( band_data, store.path_for( 'embedding' ), nproc=1, batch_size=64 )
+    store.register( 'embedding' )
+    reopened = ArtifactStore( str( tmp_path / "umap" ) )
+    assert reopened.metadata == dict( tile="t0", n_components=2, n_neighbors=5 )
+    np.testing.assert_allclose( reopened['embedding'], expected_embedding( band_data, embedder.mapper ), rtol=1e-5 )
+    np.testing.assert_array_equal( reopened['training_embedding'], embedder.mapper.embedding_ )
+    assert isinstance( reopened.model, FakeMapper )
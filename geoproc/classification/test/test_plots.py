@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+import matplotlib as mpl
+mpl.use( "Agg" )
+import matplotlib.pyplot as plt
+
+pytest.importorskip( "datashader" )
+from geoproc.classification.plots import datashade_points, datashade_points_chunked, _get_extent, _get_extent_chunked
+
+def embedding( npoints: int = 20000, seed: int = 0 ):
+    """ Two point clusters, with values spread over every one of the 256 value levels ( datashade_points assigns its colors
+        to the levels that occur, the chunked variant to all 256, so the two only agree when every level is present ) """
+    rng = np.random.default_rng( seed )
+    points = np.concatenate( [ rng.normal( size=( npoints // 2, 2 ) ), rng.normal( 4.0, 0.5, size=( npoints // 2, 2 ) ) ] )
+    values = rng.permutation( np.linspace( -2.0, 4.0, npoints ) )
+    return points, values
+
+def shaded( plot, *args, **kwargs ) -> np.ndarray:
+    ax = plot( *args, width=120, height=90, **kwargs )
+    image = np.asarray( ax.images[0].get_array() )
+    plt.close( ax.figure )
+    return image
+
+def test_extent_chunked():
+    points, values = embedding()
+    assert _get_extent_chunked( points, 999 ) == _get_extent( points )
+
+@pytest.mark.parametrize( "with_values,vrange", [ ( False, None ), ( True, None ), ( True, ( -1.0, 3.0 ) ) ] )
+def test_chunked_matches_datashade_points( tmp_path, with_values, vrange ):
+    points, values = embedding()
+    if not with_values: values = None
+    np.save( tmp_path / "points.npy", points )
+    mapped = np.load( tmp_path / "points.npy", mmap_mode="r" )
+    expected = shaded( datashade_points, points, values=values, vrange=vrange, cmap="viridis" )
+    assert np.array_equal( shaded( datashade_points_chunked, mapped, values=values, vrange=vrange, cmap="viridis", chunk_size=3001 ), expected )
@@ -1,7 +1,6 @@
 import xarray as xa
-import umap, time, pickle
-import umap.plot
 from typing import List, Union, Tuple, Optional
+from geoproc.classification.embedding import UMAPEmbedding
 import os, math
 
 
@@ -18,33 +17,18 @@ def normalize( bands: xa.DataArray ):
     std = bands.std( dim=bands.dims[1:], skipna=True )
     return ( bands - meanval ) / std
 
-def restructure_for_training( band_data: xa.DataArray ) -> xa.DataArray:
-    normalized = normalize( band_data )
-    training_data = normalized.stack( samples=normalized.dims[1:] ).transpose().dropna( dim='samples', how='any' )
-    print( f"training_data: shape = {training_data.shape}, dims = {training_data.dims}, {training_data.shape[0]} valid samples out of {normalized.shape[1]*normalized.shape[2]} pixels" )
-    return training_data
-
-c0 = (1000,1000)
-c1 = (2000,2000)
-subsampling = 5
-ndims = 3
-
-data_dir = "/Users/tpmaxwel/Dropbox/Tom/Data/Aviris/processed"
-output_dir = "/usr/local/web/ILAB/data/results/umap"
-input_file = os.path.join( data_dir, f"ang20170720t004130.{c0[0]}-{c0[1]}_{c1[0]}-{c1[1]}.nc" )
-output_file = os.path.join( output_dir, f"umap-model.ang20170720t004130.{c0[0]}-{c1[1]}_{c1[0]}-{c1[1]}.s-{subsampling}.d-{ndims}.pkl" )
-
-t0 = time.time()
-bands: xa.DataArray = read( input_file, c0, c1 )
-training_data: xa.DataArray = restructure_for_training( bands )
-subsample = training_data[::subsampling]
-t1 = time.time()
-print( f"Completed data prep in {(t1-t0)} sec, Now fitting umap to {ndims} dims with {subsample.shape[0]} samples")
-mapper = umap.UMAP( n_components=ndims ).fit( subsample )
-t2 = time.time()
-print( f"Completed umap fitting in {(t2-t1)} sec, saving to file {output_file}")
-pickle.dump( mapper, open( output_file, 'wb' ) )
-
-
-
-
+if __name__ == '__main__':
+    c0 = (1000,1000)
+    c1 = (2000,2000)
+    n_training_samples = 200000
+    ndims = 3
+
+    data_dir = "/Users/tpmaxwel/Dropbox/Tom/Data/Aviris/processed"
+    output_dir = "/usr/local/web/ILAB/data/results/umap"
+    input_file = os.path.join( data_dir, f"ang20170720t004130.{c0[0]}-{c0[1]}_{c1[0]}-{c1[1]}.nc" )
+    output_file = os.path.join( output_dir, f"umap-model.ang20170720t004130.{c0[0]}-{c1[1]}_{c1[0]}-{c1[1]}.n-{n_training_samples}.d-{ndims}" )
+
+    bands: xa.DataArray = read( input_file, c0, c1 )
+    embedder = UMAPEmbedding( n_components=ndims )
+    store = embedder.run( normalize( bands ), output_file, n_training_samples, metadata=dict( input_file=input_file ) )
+    print( f"Saved umap model and full-scene embedding to {store.path}")
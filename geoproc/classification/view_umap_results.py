@@ -1,47 +1,42 @@
 import xarray as xa
-import umap, time, pickle
-import umap.plot
+import time
 import numpy as np
 import matplotlib.pyplot as plt
 from typing import List, Union, Tuple, Optional
-from geoproc.classification.plots import datashade_points, point_cloud_3d
+from geoproc.classification.plots import datashade_points_chunked, point_cloud_3d
+from geoproc.util.artifacts import ArtifactStore
 
 import os, math
 
-def get_color_data( filepath: str, iband: int, subsampling: int ) -> xa.DataArray:
+def get_color_data( filepath: str, iband: int ) -> xa.DataArray:
     print( f"Reading data file {filepath}")
     dset: xa.Dataset =  xa.open_dataset(filepath)
     band_data: xa.DataArray = dset['band_data'][iband]
     nodata_value = band_data.attrs.get('data_ignore_value', -9999 )
-    band_data: xa.DataArray = band_data.where(band_data != nodata_value, float('nan'))
-    band_data = band_data.stack(samples=band_data.dims).dropna( dim="samples" )
-    return band_data[::subsampling]
+    return band_data.where(band_data != nodata_value, float('nan'))
 
 c0 = (1000,1000)
 c1 = (2000,2000)
 color_band = 200
+n_training_samples = 200000
 subsampling = 5
 ndims = 3
 
 data_dir = "/Users/tpmaxwel/Dropbox/Tom/Data/Aviris/processed"
 output_dir = "/usr/local/web/ILAB/data/results/umap"
 data_file = os.path.join( data_dir, f"ang20170720t004130.{c0[0]}-{c0[1]}_{c1[0]}-{c1[1]}.nc" )
-mapping_file = os.path.join( output_dir, f"umap-model.ang20170720t004130.{c0[0]}-{c1[1]}_{c1[0]}-{c1[1]}.s-{subsampling}.d-{ndims}.pkl" )
-color_data = get_color_data( data_file, color_band, subsampling )
+mapping_file = os.path.join( output_dir, f"umap-model.ang20170720t004130.{c0[0]}-{c1[1]}_{c1[0]}-{c1[1]}.n-{n_training_samples}.d-{ndims}" )
+color_data = get_color_data( data_file, color_band ).values.reshape(-1)
 
 t0 = time.time()
-mapper = pickle.load( open( mapping_file, "rb" ) )
+full_embedding = ArtifactStore( mapping_file )['embedding']
+embedding = full_embedding.reshape( ndims, -1 ).transpose()
+valid = np.isfinite( embedding ).all( axis=1 ) & np.isfinite( color_data )
+point_indices = np.flatnonzero( valid )[::subsampling]
 t1 = time.time()
-print( f"Completed map load in {(t1-t0)} sec, Now transforming data")
+print( f"Completed embedding load in {(t1-t0)} sec, plotting {point_indices.size} points")
 
 if ndims == 2:
-    datashade_points( mapper.embedding_, values = color_data.values, vrange = [ 0, 10 ], cmap="jet" )
+    datashade_points_chunked( embedding, values = color_data, vrange = [ 0, 10 ], cmap="jet" )
 else:
-    point_cloud_3d( mapper.embedding_, values = color_data.values, cmap="jet", vrange = [ -10, 10 ] )
-
-
-
-
-
-
-
+    point_cloud_3d( embedding[point_indices], values = color_data[point_indices], cmap="jet", vrange = [ -10, 10 ] )
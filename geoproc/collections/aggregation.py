@@ -2,9 +2,12 @@ import os, time, math
 from datetime import datetime, timezone
 from collections import OrderedDict
 import numpy as np
-from netCDF4 import MFDataset, Variable
+from netCDF4 import Dataset, MFDataset, Variable, num2date, date2num
+import xarray as xa, dask
+import dask.array as da
 from typing import List, Dict, Any, ValuesView, Optional, Tuple
 import defusedxml.ElementTree as ET
+from geoproc.collections.index import load_index, load_times, build_index, to_datetime64, TIME_BASE, TIME_UNITS
 from edas.util.logging import EDASLogger
 
 def a2s( elems: List[Any], sep: str = "," )-> str: return sep.join( [ str(x) for x in elems] )
@@ -125,12 +128,23 @@ class Aggregation:
         self.name = _name
         self.spec = _agg_file
         self.parms = {}
-        self.files: Dict[str,File] = OrderedDict()
+        self._files: Optional[Dict[str,File]] = None
+        self.index: Optional[np.ndarray] = load_index( self.spec ) if os.path.isfile( self.spec ) else None
+        self.times: Optional[np.ndarray] = load_times( self.spec ) if os.path.isfile( self.spec ) else None
         self.axes: Dict[str,Axis] = {}
         self.dims = {}
         self.vars = {}
         self._parseAggFile()
 
+    @property
+    def files(self) -> Dict[str,File]:
+        if self._files is None:
+            self._files = OrderedDict()
+            for record in self.index:
+                start, size, relpath = str( record['start'] ), str( record['size'] ), record['path'].decode()
+                self._files[ start ] = File( self, start, size, relpath )
+        return self._files
+
     def getChunkSize(self, maxFiles: int, nfiles: int ) -> Tuple[Optional[int], int]:
         from statistics import median
         files: List[File] = list(self.fileList())
@@ -143,26 +157,30 @@ class Aggregation:
     def _parseAggFile(self):
         assert os.path.isfile(self.spec), "Unknown Aggregation: " + self.spec
         self.logger.info( "Parsing Agg file: " + self.spec )
+        fileRecs = []
         try:
             with open(self.spec, "r") as file:
-                for line in file.readlines():
+                for line in file:
                     if not line: break
                     if line[1] == ";":
                         try:
                             type = line[0]
+                            if type == 'F' and self.index is not None: break
                             value = line[2:].split(";")
                             if type == 'P': self.parms[ value[0].replace('"',' ').strip() ] = ";".join( value[1:] ).replace('"',' ').strip()
                             elif type == 'A': self.axes[ value[2].strip() ] = Axis( *value )
                             elif type == 'C': self.dims[ value[0].strip() ] = File.getNumber( value[1].strip(), True )
                             elif type == 'V': self.vars[ value[0].strip() ] = VarRec.new( value )
-                            elif type == 'F': self.files[ value[0].strip() ] = File( self, *value )
+                            elif type == 'F': fileRecs.append( value )
                         except Exception as err:
                             self.logger.error( "Error parsing line: " + line )
                             raise err
         except Exception as err:
             self.logger.error(f"Parsing Agg file {self.spec}: " + repr(err) )
             raise err
-        self.logger.info( f"Completed Parsing Agg spec: {len(self.files)} files, {len(self.vars)} vars")
+        if self.index is None:
+            self.index = build_index( [ float(rec[0]) for rec in fileRecs ], [ int(rec[1]) for rec in fileRecs ], [ rec[2] for rec in fileRecs ] )
+        self.logger.info( f"Completed Parsing Agg spec: {len(self.index)} files, {len(self.vars)} vars")
 
     def toXml(self, varName: str )-> str:
         specs = []
@@ -186,31 +204,104 @@ class Aggregation:
     def fileList(self) -> ValuesView[File]:
         return self.files.values()
 
+    def getPath(self, iFile: int ) -> str:
+        return self.parm("base.path") + "/" + self.index['path'][iFile].decode()
+
     def pathList(self)-> List[str]:
-        return [ file.getPath() for file in self.files.values() ]
+        return [ self.getPath( iFile ) for iFile in range( len(self.index) ) ]
+
+    @staticmethod
+    def timeValue( date: datetime ) -> float:
+        """ Minutes since TIME_BASE, as the index start times ( naive datetimes are taken as UTC ) """
+        if date.tzinfo is not None: date = date.astimezone( timezone.utc ).replace( tzinfo=None )
+        return ( date - TIME_BASE ).total_seconds() / 60.0
 
     def periodPathList(self, start:datetime, end:datetime  )-> List[str]:
+        """ Paths of the files starting within [start,end], plus the file preceding the first of those ( binary search on the index ) """
         t0 = time.time()
-        filesView = self.files.values()
-        if len( filesView ) == 1:
-            paths: List[str] = [ file.getPath() for file in filesView ]
+        nFiles = len( self.index )
+        if nFiles == 1:
+            paths: List[str] = self.pathList()
         else:
-            paths: List[str] = []
-            prev_file = None
-            for file in filesView:
-                if file.date > end: break
-                if file.date >= start:
-                    if (len(paths) == 0) and (prev_file is not None):
-                        paths.append( prev_file.getPath() )
-                    paths.append( file.getPath() )
-                prev_file = file
-        self.logger.info(f"@PPL: extracted {len(paths)} paths from {len(self.files)}: time = {time.time()-t0} sec")
+            starts = self.index['start']
+            i0 = int( np.searchsorted( starts, self.timeValue( start ), side='left' ) )
+            i1 = int( np.searchsorted( starts, self.timeValue( end ), side='right' ) )
+            if ( i1 > i0 ) and ( i0 > 0 ): i0 = i0 - 1
+            paths: List[str] = [ self.getPath( iFile ) for iFile in range( i0, i1 ) ]
+        self.logger.info(f"@PPL: extracted {len(paths)} paths from {nFiles}: time = {time.time()-t0} sec")
         return paths
 
-    def getVariable( self, varName: str ) -> Variable:
-        ds = self.getDataset()
-        return ds.variables[varName]
-
-    def getDataset( self ) -> MFDataset:
-        return MFDataset( self.pathList() )
+    def timeValues( self ) -> np.ndarray:
+        """ Time value ( minutes since TIME_BASE ) of every time step: from the .agt sidecar written by the scan, or else
+            read from the time variable of each file """
+        if self.times is None:
+            calendar = self.parm("time.calendar") or "standard"
+            values = []
+            for path in self.pathList():
+                with Dataset( path ) as dataset:
+                    time_var: Variable = dataset.variables["time"]
+                    values.append( date2num( num2date( time_var[:], time_var.units, calendar ), TIME_UNITS, calendar ) )
+            self.times = np.concatenate( values ).astype( np.float64 )
+        return np.asarray( self.times )
+
+    def timeCoord( self ):
+        """ Time coordinate of the aggregation: datetime64 values for standard calendars, cftime dates otherwise """
+        calendar = self.parm("time.calendar") or "standard"
+        if calendar.lower() in [ "standard", "gregorian", "proleptic_gregorian" ]: return to_datetime64( self.timeValues() )
+        return num2date( self.timeValues(), TIME_UNITS, calendar )
 
+    def getVariable( self, varName: str ) -> Variable:
+        """ netCDF4 Variable over all files ( MFDataset ), for callers using the netCDF API; see getDataArray for the lazy path """
+        return MFDataset( self.pathList() ).variables[varName]
+
+    def getDataset( self, varNames: List[str] = None ) -> xa.Dataset:
+        return self.getLazyDataset( varNames )
+
+    def getDataArray( self, varName: str ) -> xa.DataArray:
+        return self.getLazyDataset( [ varName ] )[ varName ]
+
+    def getLazyDataset( self, varNames: List[str] = None ) -> xa.Dataset:
+        """ Lazy ( dask ) dataset over all files of the aggregation, one chunk per file along time: metadata and the
+            non-time coordinates come from the first file, and each other file is only opened when its chunk is computed """
+        varNames = list( self.vars.keys() ) if varNames is None else varNames
+        paths = self.pathList()
+        sizes = [ int(size) for size in self.index['size'] ]
+        data_vars, coords = {}, {}
+        with Dataset( paths[0] ) as template:
+            for varName in varNames:
+                var: Variable = template.variables[ varName ]
+                dims = list( var.dimensions )
+                dtype, fill_value, attrs = unpacked( var )
+                for dim in dims:
+                    if ( dim != "time" ) and ( dim not in coords ) and ( dim in template.variables ):
+                        coords[dim] = template.variables[dim][:]
+                if "time" in dims:
+                    iTime = dims.index( "time" )
+                    chunks = []
+                    for path, size in zip( paths, sizes ):
+                        shape = var.shape[:iTime] + ( size, ) + var.shape[iTime+1:]
+                        chunks.append( da.from_delayed( dask.delayed( read_variable )( path, varName, dtype, fill_value ), shape, dtype ) )
+                    data = da.concatenate( chunks, axis=iTime )
+                else:
+                    data = da.from_delayed( dask.delayed( read_variable )( paths[0], varName, dtype, fill_value ), var.shape, dtype )
+                data_vars[varName] = xa.DataArray( data, dims=dims, attrs=attrs, name=varName )
+        coords["time"] = self.timeCoord()
+        return xa.Dataset( data_vars, coords=coords, attrs=dict( name=self.name, **self.parms ) )
+
+PACKING_ATTRS = [ 'scale_factor', 'add_offset', '_FillValue', 'missing_value', 'valid_range', 'valid_min', 'valid_max' ]
+
+def unpacked( var: Variable ) -> Tuple[np.dtype,Any,Dict[str,Any]]:
+    """ dtype, fill value and attributes of a variable's data as read through netCDF4's auto mask-and-scale: packed
+        ( scale_factor/add_offset ) variables are unpacked to floats filled with nan, without the packing attributes """
+    attrs = { name: var.getncattr(name) for name in var.ncattrs() }
+    if ( 'scale_factor' in attrs ) or ( 'add_offset' in attrs ):
+        dtype = np.result_type( var.dtype, attrs.get( 'scale_factor', 1 ), attrs.get( 'add_offset', 0 ), np.float32 )
+        return dtype, np.nan, { name: value for name, value in attrs.items() if name not in PACKING_ATTRS }
+    fill_value = np.nan if var.dtype.kind == 'f' else attrs.get( '_FillValue', 0 )
+    return var.dtype, fill_value, attrs
+
+def read_variable( path: str, varName: str, dtype: np.dtype, fill_value ) -> np.ndarray:
+    with Dataset( path ) as dataset:
+        data = dataset.variables[ varName ][:]
+    data = np.ma.filled( data, fill_value ) if np.ma.isMaskedArray( data ) else np.asarray( data )
+    return data.astype( dtype, copy=False )
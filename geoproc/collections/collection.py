@@ -3,6 +3,7 @@ from geoproc.util.configuration import ILABEnv
 from geoproc.util.scrap.logging import ILABLogger
 from datetime import datetime
 from netCDF4 import Variable
+import xarray as xa
 from typing import List, Dict
 from edas.process.source import VID
 from geoproc.collections.aggregation import Aggregation, File
@@ -63,6 +64,11 @@ class Collection:
         agg =  self.getAggregation( self.getAggId( varName ) )
         return agg.getVariable(varName)
 
+    def getDataArray( self, varName ) -> xa.DataArray:
+        """ Lazy ( dask ) DataArray of the variable over all files of its aggregation """
+        agg =  self.getAggregation( self.getAggId( varName ) )
+        return agg.getDataArray(varName)
+
     def fileList(self, aggId: str ) -> List[File]:
         agg = self.getAggregation( aggId )
         return list(agg.fileList())
@@ -0,0 +1,53 @@
+import os, datetime
+import numpy as np
+from typing import List, Optional
+
+# Binary sidecars of an aggregation ( .ag1 ) file, saved as memory-mappable .npy files:
+#   .agi.npy: one record per file, sorted by start time, with the number of time steps and the path relative to the
+#             aggregation's base.path
+#   .agt.npy: the time value of every time step of the aggregation, in file order
+# Time values are minutes since TIME_BASE, the origin used by FileRec for the .ag1 time values.
+
+TIME_BASE = datetime.datetime(1970,1,1,1,1,1)
+TIME_UNITS = "minutes since 1970-01-01 01:01:01"
+
+def index_file( aggFile: str ) -> str:
+    return os.path.splitext( aggFile )[0] + ".agi.npy"
+
+def times_file( aggFile: str ) -> str:
+    return os.path.splitext( aggFile )[0] + ".agt.npy"
+
+def index_dtype( path_width: int ) -> np.dtype:
+    return np.dtype( [ ( 'start', np.float64 ), ( 'size', np.int64 ), ( 'path', f'S{max(path_width,1)}' ) ] )
+
+def build_index( starts: List[float], sizes: List[int], relPaths: List[str] ) -> np.ndarray:
+    encoded = [ relPath.strip().encode() for relPath in relPaths ]
+    table = np.empty( len( encoded ), dtype=index_dtype( max( [ len(path) for path in encoded ], default=1 ) ) )
+    table['start'], table['size'], table['path'] = starts, sizes, encoded
+    return table
+
+def save_array( filePath: str, array: np.ndarray ):
+    tmpFile = filePath[:-4] + ".tmp.npy"
+    np.save( tmpFile, array )
+    os.replace( tmpFile, filePath )
+
+def write_index( aggFile: str, starts: List[float], sizes: List[int], relPaths: List[str], times: np.ndarray = None ):
+    save_array( index_file( aggFile ), build_index( starts, sizes, relPaths ) )
+    if times is not None: save_array( times_file( aggFile ), np.asarray( times, dtype=np.float64 ) )
+
+def load_sidecar( aggFile: str, sidecarFile: str ) -> Optional[np.ndarray]:
+    if not os.path.isfile( sidecarFile ) or ( os.path.getmtime( sidecarFile ) < os.path.getmtime( aggFile ) ): return None
+    return np.load( sidecarFile, mmap_mode='r' )
+
+def load_index( aggFile: str ) -> Optional[np.ndarray]:
+    """ Memory-maps the file index of aggFile, or returns None if it is missing or older than the aggregation file """
+    return load_sidecar( aggFile, index_file( aggFile ) )
+
+def load_times( aggFile: str ) -> Optional[np.ndarray]:
+    """ Memory-maps the time values of aggFile, or returns None if they are missing or older than the aggregation file """
+    return load_sidecar( aggFile, times_file( aggFile ) )
+
+def to_datetime64( times: np.ndarray ) -> np.ndarray:
+    """ Converts time values ( minutes since TIME_BASE, proleptic gregorian calendar ) to datetime64[ns] """
+    seconds = np.round( np.asarray( times, dtype=np.float64 ) * 60 ).astype( np.int64 )
+    return ( np.datetime64( TIME_BASE, 's' ) + seconds.astype( 'timedelta64[s]' ) ).astype( 'datetime64[ns]' )
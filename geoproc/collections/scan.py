@@ -1,38 +1,96 @@
-from typing import List, Dict, Any, Sequence, BinaryIO, TextIO, ValuesView, Tuple, Optional
-from netCDF4 import Dataset, num2date, Variable
-from functools import total_ordering
-import os, glob, yaml, datetime, argparse, math, time
+from typing import List, Dict, Any, Sequence, BinaryIO, TextIO, ValuesView, Tuple, Optional, Callable
+from netCDF4 import Dataset, num2date, date2num, Variable
+from functools import total_ordering, lru_cache
+import os, glob, yaml, datetime, argparse, math, time, json, signal, threading
 from geoproc.util.configuration import ILABEnv
+from geoproc.collections.index import write_index, TIME_BASE, TIME_UNITS
+import numpy as np
 import multiprocessing as mp
 from multiprocessing import Pool
 
 def m2s( params: Dict ) -> str:
     return ",".join( [ f"{key}:{value}" for key,value in params.items() ] )
 
+_unit_deltas = dict( seconds=datetime.timedelta(seconds=1), minutes=datetime.timedelta(minutes=1), hours=datetime.timedelta(hours=1), days=datetime.timedelta(days=1) )
+
+@lru_cache( maxsize=1024 )
+def time_units( units: str, calendar: str ) -> Tuple[Any,Optional[datetime.timedelta]]:
+    """ Decoded ( origin date, time step ) of a CF time units string, parsed once for all files ( usually a whole directory ) sharing it.
+        The step is None for calendars or units that can't be decoded with plain datetime arithmetic. """
+    interval = units.split(" since ")[0].strip().lower()
+    delta = _unit_deltas.get( interval if interval.endswith("s") else interval + "s" )
+    if calendar.lower() not in [ "standard", "gregorian", "proleptic_gregorian" ]: delta = None
+    origin = num2date( 0, units, calendar, only_use_cftime_datetimes=False ) if delta is not None else None
+    return origin, delta
+
+def decode_time( value: float, units: str, calendar: str ):
+    origin, delta = time_units( units, calendar )
+    return num2date( value, units, calendar ) if delta is None else origin + float(value) * delta
+
+def time_offsets( values: np.ndarray, units: str, calendar: str ) -> np.ndarray:
+    """ Time values converted to minutes since TIME_BASE, the origin of the aggregation time values """
+    origin, delta = time_units( units, calendar )
+    if delta is None: return np.asarray( date2num( num2date( values, units, calendar ), TIME_UNITS, calendar ), dtype=np.float64 )
+    return ( origin - TIME_BASE ).total_seconds() / 60.0 + values * ( delta.total_seconds() / 60.0 )
+
 @total_ordering
 class FileRec:
     def __init__(self, path ):
         self.path = path
-        dataset = Dataset(path)
         self.units = "minutes since 1970-01-01T00:00:00Z"
         self.relPath = None
-        self.base_date = datetime.datetime(1970,1,1,1,1,1)
-        self.calendar = dataset.calendar if hasattr(dataset, 'calendar') else "standard"
-        vars_list = list(dataset.variables.keys())
-        vars_list.sort()
-        self.varsKey = ",".join(vars_list)
-        time_var: Variable = dataset.variables["time"]
-        time_data = time_var[:]
-        if len(time_data) > 1:
-            dt = time_data[1] - time_data[0]
-            self.start_date = num2date(time_data[0], time_var.units, self.calendar)
-            self.end_date = num2date(time_data[-1] + dt, time_var.units, self.calendar)
+        self.base_date = TIME_BASE
+        with Dataset(path) as dataset:
+            time_var: Variable = dataset.variables["time"]
+            self.calendar = dataset.calendar if hasattr(dataset, 'calendar') else Aggregation.attr( time_var, "calendar", "standard" )
+            vars_list = list(dataset.variables.keys())
+            vars_list.sort()
+            self.varsKey = ",".join(vars_list)
+            self.size = time_var.shape[0]
+            time_head = np.asarray( time_var[0:2], dtype=np.float64 )
+            time_last = float( time_var[-1] ) if self.size > 2 else time_head[-1]
+            tunits = time_var.units
+        bounds = time_offsets( np.array( [ time_head[0], time_head[-1], time_last ] ), tunits, self.calendar )
+        self.time0, self.dt, self.tlast = float( bounds[0] ), float( bounds[1] - bounds[0] ), float( bounds[2] )
+        self.start_date = decode_time( time_head[0], tunits, self.calendar )
+        if self.size > 1:
+            dt = time_head[1] - time_head[0]
+            self.end_date = decode_time( time_last + dt, tunits, self.calendar )
         else:
-            self.start_date = num2date(time_data[0], time_var.units, self.calendar)
             self.end_date = self.start_date
         self.start_time_value = self.getTimeValue( self.start_date )
         self.end_time_value = self.getTimeValue( self.end_date )
-        self.size = len(time_data)
+
+    @classmethod
+    def from_record( cls, path: str, record: Dict ) -> "FileRec":
+        """ Rebuilds a FileRec from its FileIndex record without opening the file """
+        frec = cls.__new__( cls )
+        frec.path = path
+        frec.units = "minutes since 1970-01-01T00:00:00Z"
+        frec.relPath = None
+        frec.base_date = TIME_BASE
+        frec.calendar = record['calendar']
+        frec.varsKey = record['vars']
+        frec.start_date = record['start_date']
+        frec.end_date = record['end_date']
+        frec.start_time_value = record['start']
+        frec.end_time_value = record['end']
+        frec.size = record['ntimes']
+        frec.time0, frec.dt, frec.tlast = record['time0'], record['dt'], record['tlast']
+        return frec
+
+    def record( self, stat: os.stat_result ) -> Dict:
+        return dict( fsize=stat.st_size, mtime=stat.st_mtime, start=self.start_time_value, end=self.end_time_value, ntimes=self.size,
+                     vars=self.varsKey, calendar=self.calendar, start_date=str(self.start_date), end_date=str(self.end_date), time0=self.time0, dt=self.dt, tlast=self.tlast )
+
+    def time_values( self ) -> np.ndarray:
+        """ Time values of every step ( minutes since TIME_BASE ): derived from the first value and step when the last value
+            is consistent with them, otherwise ( irregular steps ) read from the file """
+        steps = self.time0 + self.dt * np.arange( self.size )
+        if np.isclose( steps[-1], self.tlast, rtol=0.0, atol=1e-3 ): return steps
+        with Dataset( self.path ) as dataset:
+            time_var: Variable = dataset.variables["time"]
+            return time_offsets( np.asarray( time_var[:], dtype=np.float64 ), time_var.units, self.calendar )
 
     def getTimeValue( self, date ) -> int:
         offset = date - self.base_date
@@ -58,31 +116,189 @@ class FileRec:
         return frec.start_time_value
 
 
+class FileIndex:
+    """ Persistent per-collection record ( file size, mtime, time range, variables key ) of every scanned file """
+
+    def __init__(self, indexFile: str ):
+        self.indexFile = indexFile
+        self.records: Dict[str,Dict] = {}
+        if os.path.isfile( indexFile ):
+            try:
+                with open( indexFile ) as f: self.records = json.load( f )
+            except Exception as err:
+                print( f"Error reading file index {indexFile}, rescanning all files: {err}" )
+
+    def lookup(self, paths: List[str] ) -> Tuple[List[FileRec],List[str]]:
+        """ Returns FileRecs for the indexed, unchanged paths and the list of new or changed paths that must be scanned """
+        frecs, changed = [], []
+        self.stats: Dict[str,os.stat_result] = {}
+        for path in paths:
+            stat = self.stats[path] = os.stat( path )
+            record = self.records.get( path )
+            if ( record is not None ) and ( record['fsize'] == stat.st_size ) and ( record['mtime'] == stat.st_mtime ) and ( 'dt' in record ):
+                frecs.append( FileRec.from_record( path, record ) )
+            else:
+                changed.append( path )
+        return frecs, changed
+
+    def update(self, frecs: List[FileRec] ):
+        for frec in frecs:
+            stat = self.stats.get( frec.path ) or os.stat( frec.path )
+            self.records[ frec.path ] = frec.record( stat )
+
+    def prune(self, paths: List[str] ) -> List[Dict]:
+        """ Drops ( and returns ) the records of files that no longer exist in the collection """
+        current = set( paths )
+        removed = [ path for path in self.records if path not in current ]
+        return [ self.records.pop( path ) for path in removed ]
+
+    def write(self):
+        os.makedirs( os.path.dirname( self.indexFile ), exist_ok=True )
+        tmpFile = self.indexFile + ".tmp"
+        with open( tmpFile, "w" ) as f: json.dump( self.records, f )
+        os.replace( tmpFile, self.indexFile )
+
+_scan_timeout = 0
+
+def _init_scan_worker( timeout: float ):
+    global _scan_timeout
+    _scan_timeout = timeout
+
+def _on_scan_timeout( signum, frame ):
+    raise TimeoutError( f"File scan exceeded {_scan_timeout} sec" )
+
+def scan_file( path: str ) -> Tuple[str,Optional[FileRec],Optional[str]]:
+    """ Returns ( path, FileRec, None ), or ( path, None, error ) if the file can't be read within the timeout.  The timeout
+        uses SIGALRM, so it only applies in the main thread; the previous handler is restored afterwards. """
+    use_alarm = ( _scan_timeout > 0 ) and hasattr( signal, "SIGALRM" ) and ( threading.current_thread() is threading.main_thread() )
+    if use_alarm:
+        previous_handler = signal.signal( signal.SIGALRM, _on_scan_timeout )
+        signal.alarm( int( math.ceil( _scan_timeout ) ) )
+    try:
+        return path, FileRec( path ), None
+    except Exception as err:
+        return path, None, repr( err )
+    finally:
+        if use_alarm:
+            signal.alarm( 0 )
+            signal.signal( signal.SIGALRM, previous_handler )
+
+def scan_files( paths: List[str] ) -> List[Tuple[str,Optional[FileRec],Optional[str]]]:
+    return [ scan_file( path ) for path in paths ]
+
+class ScanEngine:
+    """
+    Bounded process pool that streams FileRecs ( in completion order ) for one or several collections.  Each file is read
+    under a timeout, failures are logged and returned rather than aborting the scan, and progress is reported periodically.
+    If no result arrives for stall_timeout seconds ( e.g. a worker hung in uninterruptible I/O ) the pool is restarted and
+    the remaining files are reported as failed.
+    """
+
+    def __init__(self, **kwargs ):
+        self.nproc = int( kwargs.get( "nproc" ) or mp.cpu_count() )
+        self.timeout = float( kwargs.get( "timeout" ) or 120 )
+        self.chunksize = int( kwargs.get( "chunksize" ) or 8 )
+        self.stall_timeout = kwargs.get( "stall_timeout", 2 * self.timeout * self.chunksize )
+        self.progress_interval = kwargs.get( "progress_interval", 10.0 )
+        self.parallel = str( kwargs.get( "mp", "t" ) ).lower().startswith( "t" )
+        self.pool = None
+
+    def __enter__(self) -> "ScanEngine":
+        return self
+
+    def __exit__(self, *args ):
+        self.close()
+
+    def start(self):
+        if self.parallel and ( self.pool is None ):
+            self.pool = Pool( processes=self.nproc, initializer=_init_scan_worker, initargs=( self.timeout, ) )
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+
+    def scan(self, paths: List[str], callback: Callable[[FileRec],None] ) -> Dict[str,str]:
+        """ Calls callback with the FileRec of each successfully scanned path; returns the failed paths with their errors """
+        failures: Dict[str,str] = {}
+        if len( paths ) == 0: return failures
+        t0 = t1 = time.time()
+        pending = set( paths )
+        batches = [ paths[i0:i0+self.chunksize] for i0 in range( 0, len(paths), self.chunksize ) ]
+        if self.parallel:
+            self.start()
+            results = self.pool.imap_unordered( scan_files, batches )
+        else:
+            _init_scan_worker( self.timeout )
+            results = ( scan_files( batch ) for batch in batches )
+        while len( pending ):
+            try:
+                batch_results = results.next( timeout=self.stall_timeout ) if self.parallel else next( results )
+            except mp.TimeoutError:
+                print( f" Scan stalled for {self.stall_timeout} sec, restarting pool and skipping {len(pending)} unfinished files" )
+                failures.update( { path: "stalled" for path in pending } )
+                self.close()
+                break
+            for path, frec, error in batch_results:
+                pending.discard( path )
+                if frec is None:
+                    failures[path] = error
+                    print( f" Error scanning file {path}: {error}" )
+                else:
+                    callback( frec )
+            if time.time() - t1 > self.progress_interval:
+                t1 = time.time()
+                nDone = len(paths) - len(pending)
+                print( f" Scanned {nDone}/{len(paths)} files ({len(failures)} failed), {nDone/(t1-t0):.1f} files/sec" )
+        print( f" Scanned {len(paths)} files ({len(failures)} failed) in {time.time()-t0:.1f} sec" )
+        return failures
+
 class  FileScanner:
 
     def __init__(self, collectionId: str, **kwargs ):
         self.aggs = {}
         self.varPaths = {}
+        self.changedKeys = set()
+        self.failures: Dict[str,str] = {}
         self.collectionId = collectionId
-        self.collectionsDir = ILABEnv.COLLECTIONS
+        self.collectionsDir = kwargs.get( "cpath" ) or ILABEnv.COLLECTIONS
+        self.engine: Optional[ScanEngine] = kwargs.get( "engine" )
         print( f"Running FileScanner with args: {kwargs}")
-        self.scan( **kwargs )
+        if kwargs.get( "scan", True ): self.scan( **kwargs )
 
     def __str__(self):
         aggs = [ f"---> {varId}:\n{agg}" for varId,agg in self.aggs.items() ]
         return "\n".join( aggs )
 
-    def processPaths(self, paths: List[str], **kwargs ):
-        nproc = 2*mp.cpu_count()
-        par = kwargs.get("mp","t").lower().startswith("t")
-        t0 = time.time()
-        chunksize = math.ceil( len(paths) / nproc )
-        if par:
-            with Pool(processes=nproc) as pool:
-                frecList = pool.map(FileRec, paths, chunksize)
-        else:
-            frecList = [ FileRec(path) for path in paths ]
-        for frec in frecList:
+    def indexFile(self) -> str:
+        return os.path.join( os.path.expanduser( self.collectionsDir ), "index", f"{self.collectionId}.json" )
+
+    def prepare(self, paths: List[str], **kwargs ) -> List[str]:
+        """ Looks up the paths in the file index, returns the new or changed paths that must be scanned """
+        self.paths = paths
+        self.index = FileIndex( self.indexFile() )
+        if kwargs.get( "full", False ): self.index.records = {}
+        self.frecList, changedPaths = self.index.lookup( paths )
+        self.scannedList: List[FileRec] = []
+        self.checkpoint = time.time()
+        print( f" Scanning {len(changedPaths)} new or changed files out of {len(paths)} in collection {self.collectionId}" )
+        return changedPaths
+
+    def addFileRec(self, frec: FileRec ):
+        """ Records a scanned file, checkpointing the index every minute so that an interrupted scan can be resumed """
+        self.scannedList.append( frec )
+        self.index.update( [ frec ] )
+        if time.time() - self.checkpoint > 60.0:
+            self.index.write()
+            self.checkpoint = time.time()
+
+    def complete(self, failures: Dict[str,str] ):
+        """ Updates the file index and builds the aggregations once all changed files have been scanned """
+        self.failures = { path: error for path, error in failures.items() if path in self.index.stats }
+        removed = self.index.prune( [ path for path in self.paths if path not in self.failures ] )
+        self.index.write()
+        self.changedKeys = { frec.varsKey for frec in self.scannedList } | { record['vars'] for record in removed }
+        for frec in self.frecList + self.scannedList:
             self.varPaths.setdefault(frec.varsKey, []).append(frec)
         for varKey, frecList in self.varPaths.items():
             frecList.sort()
@@ -93,9 +309,20 @@ class  FileScanner:
                 frec.setBase(base)
             agg = Aggregation(base, frecList, size)
             self.aggs[varKey] = agg
+        if len( self.failures ): print( f" {len(self.failures)} files in collection {self.collectionId} could not be scanned and were skipped" )
+
+    def processPaths(self, paths: List[str], **kwargs ):
+        t0 = time.time()
+        changedPaths = self.prepare( paths, **kwargs )
+        if self.engine is not None:
+            failures = self.engine.scan( changedPaths, self.addFileRec )
+        else:
+            with ScanEngine( **kwargs ) as engine:
+                failures = engine.scan( changedPaths, self.addFileRec )
+        self.complete( failures )
         print(" Completed file scan in " + str(time.time() - t0) + " seconds")
 
-    def scan( self, **kwargs ):
+    def getPaths( self, **kwargs ) -> List[str]:
         glob1 =  kwargs.get( "glob" )
         globsArg =  kwargs.get( "globs" )
         globs: List[str] = [] if globsArg is None else globsArg.split(",")
@@ -103,14 +330,17 @@ class  FileScanner:
         path = kwargs.get("path",None)
         if path is not None:
             ext = kwargs.get("ext", None)
-            if ext[0] == ".": ext = ext[1:]
+            if ext and ext[0] == ".": ext = ext[1:]
             glob2 = path + "/**" if ext is None else path + "/**/*." + ext
             globs.append(glob2)
-        if len(globs) > 0:
-            print( "Scanning globs:" + str(globs) )
-            paths = glob.glob( *globs, recursive=True)
-            self.processPaths( paths, **kwargs )
-        else: raise Exception( "No files found")
+        if len(globs) == 0: raise Exception( "No files found")
+        print( "Scanning globs:" + str(globs) )
+        paths = set()
+        for file_glob in globs: paths.update( glob.glob( file_glob, recursive=True ) )
+        return sorted( paths )
+
+    def scan( self, **kwargs ):
+        self.processPaths( self.getPaths( **kwargs ), **kwargs )
 
     def write( self, **kwargs ):
         baseDir = os.path.expanduser( kwargs.get( "path", self.collectionsDir ) )
@@ -122,8 +352,9 @@ class  FileScanner:
         with open( collectionsFile, 'w' ) as f:
             for aggId,agg in self.aggs.items():
                 aggFile = f"{aggDir}/{agg.getId(self.collectionId)}.ag1"
-                print(" Writing agg File: " + aggFile)
-                agg.write( aggFile )
+                if ( aggId in self.changedKeys ) or not os.path.isfile( aggFile ):
+                    print(" Writing agg File: " + aggFile)
+                    agg.write( aggFile )
                 lines.append(f"# title, {self.collectionId}\n")
                 lines.append(f"# dir, {baseDir}\n")
                 lines.append(f"# format, ag1\n")
@@ -132,6 +363,24 @@ class  FileScanner:
                     lines.append( f"{var}, {relPath}\n")
             f.writelines(lines)
 
+def scan_collections( collections: Dict[str,Dict], **kwargs ) -> Dict[str,FileScanner]:
+    """ Scans several collections ( collectionId -> glob/globs/path/ext args ) concurrently through one shared ScanEngine """
+    t0 = time.time()
+    scanners: Dict[str,FileScanner] = {}
+    owners: Dict[str,List[FileScanner]] = {}
+    for collectionId, args in collections.items():
+        scanner = scanners[collectionId] = FileScanner( collectionId, scan=False, **kwargs )
+        for path in scanner.prepare( scanner.getPaths( **args ), **kwargs ):
+            owners.setdefault( path, [] ).append( scanner )
+    def addFileRec( frec: FileRec ):
+        for owner in owners[frec.path]: owner.addFileRec( frec )
+    with ScanEngine( **kwargs ) as engine:
+        failures = engine.scan( list( owners.keys() ), addFileRec )
+    for scanner in scanners.values():
+        scanner.complete( failures )
+    print( f" Completed scan of {len(scanners)} collections in {time.time()-t0:.1f} seconds" )
+    return scanners
+
 # From EDAS: writeAggregation
 class Aggregation:
 
@@ -179,6 +428,8 @@ class Aggregation:
     def write(self, filePath: str ):
         with open( filePath, 'w' ) as f:
             f.writelines( self.lines )
+        write_index( filePath, [ frec.start_time_value for frec in self.fileRecs ], [ frec.size for frec in self.fileRecs ], [ frec.relPath for frec in self.fileRecs ],
+                     np.concatenate( [ frec.time_values() for frec in self.fileRecs ] ) )
 
     @staticmethod
     def attr( ncobj, aname: str, default: str = "" ) -> str:
@@ -244,11 +495,14 @@ if __name__ == "__main__":
     parser.add_argument('-globs', help='A comma-separated list of unix file system globs for selecting files in the collection')
     parser.add_argument('-glob', help='A single unix file system glob for selecting files in the collection')
     parser.add_argument('-mp', help='Use multiprocessing (true/false)', default="true")
+    parser.add_argument('-full', help='Rescan all files, ignoring the persistent file index', action='store_true')
+    parser.add_argument('-nproc', help='Number of scanning processes (default: cpu count)', type=int )
+    parser.add_argument('-timeout', help='Per-file scan timeout in seconds (default: 120)', type=float )
     args = parser.parse_args()
-    scanner = FileScanner( args.collectionName, **vars(args) )
     collectionsDir = args.cpath
     assert collectionsDir is not None, "Must set the HPDA_COLLECTIONS_DIR environment variable or use the '-cpath' argument to define the collections directory"
-    scanner.write( collectionsDir )
+    scanner = FileScanner( args.collectionName, **vars(args) )
+    scanner.write( path=collectionsDir )
 
 
 
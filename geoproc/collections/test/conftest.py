@@ -0,0 +1,6 @@
+import os, tempfile
+
+# collection_read_test.py and cscan_test.py are manual scripts for local data, not pytest modules
+collect_ignore = [ "collection_read_test.py", "cscan_test.py" ]
+
+os.environ.setdefault( "ILAB_HOME", tempfile.mkdtemp( prefix="ilab-" ) )
@@ -0,0 +1,75 @@
+import os, glob, datetime
+import numpy as np
+import xarray as xa
+import pytest
+from netCDF4 import Dataset
+
+pytest.importorskip( "edas" )
+from geoproc.collections.scan import FileScanner
+from geoproc.collections.aggregation import Aggregation
+from geoproc.collections.index import times_file
+
+# Three files of 6-hourly data, the last with irregular steps
+FILE_HOURS = [ [ 0, 6, 12, 18 ], [ 24, 30, 36, 42 ], [ 48, 49, 60, 70 ] ]
+
+def write_file( path: str, hours, offset: float ):
+    with Dataset( path, "w", format="NETCDF4_CLASSIC" ) as dataset:
+        dataset.createDimension( "time", None ); dataset.createDimension( "lat", 2 ); dataset.createDimension( "lon", 3 )
+        time = dataset.createVariable( "time", "f8", ( "time", ) )
+        time.units, time.calendar = "hours since 2000-01-01 00:00:00", "standard"
+        time[:] = hours
+        dataset.createVariable( "lat", "f4", ( "lat", ) )[:] = [ 10.0, 20.0 ]
+        dataset.createVariable( "lon", "f4", ( "lon", ) )[:] = [ 0.0, 1.0, 2.0 ]
+        variable = dataset.createVariable( "t", "f4", ( "time", "lat", "lon" ) )
+        variable.units = "K"
+        variable[:] = offset + np.arange( len(hours) * 6, dtype=np.float32 ).reshape( len(hours), 2, 3 )
+        packed = dataset.createVariable( "p", "i2", ( "time", "lat", "lon" ), fill_value=-999 )
+        packed.scale_factor, packed.add_offset, packed.units = np.float32( 0.5 ), np.float32( 200.0 ), "K"
+        values = np.ma.masked_array( offset / 10 + np.arange( len(hours) * 6 ).reshape( len(hours), 2, 3 ), mask=False )
+        values[ :, 0, 1 ] = np.ma.masked
+        packed[:] = values
+
+@pytest.fixture
+def aggregation_file( tmp_path ) -> str:
+    data_dir, collections_dir = tmp_path / "data", tmp_path / "collections"
+    data_dir.mkdir()
+    for iFile, hours in enumerate( FILE_HOURS ):
+        write_file( str( data_dir / f"f{iFile}.nc" ), hours, 100.0 * iFile )
+    scanner = FileScanner( "test", path=str( data_dir ), ext="nc", cpath=str( collections_dir ), mp="false" )
+    scanner.write( path=str( collections_dir ) )
+    return glob.glob( str( collections_dir / "agg" / "*.ag1" ) )[0]
+
+def reference_dataset( agg: Aggregation ) -> xa.Dataset:
+    return xa.concat( [ xa.open_dataset( path ).load() for path in agg.pathList() ], dim="time" )
+
+def test_time_coordinate_matches_files( aggregation_file ):
+    agg = Aggregation( "test", aggregation_file )
+    reference = reference_dataset( agg )
+    dataset = agg.getLazyDataset()
+    assert np.array_equal( dataset.time.values, reference.time.values )
+    assert np.array_equal( dataset.t.values, reference.t.values )
+    selected = dataset.t.sel( time="2000-01-03T01:00" )
+    assert np.array_equal( selected.values, reference.t.sel( time="2000-01-03T01:00" ).values )
+
+def test_packed_variable_is_unpacked_once( aggregation_file ):
+    agg = Aggregation( "test", aggregation_file )
+    reference = reference_dataset( agg ).p
+    packed = agg.getDataset( [ "p" ] ).p
+    assert packed.dtype == reference.dtype == np.float32
+    assert all( block.compute().dtype == packed.dtype for block in packed.data.blocks )
+    assert not any( name in packed.attrs for name in [ "scale_factor", "add_offset", "_FillValue" ] )
+    assert np.array_equal( packed.values, reference.values, equal_nan=True ) and np.isnan( packed.values[ :, 0, 1 ] ).all()
+    assert np.array_equal( xa.decode_cf( packed.to_dataset() ).p.values, reference.values, equal_nan=True )
+
+def test_time_coordinate_without_sidecar( aggregation_file ):
+    os.remove( times_file( aggregation_file ) )
+    agg = Aggregation( "test", aggregation_file )
+    assert np.array_equal( agg.timeCoord(), reference_dataset( agg ).time.values )
+
+def test_period_paths_and_netcdf_variable( aggregation_file ):
+    agg = Aggregation( "test", aggregation_file )
+    paths = agg.periodPathList( datetime.datetime( 2000, 1, 2, 0, 30 ), datetime.datetime( 2000, 1, 3, 0, 30 ) )
+    assert [ os.path.basename( path ) for path in paths ] == [ "f1.nc", "f2.nc" ]
+    paths = agg.periodPathList( datetime.datetime( 2000, 1, 2 ), datetime.datetime( 2000, 1, 2, 12 ) )
+    assert [ os.path.basename( path ) for path in paths ] == [ "f0.nc", "f1.nc" ]
+    assert agg.getVariable( "t" ).shape == ( 12, 2, 3 )
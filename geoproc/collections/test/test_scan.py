@@ -0,0 +1,106 @@
+import os, signal, threading, datetime
+import numpy as np
+import pytest
+from netCDF4 import Dataset, num2date
+from geoproc.collections import scan
+from geoproc.collections.scan import FileScanner, ScanEngine, scan_collections, scan_file
+
+def write_file( path: str, days: np.ndarray ):
+    with Dataset( path, "w" ) as dataset:
+        dataset.createDimension( "time", None ); dataset.createDimension( "lat", 2 )
+        time = dataset.createVariable( "time", "f8", ( "time", ) )
+        time.units, time.calendar = "days since 2000-01-01", "standard"
+        time[:] = days
+        dataset.createVariable( "lat", "f4", ( "lat", ) )[:] = [ 10.0, 20.0 ]
+        dataset.createVariable( "t", "f4", ( "time", "lat" ) )[:] = np.zeros( ( days.size, 2 ) )
+
+@pytest.fixture
+def data_dir( tmp_path ) -> str:
+    for iFile in range( 6 ):
+        write_file( str( tmp_path / f"f{iFile}.nc" ), np.arange( 5.0 ) + 5 * iFile )
+    with open( tmp_path / "bad.nc", "w" ) as f: f.write( "not a netcdf file" )
+    return str( tmp_path )
+
+def minutes( date: datetime.datetime ) -> int:
+    """ The original FileRec time value: minutes since its base date, from num2date over the full time variable """
+    offset = date - datetime.datetime(1970,1,1,1,1,1)
+    return offset.days * 24 * 60 + int(round(offset.seconds/60))
+
+def test_file_rec_matches_full_read( data_dir ):
+    path = os.path.join( data_dir, "f2.nc" )
+    frec = scan.FileRec( path )
+    with Dataset( path ) as dataset:
+        time_var = dataset.variables["time"]
+        values = time_var[:]
+        start = num2date( values[0], time_var.units, "standard", only_use_cftime_datetimes=False )
+        end = num2date( values[-1] + values[1] - values[0], time_var.units, "standard", only_use_cftime_datetimes=False )
+    assert ( frec.start_time_value, frec.end_time_value, frec.size ) == ( minutes( start ), minutes( end ), 5 )
+
+@pytest.mark.parametrize( "mp", [ "false", "true" ] )
+def test_scan_engine_isolates_failures( data_dir, tmp_path, mp ):
+    scanner = FileScanner( "test", path=data_dir, ext="nc", cpath=str( tmp_path / "collections" ), mp=mp, nproc=2, chunksize=2 )
+    assert list( scanner.failures.keys() ) == [ os.path.join( data_dir, "bad.nc" ) ]
+    frecs = scanner.aggs[ "lat,t,time" ].fileRecs
+    assert [ os.path.basename( frec.path ) for frec in frecs ] == [ f"f{iFile}.nc" for iFile in range( 6 ) ]
+    rescanner = FileScanner( "test", path=data_dir, ext="nc", cpath=str( tmp_path / "collections" ), mp="false" )
+    assert len( rescanner.scannedList ) == 0 and len( rescanner.aggs[ "lat,t,time" ].fileRecs ) == 6
+
+def test_scan_collections_shared_files( data_dir, tmp_path ):
+    collections = dict( all=dict( glob=os.path.join( data_dir, "f*.nc" ) ), first=dict( glob=os.path.join( data_dir, "f[0-3].nc" ) ) )
+    scanners = scan_collections( collections, cpath=str( tmp_path / "collections" ), mp="false" )
+    assert len( scanners["all"].aggs[ "lat,t,time" ].fileRecs ) == 6
+    assert len( scanners["first"].aggs[ "lat,t,time" ].fileRecs ) == 4
+
+def test_scan_file_restores_alarm_handler( data_dir ):
+    scan._init_scan_worker( 10.0 )
+    try:
+        previous = signal.getsignal( signal.SIGALRM )
+        path, frec, error = scan_file( os.path.join( data_dir, "f0.nc" ) )
+        assert ( frec is not None ) and ( error is None )
+        assert signal.getsignal( signal.SIGALRM ) is previous
+        results = []
+        thread = threading.Thread( target=lambda: results.append( scan_file( os.path.join( data_dir, "f1.nc" ) ) ) )
+        thread.start(); thread.join()
+        assert results[0][1] is not None
+    finally:
+        scan._init_scan_worker( 0 )
+
+class CountingVariable:
+    """ Records the keys used to read a netCDF variable """
+    def __init__( self, variable, keys: list ):
+        self._variable, self._keys = variable, keys
+    def __getattr__( self, name ):
+        return getattr( self._variable, name )
+    def __getitem__( self, key ):
+        self._keys.append( key )
+        return self._variable[key]
+
+def test_file_rec_reads_only_boundary_times( data_dir, monkeypatch ):
+    keys = []
+    class CountingDataset:
+        """ Opens the file, counting the reads of its time variable """
+        def __init__( self, path: str ):
+            self._dataset = Dataset( path )
+            self.variables = dict( self._dataset.variables )
+            self.variables["time"] = CountingVariable( self.variables["time"], keys )
+        def __getattr__( self, name ):
+            return getattr( self._dataset, name )
+        def __enter__( self ):
+            return self
+        def __exit__( self, *args ):
+            self._dataset.close()
+    monkeypatch.setattr( scan, "Dataset", CountingDataset )
+    frec = scan.FileRec( os.path.join( data_dir, "f1.nc" ) )
+    assert keys == [ slice( 0, 2 ), -1 ]
+    assert frec.size == 5
+
+@pytest.mark.parametrize( "days", [ np.arange( 5.0 ) + 10, np.array( [ 10.0, 10.5, 12.0, 13.0, 17.0 ] ), np.array( [ 3.0 ] ) ] )
+def test_file_rec_time_values( tmp_path, days ):
+    path = str( tmp_path / "f.nc" )
+    write_file( path, days )
+    frec = scan.FileRec( path )
+    record = frec.record( os.stat( path ) )
+    assert "times" not in record
+    offset = ( datetime.datetime( 2000, 1, 1 ) - datetime.datetime( 1970, 1, 1, 1, 1, 1 ) ).total_seconds() / 60.0
+    for rec in ( frec, scan.FileRec.from_record( path, record ) ):
+        assert np.allclose( rec.time_values(), offset + days * 24 * 60, rtol=0.0, atol=1e-6 )
@@ -1,8 +1,8 @@
 import matplotlib.pyplot as plt
 import datetime, math
 import numpy as np
-from geoproc.covid.smooth import smooth
-from geoproc.covid.cvgrowth import infection_data
+from geoproc.covid.smooth import smooth_series
+from geoproc.covid.cvgrowth import infection_data, day_range
 
 d0 = datetime.datetime(2020,3,7)
 dr = 3.0
@@ -12,35 +12,44 @@ npoints = 15
 def gf( y0, y1 ):
     return math.log( y1/y0, 2.0 )
 
-
-V = [ ]
-D = [ ]
-for i in range(0,len(infection_data)-1):
-    f = gf( infection_data[i], infection_data[i+1] )
-    V.append( f )
-    d = d0 + datetime.timedelta(days=i)
-    D.append( d )
-
-fig, axs = plt.subplots(1,2)
-# V1 = smooth( np.array( V ) )[1:]
-V1 = np.array( V )
-V2 = [ 1/v for v in V1 ]
-
-ax = axs[0]
-ax.set_title( "Covid-19 USA Infection Growth Rate", fontsize=20 )
-ax.set_xlabel('Date', fontsize=14)
-ax.ticklabel_format(axis="y",style="plain")
-ax.set_ylabel( 'Doubling Frequency (1/days)', fontsize=14 )
-ax.plot( D, V1, '-', color="red", lw=2 )
-ax.legend()
-
-
-ax = axs[1]
-ax.set_title( "Covid-19 USA Infection Doubling Period", fontsize=20 )
-ax.set_xlabel('Date', fontsize=14)
-ax.ticklabel_format(axis="y",style="plain")
-ax.set_ylabel( 'Doubling Period (days)', fontsize=14 )
-ax.plot( D, V2, '-', color="blue", lw=2 )
-ax.legend()
-
-plt.show()
+def doubling_frequency( cases: np.ndarray, axis: int = -1 ) -> np.ndarray:
+    """ Daily doublings log2( y[t+1]/y[t] ) of every series of cases along axis ( nan where counts are not positive ) """
+    cases = np.moveaxis( np.asarray( cases, dtype=np.float64 ), axis, -1 )
+    with np.errstate( divide='ignore', invalid='ignore' ):
+        frequency = np.log2( cases[..., 1:] / cases[..., :-1] )
+    frequency[ ~( ( cases[..., 1:] > 0 ) & ( cases[..., :-1] > 0 ) ) ] = np.nan
+    return np.moveaxis( frequency, -1, axis )
+
+def growth_rates( cases: np.ndarray, window_len: int = 0, window: str = 'hanning', axis: int = -1 ):
+    """ Doubling frequency ( 1/days ) and doubling period ( days ) of all ( region x time ) series in one call, optionally
+        smoothed along time ( see smooth_series ) """
+    frequency = doubling_frequency( cases, axis )
+    if window_len >= 3: frequency = smooth_series( frequency, window_len, window, axis )
+    with np.errstate( divide='ignore' ):
+        period = 1.0 / frequency
+    return frequency, period
+
+if __name__ == "__main__":
+    V1, V2 = growth_rates( np.array( infection_data ) )
+    D = day_range( d0, len(infection_data)-1 )
+
+    fig, axs = plt.subplots(1,2)
+
+    ax = axs[0]
+    ax.set_title( "Covid-19 USA Infection Growth Rate", fontsize=20 )
+    ax.set_xlabel('Date', fontsize=14)
+    ax.ticklabel_format(axis="y",style="plain")
+    ax.set_ylabel( 'Doubling Frequency (1/days)', fontsize=14 )
+    ax.plot( D, V1, '-', color="red", lw=2 )
+    ax.legend()
+
+
+    ax = axs[1]
+    ax.set_title( "Covid-19 USA Infection Doubling Period", fontsize=20 )
+    ax.set_xlabel('Date', fontsize=14)
+    ax.ticklabel_format(axis="y",style="plain")
+    ax.set_ylabel( 'Doubling Period (days)', fontsize=14 )
+    ax.plot( D, V2, '-', color="blue", lw=2 )
+    ax.legend()
+
+    plt.show()
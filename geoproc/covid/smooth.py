@@ -1,4 +1,57 @@
 import numpy
+from functools import lru_cache
+from scipy.signal import fftconvolve
+
+WINDOWS = ['flat', 'hanning', 'hamming', 'bartlett', 'blackman']
+
+@lru_cache( maxsize=32 )
+def window_kernel( window: str, window_len: int ) -> numpy.ndarray:
+    """ Normalized ( read-only ) smoothing kernel, computed once per ( window, window_len ) """
+    if not window in WINDOWS:
+        raise ValueError("Window is on of 'flat', 'hanning', 'hamming', 'bartlett', 'blackman'")
+    w = numpy.ones(window_len, 'd') if window == 'flat' else getattr( numpy, window )( window_len )
+    kernel = w / w.sum()
+    kernel.flags.writeable = False
+    return kernel
+
+def reflect_pad( x: numpy.ndarray, window_len: int ) -> numpy.ndarray:
+    """ Extends the last axis of x with reflected copies ( window_len-1 points, edges excluded ) at both ends """
+    return numpy.concatenate( [ x[..., window_len - 1:0:-1], x, x[..., -2:-window_len - 1:-1] ], axis=-1 )
+
+def window_sums( s: numpy.ndarray, window_len: int ) -> numpy.ndarray:
+    """ Sums over every window_len window along the last axis ( 'valid' positions ), by cumulative sum differences """
+    c = numpy.cumsum( s, axis=-1, dtype=numpy.float64 )
+    c = numpy.concatenate( [ numpy.zeros( c.shape[:-1] + (1,) ), c ], axis=-1 )
+    return c[..., window_len:] - c[..., :-window_len]
+
+def convolve_valid( x: numpy.ndarray, window_len: int, window: str ) -> numpy.ndarray:
+    """ 'valid' convolution of the reflection padded rows of x with the window: a cumulative sum difference for the flat
+        ( moving average ) window, an FFT convolution along the last axis otherwise.  As with numpy.convolve, an output
+        is nan wherever its window contains a nan ( or inf ): those are zeroed before convolving and masked afterwards,
+        so that they don't spread over the whole row. """
+    s = reflect_pad( x, window_len )
+    invalid = ~numpy.isfinite( s )
+    has_invalid = invalid.any()
+    if has_invalid: s = numpy.where( invalid, 0.0, s )
+    if window == 'flat':
+        y = window_sums( s, window_len ) / window_len
+    else:
+        kernel = window_kernel( window, window_len )
+        y = fftconvolve( s, kernel.reshape( (1,) * ( s.ndim - 1 ) + (-1,) ), mode='valid', axes=-1 )
+    if has_invalid: y[ window_sums( invalid, window_len ) > 0 ] = numpy.nan
+    return y
+
+def smooth_series( data: numpy.ndarray, window_len: int = 5, window: str = 'hanning', axis: int = -1 ) -> numpy.ndarray:
+    """ Smooths every series of an N-d ( e.g. region x time ) array along axis in one call, returning an array of the same
+        shape with each output point centered on its input point """
+    x = numpy.moveaxis( numpy.asarray( data, dtype=numpy.float64 ), axis, -1 )
+    if x.shape[-1] < window_len:
+        raise ValueError("Input vector needs to be bigger than window size.")
+    if window_len < 3:
+        return numpy.moveaxis( x, -1, axis )
+    offset = ( window_len - 1 ) // 2
+    y = convolve_valid( x, window_len, window )[..., offset:offset + x.shape[-1]]
+    return numpy.moveaxis( y, -1, axis )
 
 def smooth(x, window_len=5, window='hanning'):
     """smooth the data using a window with requested size.
@@ -25,8 +78,8 @@ def smooth(x, window_len=5, window='hanning'):
 
     see also:
 
-    numpy.hanning, numpy.hamming, numpy.bartlett, numpy.blackman, numpy.convolve
-    scipy.signal.lfilter
+    smooth_series ( 2-D region x time arrays, output aligned with the input ),
+    numpy.hanning, numpy.hamming, numpy.bartlett, numpy.blackman, scipy.signal.fftconvolve
 
     NOTE: length(output) != length(input), to correct this: return y[(window_len/2-1):-(window_len/2)] instead of just y.
     """
@@ -40,16 +93,5 @@ def smooth(x, window_len=5, window='hanning'):
     if window_len < 3:
         return x
 
-    if not window in ['flat', 'hanning', 'hamming', 'bartlett', 'blackman']:
-        raise ValueError("Window is on of 'flat', 'hanning', 'hamming', 'bartlett', 'blackman'")
-
-    s = numpy.r_[x[window_len - 1:0:-1], x, x[-2:-window_len - 1:-1]]
-    # print(len(s))
-    if window == 'flat':  # moving average
-        w = numpy.ones(window_len, 'd')
-    else:
-        w = eval('numpy.' + window + '(window_len)')
-
-    y = numpy.convolve(w / w.sum(), s, mode='valid')
+    y = convolve_valid( x, window_len, window )
     return y[(window_len//2-1):-(window_len//2)]
-
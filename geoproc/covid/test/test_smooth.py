@@ -0,0 +1,48 @@
+import numpy as np
+import math
+from geoproc.covid.smooth import smooth, smooth_series, WINDOWS
+from geoproc.covid.growth_rate import growth_rates, gf
+from geoproc.covid.cvgrowth import infection_data
+
+def reference_smooth( x: np.ndarray, window_len: int = 5, window: str = 'hanning' ) -> np.ndarray:
+    """ The original per-series smooth(): numpy.convolve of the reflection padded series with the named window """
+    s = np.r_[ x[window_len - 1:0:-1], x, x[-2:-window_len - 1:-1] ]
+    w = np.ones( window_len, 'd' ) if window == 'flat' else getattr( np, window )( window_len )
+    y = np.convolve( w / w.sum(), s, mode='valid' )
+    return y[ ( window_len//2-1 ):-( window_len//2 ) ]
+
+def region_series( nregions: int = 50, ntimes: int = 60, seed: int = 0 ) -> np.ndarray:
+    """ Case-count-like rows with leading zero days, mid-series gaps ( nan ) and all-zero regions """
+    rng = np.random.default_rng( seed )
+    cases = np.cumsum( rng.poisson( 5.0, size=( nregions, ntimes ) ), axis=1 ).astype( np.float64 )
+    cases[ :, :rng.integers( 0, 10 ) ] = 0.0
+    cases[ 3, 20:23 ] = np.nan
+    cases[ 7 ] = 0.0
+    return cases
+
+def test_smooth_series_matches_per_series_smooth():
+    data = region_series()
+    data[ 5, 30 ] = np.nan
+    for window in WINDOWS:
+        for window_len in ( 3, 5, 8 ):
+            smoothed = smooth_series( data, window_len, window )
+            offset = ( window_len - 1 ) // 2 - ( window_len // 2 - 1 )
+            for row, result in zip( data, smoothed ):
+                expected = reference_smooth( row, window_len, window )[ offset:offset + row.size ]
+                assert np.allclose( result, expected, equal_nan=True )
+                assert np.allclose( smooth( row, window_len, window ), reference_smooth( row, window_len, window ), equal_nan=True )
+
+def test_smoothed_growth_rates_with_leading_zeros():
+    cases = region_series()
+    frequency, period = growth_rates( cases, 5 )
+    for row, result in zip( cases, frequency ):
+        with np.errstate( divide='ignore', invalid='ignore' ):
+            raw = np.log2( row[1:] / row[:-1] )
+        raw[ ~( ( row[1:] > 0 ) & ( row[:-1] > 0 ) ) ] = np.nan
+        assert np.allclose( result, reference_smooth( raw, 5 )[ 1:1 + raw.size ], equal_nan=True )
+    assert np.isfinite( frequency[ 0, 20: ] ).all() and np.isnan( frequency[7] ).all()
+
+def test_growth_rates_match_loop():
+    frequency, period = growth_rates( np.array( infection_data ) )
+    expected = [ gf( infection_data[i], infection_data[i+1] ) for i in range( len( infection_data ) - 1 ) ]
+    assert np.allclose( frequency, expected ) and np.allclose( period, 1.0 / np.array( expected ) )
@@ -0,0 +1,104 @@
+import os
+import numpy as np
+from typing import List, Tuple, Optional
+from osgeo import gdal, gdalconst
+gdal.UseExceptions()
+
+class COGWriter(object):
+    """
+    Streams 2-D slices as bands into a tiled, compressed GeoTIFF and finalizes it as a
+    Cloud-Optimized GeoTIFF (internal overviews stored ahead of the full resolution data).
+
+    Parameters
+    ----------
+    file_path : str
+        Path of the output COG.
+    x_size, y_size, num_bands : int
+        Raster dimensions.
+    geotransform : tuple
+        GDAL geotransform of the grid.
+    projection : str
+        WKT of the grid's spatial reference.
+    dtype : optional
+        Numpy dtype of the output bands.  Integer types are treated as class codes
+        ( no predictor, NEAREST overviews ), float types as continuous data ( floating point predictor, AVERAGE overviews ).
+    compress: str, optional
+        DEFLATE (default), ZSTD, LZW, ...
+    """
+
+    GDALTypes = { np.dtype('uint8'): gdalconst.GDT_Byte, np.dtype('uint16'): gdalconst.GDT_UInt16, np.dtype('int16'): gdalconst.GDT_Int16,
+                  np.dtype('uint32'): gdalconst.GDT_UInt32, np.dtype('int32'): gdalconst.GDT_Int32,
+                  np.dtype('float32'): gdalconst.GDT_Float32, np.dtype('float64'): gdalconst.GDT_Float64 }
+
+    def __init__(self, file_path: str, x_size: int, y_size: int, num_bands: int, geotransform: Tuple, projection: str, dtype = np.float32, **kwargs ):
+        self.file_path = file_path
+        self.dtype = np.dtype( dtype )
+        self.categorical = ( self.dtype.kind in 'iub' )
+        self.compress = kwargs.get( 'compress', 'DEFLATE' ).upper()
+        self.predictor = kwargs.get( 'predictor', 1 if self.categorical else 3 )
+        self.level = kwargs.get( 'level', None )
+        self.blocksize = kwargs.get( 'blocksize', 512 )
+        self.resampling = kwargs.get( 'resampling', "NEAREST" if self.categorical else "AVERAGE" )
+        self.overview_levels: Optional[List[int]] = kwargs.get( 'overview_levels', None )
+        self.nodata = kwargs.get( 'nodata', None )
+        self.num_bands = num_bands
+        self._tmp_path = file_path + ".tmp.tif"
+        driver: gdal.Driver = gdal.GetDriverByName('GTiff')
+        self.dataset: gdal.Dataset = driver.Create( self._tmp_path, x_size, y_size, num_bands, self.GDALTypes[self.dtype], options=self.creation_options( True ) )
+        self.dataset.SetGeoTransform( geotransform )
+        self.dataset.SetProjection( projection )
+
+    def creation_options( self, temporary: bool = False ) -> List[str]:
+        options = [ "TILED=YES", f"BLOCKXSIZE={self.blocksize}", f"BLOCKYSIZE={self.blocksize}", f"COMPRESS={self.compress}",
+                    f"PREDICTOR={self.predictor}", "BIGTIFF=IF_SAFER" ]
+        if temporary:       options.append( "INTERLEAVE=BAND" )
+        else:               options.append( "COPY_SRC_OVERVIEWS=YES" )
+        if self.level is not None:
+            options.append( f"ZSTD_LEVEL={self.level}" if self.compress == "ZSTD" else f"ZLEVEL={self.level}" )
+        return options
+
+    def get_overview_levels(self) -> List[int]:
+        if self.overview_levels is not None: return self.overview_levels
+        levels, size = [], max( self.dataset.RasterXSize, self.dataset.RasterYSize )
+        while size > self.blocksize:
+            levels.append( 2 ** (len(levels)+1) )
+            size = size // 2
+        return levels
+
+    def band_array(self, data: np.ndarray ) -> np.ndarray:
+        """ Casts a 2-D slice to the output dtype; for integer dtypes nan values are first set to the nodata value """
+        data = np.asarray( data )
+        if self.categorical and ( data.dtype.kind == 'f' ):
+            invalid = np.isnan( data )
+            if invalid.any():
+                if self.nodata is None: raise ValueError( f"A nodata value is required to write nan values to {self.file_path} as {self.dtype}" )
+                data = np.where( invalid, self.nodata, data )
+        return np.ascontiguousarray( data, dtype=self.dtype )
+
+    def write_band(self, iBand: int, data: np.ndarray ):
+        """ Writes a 2-D slice to band iBand (1-based) """
+        band: gdal.Band = self.dataset.GetRasterBand( iBand )
+        band.WriteArray( self.band_array( data ) )
+        if self.nodata is not None: band.SetNoDataValue( self.nodata )
+        band.FlushCache()
+
+    def close(self):
+        """ Builds the overviews and rewrites the data in COG layout """
+        levels = self.get_overview_levels()
+        if len( levels ): self.dataset.BuildOverviews( self.resampling, levels )
+        self.dataset.FlushCache()
+        try:
+            gdal.Translate( self.file_path, self.dataset, format="GTiff", creationOptions=self.creation_options() )
+        finally:
+            self.dataset = None
+            if os.path.isfile( self._tmp_path ): os.remove( self._tmp_path )
+
+    def __enter__(self) -> "COGWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.dataset = None
+            if os.path.isfile( self._tmp_path ): os.remove( self._tmp_path )
@@ -0,0 +1,67 @@
+import numpy as np
+from collections import OrderedDict
+from typing import List, Tuple, Callable, Iterable, Any, Hashable
+import hashlib
+
+def geometry_key( geometries: Iterable[Any], *extra: Any ) -> str:
+    """ Hash of the ( shapely ) geometries' WKB, plus any extra identifying values ( crs, region numbers ) """
+    digest = hashlib.sha1()
+    for geometry in geometries: digest.update( geometry.wkb )
+    for value in extra: digest.update( str( value ).encode() )
+    return digest.hexdigest()
+
+def coords_key( *coords: np.ndarray ) -> str:
+    """ Hash of the grid coordinate arrays, for grids described by coordinates rather than an affine transform """
+    digest = hashlib.sha1()
+    for coord in coords: digest.update( np.ascontiguousarray( coord ).tobytes() )
+    return digest.hexdigest()
+
+def rasterize( geometries: List[Any], transform, shape: Tuple[int,int], all_touched: bool = False ) -> np.ndarray:
+    """ Boolean [y,x] mask, True inside the geometries, burned on the grid of the ( rasterio Affine ) transform """
+    from rasterio.features import geometry_mask
+    return geometry_mask( geometries, out_shape=shape, transform=transform, all_touched=all_touched, invert=True )
+
+def apply_mask( array, region_mask: np.ndarray, mask_value: Any, drop: bool = True ):
+    """ Sets the pixels of a (...,y,x) DataArray outside the boolean [y,x] region_mask to mask_value ( cropping to the mask's
+        extent if drop ), recording mask_value as the result's _FillValue like rio.clip: in the encoding if the source
+        encodes its fill value, else in the attrs. """
+    import xarray as xr
+    if drop:
+        rows, cols = np.flatnonzero( region_mask.any( axis=1 ) ), np.flatnonzero( region_mask.any( axis=0 ) )
+        array = array.isel( { array.dims[-2]: slice( rows[0], rows[-1]+1 ), array.dims[-1]: slice( cols[0], cols[-1]+1 ) } )
+        region_mask = region_mask[ rows[0]:rows[-1]+1, cols[0]:cols[-1]+1 ]
+    result = array.where( xr.DataArray( region_mask, dims=array.dims[-2:] ), mask_value )
+    result.attrs = dict( array.attrs, mask_value=mask_value )
+    result.encoding = dict( array.encoding )
+    if '_FillValue' in result.encoding:     result.encoding['_FillValue'] = mask_value
+    else:                                   result.attrs['_FillValue'] = mask_value
+    return result
+
+class MaskCache:
+    """
+    Bounded LRU cache of rasterized region masks keyed by ( geometry hash, grid transform, shape ): a polygon is burned
+    once per grid and the boolean mask is then applied to every frame on that grid.  Masks are returned read-only.
+    """
+
+    def __init__(self, max_entries: int = 32 ):
+        self.max_entries = max_entries
+        self._masks: OrderedDict = OrderedDict()
+
+    def get(self, key: Hashable, compute: Callable[[],np.ndarray] ) -> np.ndarray:
+        if key in self._masks:
+            self._masks.move_to_end( key )
+            return self._masks[key]
+        mask = np.asarray( compute(), dtype=bool )
+        mask.flags.writeable = False
+        self._masks[key] = mask
+        if len( self._masks ) > self.max_entries: self._masks.popitem( last=False )
+        return mask
+
+    def geometry_mask(self, geometries: List[Any], transform, shape: Tuple[int,int], all_touched: bool = False, crs: Any = None ) -> np.ndarray:
+        key = ( geometry_key( geometries, crs, all_touched ), tuple( transform )[:6], tuple( shape ) )
+        return self.get( key, lambda: rasterize( geometries, transform, shape, all_touched ) )
+
+    def clear(self):
+        self._masks.clear()
+
+mask_cache = MaskCache()
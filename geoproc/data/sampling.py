@@ -3,21 +3,39 @@ import numpy as np
 from typing import List, Tuple, Union
 import os, sys, pickle
 
-def get_binned_sampling( x_data_full: xa.DataArray, y_data_full: xa.DataArray, n_bins: int, n_samples_per_bin: int = 1000 ) -> Tuple[xa.DataArray,xa.DataArray]:
-    training_indices = []
-    samples_axis = y_data_full[ y_data_full.dims[0] ]
-    for sbin in samples_axis.groupby_bins( y_data_full, n_bins ):
-        binned_indices: xa.DataArray = sbin[1].astype( np.int64 )
-        ns = binned_indices.size
-        if ns <= n_samples_per_bin:
-            training_indices.append(  binned_indices.values )
-        else:
-            selection_indices = np.linspace( 0, ns-1, n_samples_per_bin ).astype( np.int64 )
-            sample_indices = binned_indices.isel( samples=selection_indices )
-            training_indices.append( sample_indices.values )
-        print( f"  *  Bin range = {sbin[0]}; NSamples total = {ns}, actual = {training_indices[-1].size} ")
+def get_binned_sample_indices( y_data: np.ndarray, n_bins: int, n_samples_per_bin: int = 1000, random: bool = False, seed: int = 0 ) -> np.ndarray:
+    """ Stratified sampling of a 1-D target array ( numpy array or memmap ) over n_bins equal-width value bins ( as in groupby_bins ).
+        Selects up to n_samples_per_bin evenly spaced ( or random ) samples per bin; returns the selected sample indices grouped by bin. """
+    y_data = np.asarray( y_data ).reshape(-1)
+    valid_mask = np.isfinite( y_data )
+    valid_indices = None if valid_mask.all() else np.flatnonzero( valid_mask )
+    y_valid = y_data if valid_indices is None else y_data[ valid_indices ]
+    if y_valid.size == 0: return np.empty( [0], np.int64 )
+    ymin, ymax = float( y_valid.min() ), float( y_valid.max() )
+    bin_width = ( ymax - ymin ) / n_bins if ymax > ymin else 1.0
+    bin_dtype = np.uint8 if n_bins <= 256 else np.uint16 if n_bins <= 65536 else np.int64
+    bin_ids = np.clip( np.ceil( ( y_valid - ymin ) / bin_width ) - 1, 0, n_bins - 1 ).astype( bin_dtype )     # right-closed bins, as in np.digitize( right=True )
+    if random:
+        permutation = np.random.default_rng( seed ).permutation( bin_ids.size )
+        sort_order = permutation[ np.argsort( bin_ids[ permutation ], kind='stable' ) ]
+    else:
+        sort_order = np.argsort( bin_ids, kind='stable' )
+    bin_counts = np.bincount( bin_ids, minlength=n_bins )
+    bin_starts = np.cumsum( bin_counts ) - bin_counts
+    n_selected = np.minimum( bin_counts, n_samples_per_bin )
+    sample_bins = np.repeat( np.arange( n_bins ), n_selected )
+    rank = np.arange( n_selected.sum() ) - np.repeat( np.cumsum( n_selected ) - n_selected, n_selected )
+    if not random and n_samples_per_bin > 1:
+        step = ( bin_counts[ sample_bins ] - 1 ) / ( n_samples_per_bin - 1 )
+        positions = rank * step                                                                       # as computed by np.linspace( 0, count-1, n_samples_per_bin )
+        positions[ rank == n_samples_per_bin - 1 ] = bin_counts[ sample_bins ][ rank == n_samples_per_bin - 1 ] - 1
+        rank = np.where( bin_counts[ sample_bins ] > n_samples_per_bin, positions.astype( np.int64 ), rank )
+    selected_indices = sort_order[ bin_starts[ sample_bins ] + rank ]
+    return selected_indices if valid_indices is None else valid_indices[ selected_indices ]
 
-    np_training_indices = np.concatenate( training_indices )
+def get_binned_sampling( x_data_full: xa.DataArray, y_data_full: xa.DataArray, n_bins: int, n_samples_per_bin: int = 1000, **kwargs ) -> Tuple[xa.DataArray,xa.DataArray]:
+    np_training_indices = get_binned_sample_indices( y_data_full.values, n_bins, n_samples_per_bin, **kwargs )
+    print( f"  *  Binned sampling: NSamples total = {y_data_full.size}, actual = {np_training_indices.size} ")
     x_data_train = x_data_full.isel( samples=np_training_indices, drop=True )
     y_data_train = y_data_full.isel( samples=np_training_indices, drop=True )
     return x_data_train, y_data_train
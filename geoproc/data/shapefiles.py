@@ -1,6 +1,7 @@
 import geopandas as gpd
 import matplotlib.pyplot as plt
 from geoproc.util.configuration import ConfigurableObject
+from geoproc.data.mask_cache import mask_cache, geometry_key, coords_key
 from typing import Tuple
 from shapely.geometry import *
 import xarray as xa
@@ -73,8 +74,10 @@ class ShapefileManager(ConfigurableObject):
         return poly, regionmask.Regions_cls( poly_name, [0], [poly_name], [poly_name], [poly] )
 
     def crop(self, image: xa.DataArray, regions: Regions_cls ) -> xa.DataArray:
-        region_mask = regions.mask( image, lat_name=image.dims[-2], lon_name=image.dims[-1] )
-        return image.where( region_mask == 0 )
+        ydim, xdim = image.dims[-2:]
+        key = ( geometry_key( regions.polygons, list( regions.numbers ) ), coords_key( image[ydim].values, image[xdim].values ), image.shape[-2:] )
+        region_mask = mask_cache.get( key, lambda: regions.mask( image, lat_name=ydim, lon_name=xdim ).values == 0 )
+        return image.where( xa.DataArray( region_mask, dims=[ ydim, xdim ] ) )
 
     def extractTile(self, gdFrame: gpd.GeoDataFrame, location: str, size: int = 10) -> LinearRing:
         origin: Point = self.parseLocation(location)
@@ -0,0 +1,100 @@
+import xarray as xa
+import numpy as np
+import os, json, hashlib, time
+from typing import Dict, Optional, Any, Callable
+
+def selection_spec( selection: Optional[Dict[str,Any]] ) -> Dict[str,Any]:
+    """ JSON-able form of an isel/sel selection ( slices become [start,stop,step] ) for use in cache keys """
+    def spec( value ):
+        if isinstance( value, slice ): return [ str(value.start), str(value.stop), str(value.step) ]
+        if isinstance( value, ( list, tuple, np.ndarray ) ): return [ str(v) for v in value ]
+        return str( value )
+    return { dim: spec( value ) for dim, value in sorted( ( selection or {} ).items() ) }
+
+class SubsetCache:
+    """
+    Local disk cache of subsets of remote ( OPeNDAP ) datasets: each ( source, variable, isel, sel ) request is fetched once,
+    written to a chunked, compressed NetCDF file and served lazily from disk afterwards.  A JSON catalog records the size
+    and last access time of each entry; least recently used entries are evicted when the cache exceeds max_size bytes.
+    Access times of cache hits are only kept in memory until the next insert or eviction ( or flush ) writes the catalog.
+    """
+
+    CatalogFile = "catalog.json"
+
+    def __init__(self, cache_dir: str, max_size: float = 20e9 ):
+        self.cache_dir = os.path.expanduser( cache_dir )
+        self.max_size = max_size
+        os.makedirs( self.cache_dir, exist_ok=True )
+        self.catalog_file = os.path.join( self.cache_dir, self.CatalogFile )
+        self.catalog: Dict[str,Dict] = self.read_catalog()
+        self.dirty = False
+
+    def read_catalog(self) -> Dict[str,Dict]:
+        if os.path.isfile( self.catalog_file ):
+            try:
+                with open( self.catalog_file ) as f: return json.load( f )
+            except Exception as err:
+                print( f"Error reading cache catalog {self.catalog_file}: {err}" )
+        return {}
+
+    def write_catalog(self):
+        tmp_file = self.catalog_file + ".tmp"
+        with open( tmp_file, "w" ) as f: json.dump( self.catalog, f, indent=1 )
+        os.replace( tmp_file, self.catalog_file )
+        self.dirty = False
+
+    def flush(self):
+        """ Writes the catalog if access times have changed since it was last written """
+        if self.dirty: self.write_catalog()
+
+    def key(self, source: str, varName: str, isel: Dict = None, sel: Dict = None ) -> str:
+        spec = dict( source=source, variable=varName, isel=selection_spec( isel ), sel=selection_spec( sel ) )
+        return hashlib.sha1( json.dumps( spec, sort_keys=True ).encode() ).hexdigest()
+
+    def file_path(self, key: str ) -> str:
+        return os.path.join( self.cache_dir, f"{key}.nc" )
+
+    def get(self, source: str, varName: str, isel: Dict = None, sel: Dict = None, opener: Callable[[str],xa.Dataset] = xa.open_dataset ) -> xa.DataArray:
+        """ Returns the variable subset, from the cache if present, otherwise fetched from source ( opened with opener ) and cached """
+        key = self.key( source, varName, isel, sel )
+        cache_file = self.file_path( key )
+        if ( key in self.catalog ) and os.path.isfile( cache_file ):
+            self.catalog[key]['accessed'] = time.time()
+            self.dirty = True
+            print( f"Reading cached subset of {varName} from {cache_file}" )
+            return xa.open_dataset( cache_file )[ varName ]
+        print( f"Reading data from address {source}" )
+        data_array: xa.DataArray = opener( source )[ varName ]
+        if isel: data_array = data_array.isel( **isel )
+        if sel:  data_array = data_array.sel( **sel )
+        self.store( key, data_array.load(), dict( source=source, variable=varName, isel=selection_spec( isel ), sel=selection_spec( sel ) ) )
+        return data_array
+
+    def store(self, key: str, data_array: xa.DataArray, spec: Dict ):
+        cache_file = self.file_path( key )
+        tmp_file = cache_file + ".tmp"
+        chunksizes = ( min( data_array.shape[0], 16 ), ) + data_array.shape[1:] if data_array.ndim else None
+        encoding = { data_array.name: dict( zlib=True, complevel=1, chunksizes=chunksizes ) } if data_array.ndim else {}
+        data_array.to_dataset().to_netcdf( tmp_file, encoding=encoding )
+        os.replace( tmp_file, cache_file )
+        self.catalog[key] = dict( size=os.path.getsize( cache_file ), accessed=time.time(), **spec )
+        self.evict( keep=key )
+        self.write_catalog()
+
+    def size(self) -> int:
+        return sum( entry['size'] for entry in self.catalog.values() )
+
+    def evict(self, keep: str = None ):
+        """ Removes least recently used entries until the cache fits in max_size ( never the entry keep ) """
+        total_size = self.size()
+        for key in sorted( self.catalog, key=lambda key: self.catalog[key]['accessed'] ):
+            if total_size <= self.max_size: break
+            if key == keep: continue
+            total_size -= self.catalog.pop( key )['size']
+            if os.path.isfile( self.file_path( key ) ): os.remove( self.file_path( key ) )
+
+    def clear(self):
+        for key in list( self.catalog.keys() ):
+            if os.path.isfile( self.file_path( key ) ): os.remove( self.file_path( key ) )
+        self.catalog = {}
+        self.write_catalog()
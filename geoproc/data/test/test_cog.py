@@ -0,0 +1,59 @@
+import os
+import numpy as np
+import xarray as xr
+import pytest
+
+gdal = pytest.importorskip( "osgeo.gdal" )
+from osgeo import osr
+from geoproc.data.cog import COGWriter
+
+GEOTRANSFORM = ( 500000.0, 30.0, 0.0, 4100000.0, 0.0, -30.0 )
+
+def wkt( epsg: int = 32611 ) -> str:
+    sref = osr.SpatialReference()
+    sref.ImportFromEPSG( epsg )
+    return sref.ExportToWkt()
+
+def class_maps( nbands: int = 3, ny: int = 300, nx: int = 400 ) -> np.ndarray:
+    return np.random.default_rng( 0 ).integers( 0, 5, size=( nbands, ny, nx ) ).astype( np.uint8 )
+
+def check_cog( path: str, data: np.ndarray, compression: str, blocksize: int, nodata = None ):
+    info = gdal.Info( path, format="json" )
+    assert info["metadata"]["IMAGE_STRUCTURE"]["COMPRESSION"] == compression
+    assert info["size"] == [ data.shape[-1], data.shape[-2] ] and len( info["bands"] ) == data.shape[0]
+    assert np.allclose( info["geoTransform"], GEOTRANSFORM )
+    for band in info["bands"]:
+        assert band["block"] == [ blocksize, blocksize ]
+        assert [ overview["size"] for overview in band["overviews"] ] == [ [ 200, 150 ], [ 100, 75 ] ]
+        if nodata is not None: assert band["noDataValue"] == nodata
+    dataset = gdal.Open( path )
+    assert np.array_equal( dataset.ReadAsArray(), data )
+    dataset = None
+    assert not os.path.exists( path + ".tmp.tif" )
+
+def test_cog_writer_layout_and_data( tmp_path ):
+    data, path = class_maps(), str( tmp_path / "classes.tif" )
+    with COGWriter( path, data.shape[2], data.shape[1], data.shape[0], GEOTRANSFORM, wkt(), np.uint8, compress="LZW", blocksize=128 ) as writer:
+        for iBand in range( data.shape[0] ):
+            writer.write_band( iBand + 1, data[iBand] )
+    check_cog( path, data, "LZW", 128 )
+
+def test_cog_writer_requires_nodata_for_nan( tmp_path ):
+    writer = COGWriter( str( tmp_path / "classes.tif" ), 4, 3, 1, GEOTRANSFORM, wkt(), np.uint8 )
+    with pytest.raises( ValueError ):
+        with writer: writer.write_band( 1, np.full( ( 3, 4 ), np.nan ) )
+    assert not os.path.exists( str( tmp_path / "classes.tif.tmp.tif" ) )
+
+def test_to_cog_maps_nan_to_nodata( tmp_path ):
+    import geoproc.xext.xgeo
+    data = class_maps()
+    values = data.astype( np.float32 )
+    values[ :, :10, :20 ] = np.nan
+    x = GEOTRANSFORM[0] + GEOTRANSFORM[1] * ( np.arange( data.shape[2] ) + 0.5 )
+    y = GEOTRANSFORM[3] + GEOTRANSFORM[5] * ( np.arange( data.shape[1] ) + 0.5 )
+    array = xr.DataArray( values, dims=[ "time", "y", "x" ], coords=dict( time=np.arange( data.shape[0] ), y=y, x=x ), attrs=dict( crs="epsg:32611" ) )
+    path = str( tmp_path / "water_maps.tif" )
+    array.xgeo.to_cog( path, dtype=np.uint8, compress="LZW", blocksize=128 )
+    expected = data.copy()
+    expected[ :, :10, :20 ] = 255
+    check_cog( path, expected, "LZW", 128, nodata=255 )
@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+import xarray as xr
+from shapely.geometry import Polygon, box
+from geoproc.data.mask_cache import MaskCache, geometry_key, coords_key, rasterize, apply_mask
+
+rasterio = pytest.importorskip( "rasterio" )
+from rasterio.transform import from_origin
+from rasterio.features import geometry_mask
+from rasterio.windows import get_data_window
+
+TRANSFORM = from_origin( 0.0, 20.0, 1.0, 1.0 )
+SHAPE = ( 20, 30 )
+POLYGON = Polygon( [ (3.2, 2.5), (22.7, 4.1), (17.3, 16.8), (5.5, 12.2) ] )
+
+def test_cache_is_lru_and_read_only():
+    cache, calls = MaskCache( max_entries=2 ), []
+    def compute( key ):
+        def compute_mask():
+            calls.append( key )
+            return np.full( SHAPE, key == 'a' )
+        return compute_mask
+    first = cache.get( 'a', compute( 'a' ) )
+    assert cache.get( 'a', compute( 'a' ) ) is first and calls == [ 'a' ]
+    assert not first.flags.writeable and first.dtype == bool
+    cache.get( 'b', compute( 'b' ) )
+    cache.get( 'a', compute( 'a' ) )
+    cache.get( 'c', compute( 'c' ) )
+    cache.get( 'a', compute( 'a' ) )
+    cache.get( 'b', compute( 'b' ) )
+    assert calls == [ 'a', 'b', 'c', 'b' ]
+
+def test_keys_identify_geometry_and_grid():
+    assert geometry_key( [POLYGON] ) == geometry_key( [ Polygon( POLYGON.exterior.coords ) ] )
+    assert geometry_key( [POLYGON] ) != geometry_key( [ POLYGON.buffer( 0.1 ) ] )
+    assert geometry_key( [POLYGON], "EPSG:4326" ) != geometry_key( [POLYGON], "EPSG:3857" )
+    y, x = np.arange( 20.0 ), np.arange( 30.0 )
+    assert coords_key( y, x ) == coords_key( y.copy(), x.copy() ) and coords_key( y, x ) != coords_key( y + 0.5, x )
+
+@pytest.mark.parametrize( "all_touched", [ False, True ] )
+def test_geometry_mask_matches_rasterio( all_touched ):
+    cache = MaskCache()
+    expected = ~geometry_mask( [POLYGON], out_shape=SHAPE, transform=TRANSFORM, all_touched=all_touched )
+    assert np.array_equal( rasterize( [POLYGON], TRANSFORM, SHAPE, all_touched ), expected )
+    mask = cache.geometry_mask( [POLYGON], TRANSFORM, SHAPE, all_touched )
+    assert np.array_equal( mask, expected ) and cache.geometry_mask( [POLYGON], TRANSFORM, SHAPE, all_touched ) is mask
+    assert cache.geometry_mask( [POLYGON], TRANSFORM, ( 21, 30 ), all_touched ) is not mask
+
+def frames( ntimes: int = 4 ) -> xr.DataArray:
+    data = np.arange( ntimes * SHAPE[0] * SHAPE[1], dtype=np.float32 ).reshape( ( ntimes, ) + SHAPE )
+    y, x = 19.5 - np.arange( SHAPE[0] ), 0.5 + np.arange( SHAPE[1] )
+    return xr.DataArray( data, dims=[ 'time', 'y', 'x' ], coords=dict( time=np.arange( ntimes ), y=y, x=x ) )
+
+def test_shapefile_crop_matches_regionmask():
+    regionmask = pytest.importorskip( "regionmask" )
+    shapefiles = pytest.importorskip( "geoproc.data.shapefiles", exc_type=ImportError )
+    from geoproc.data.mask_cache import mask_cache
+
+    class Regions:
+        """ Counts the regionmask evaluations of a single polygon region """
+        def __init__( self, polygons ):
+            self.polygons, self.numbers, self.calls = polygons, [ 0 ], 0
+            self.regions = regionmask.Regions( polygons, numbers=self.numbers )
+        def mask( self, image, lat_name, lon_name ):
+            self.calls += 1
+            return self.regions.mask( image[lon_name], image[lat_name] )
+
+    mask_cache.clear()
+    image, regions = frames(), Regions( [POLYGON] )
+    manager = shapefiles.ShapefileManager()
+    expected = xr.concat( [ frame.where( regions.regions.mask( frame.x, frame.y ) == 0 ) for frame in image ], dim='time' )
+    for iFrame in range( image.shape[0] ):
+        assert manager.crop( image[iFrame], regions ).equals( expected[iFrame] )
+    assert manager.crop( image, regions ).transpose( *expected.dims ).equals( expected )
+    assert regions.calls == 1
+
+@pytest.mark.parametrize( "drop", [ True, False ] )
+@pytest.mark.parametrize( "dtype", [ np.float32, np.int16 ] )
+def test_apply_mask_matches_geometry_mask( drop, dtype ):
+    image = frames().astype( dtype )
+    image.attrs = dict( units="m" )
+    image.encoding = dict( dtype="int16", scale_factor=0.5 )
+    inside = ~geometry_mask( [POLYGON], out_shape=SHAPE, transform=TRANSFORM, all_touched=True )
+    result = apply_mask( image, rasterize( [POLYGON], TRANSFORM, SHAPE, True ), 255, drop )
+    expected = np.where( inside, image.values, 255 ).astype( dtype )
+    if drop:
+        ( r0, r1 ), ( c0, c1 ) = get_data_window( np.ma.masked_array( inside, ~inside ) ).toranges()
+        expected, y, x = expected[ :, r0:r1, c0:c1 ], image.y.values[ r0:r1 ], image.x.values[ c0:c1 ]
+        assert expected.shape[1:] != SHAPE
+    else:
+        y, x = image.y.values, image.x.values
+    assert result.dtype == dtype
+    assert np.array_equal( result.values, expected )
+    assert np.array_equal( result.y.values, y ) and np.array_equal( result.x.values, x )
+    assert result.attrs == dict( units="m", mask_value=255, _FillValue=255 )
+    assert result.encoding == dict( dtype="int16", scale_factor=0.5 )
+    assert image.attrs == dict( units="m" ) and image.encoding == dict( dtype="int16", scale_factor=0.5 )
+
+def test_apply_mask_encoded_fill_value():
+    image = frames()
+    image.encoding = dict( _FillValue=-1 )
+    result = apply_mask( image, rasterize( [POLYGON], TRANSFORM, SHAPE ), 0, drop=False )
+    assert result.encoding == dict( _FillValue=0 ) and '_FillValue' not in result.attrs
+    assert result.attrs['mask_value'] == 0 and image.encoding == dict( _FillValue=-1 )
+
+@pytest.mark.parametrize( "all_touched,drop", [ ( True, True ), ( False, False ) ] )
+def test_xrio_clip_matches_rio_clip( all_touched, drop ):
+    pytest.importorskip( "osgeo" )
+    pytest.importorskip( "rioxarray" )
+    from geopandas import GeoDataFrame
+    import geoproc.xext.xrio
+    image = frames().rio.write_crs( "EPSG:4326" )
+    image.attrs['transform'] = tuple( TRANSFORM )[:6]    # as set by open_rasterio
+    geodf = GeoDataFrame( geometry=[ POLYGON, box( 24.0, 1.0, 27.0, 3.0 ) ], crs="EPSG:4326" )
+    result = image.xrio.clip( geodf, all_touched=all_touched, drop=drop )
+    image.rio.set_nodata( 255 )
+    expected = image.rio.clip( geodf.geometry.values, geodf.crs, all_touched=all_touched, drop=drop )
+    assert np.array_equal( result.values, expected.values )
+    assert np.array_equal( result.x.values, expected.x.values ) and np.array_equal( result.y.values, expected.y.values )
+    assert result.attrs['_FillValue'] == expected.attrs['_FillValue'] == 255
@@ -0,0 +1,42 @@
+import xarray as xa
+import numpy as np
+from geoproc.data.sampling import get_binned_sample_indices, get_binned_sampling
+
+def groupby_bins_sampling( y_data_full: xa.DataArray, n_bins: int, n_samples_per_bin: int ) -> np.ndarray:
+    """ The original get_binned_sampling selection: groupby_bins over the samples axis, linspace selection in each bin """
+    training_indices = []
+    samples_axis = y_data_full[ y_data_full.dims[0] ]
+    for sbin in samples_axis.groupby_bins( y_data_full, n_bins ):
+        binned_indices: xa.DataArray = sbin[1].astype( np.int64 )
+        ns = binned_indices.size
+        if ns <= n_samples_per_bin:
+            training_indices.append( binned_indices.values )
+        else:
+            selection_indices = np.linspace( 0, ns-1, n_samples_per_bin ).astype( np.int64 )
+            training_indices.append( binned_indices.isel( samples=selection_indices ).values )
+    return np.concatenate( training_indices )
+
+def samples_array( values: np.ndarray ) -> xa.DataArray:
+    return xa.DataArray( values, dims=[ 'samples' ], coords=dict( samples=np.arange( values.size ) ) )
+
+def test_binned_sample_indices_match_groupby_bins():
+    rng = np.random.default_rng( 0 )
+    for n_samples, n_bins, n_per_bin in [ ( 5000, 16, 50 ), ( 20000, 8, 333 ), ( 997, 10, 7 ), ( 3000, 5, 1000 ) ]:
+        y_data = rng.gamma( 2.0, size=n_samples )
+        expected = groupby_bins_sampling( samples_array( y_data ), n_bins, n_per_bin )
+        assert np.array_equal( get_binned_sample_indices( y_data, n_bins, n_per_bin ), expected )
+
+def test_linspace_positions_at_rounding_boundaries():
+    for count in range( 2, 400 ):
+        for n_per_bin in ( 2, 3, 7, 49, 100 ):
+            if count <= n_per_bin: continue
+            y_data = np.arange( count, dtype=np.float64 )
+            expected = np.linspace( 0, count-1, n_per_bin ).astype( np.int64 )
+            assert np.array_equal( get_binned_sample_indices( y_data, 1, n_per_bin ), expected )
+
+def test_binned_sampling_skips_nans():
+    y_data = np.arange( 100, dtype=np.float64 )
+    y_data[ ::10 ] = np.nan
+    x_data = xa.DataArray( np.arange( 200.0 ).reshape( 100, 2 ), dims=[ 'samples', 'band' ] )
+    x_train, y_train = get_binned_sampling( x_data, samples_array( y_data ), 4, 5 )
+    assert y_train.size == 20 and np.isfinite( y_train.values ).all()
@@ -0,0 +1,47 @@
+import os
+import numpy as np
+import xarray as xa
+import pytest
+from geoproc.data.subset_cache import SubsetCache
+from geoproc.util.cip import CIP, CIP_paths
+
+@pytest.fixture
+def cip_server( tmp_path, monkeypatch ) -> str:
+    """ Local directory with the CREATE-IP layout standing in for the THREDDS server """
+    server = str( tmp_path / "server" )
+    data_file = server + CIP_paths["merra2"].format( "tas" )
+    os.makedirs( os.path.dirname( data_file ) )
+    time = np.arange( 24 )
+    data = np.arange( 24 * 4 * 5, dtype=np.float32 ).reshape( 24, 4, 5 )
+    xa.Dataset( dict( tas=( ( "time", "lat", "lon" ), data ) ), coords=dict( time=time, lat=np.arange( 4.0 ), lon=np.arange( 5.0 ) ) ).to_netcdf( data_file )
+    monkeypatch.setattr( CIP, "server", server )
+    monkeypatch.setattr( CIP, "_cache", SubsetCache( str( tmp_path / "cache" ) ) )
+    return data_file
+
+def test_cache_miss_then_local_hit( cip_server ):
+    expected = xa.open_dataset( cip_server ).tas.isel( time=slice( 2, 8 ) ).load()
+    first = CIP.data_array( "merra2", "tas", isel=dict( time=slice( 2, 8 ) ) )
+    cache: SubsetCache = CIP.cache()
+    assert len( cache.catalog ) == 1
+    assert os.path.isfile( cache.file_path( next( iter( cache.catalog ) ) ) )
+    os.rename( cip_server, cip_server + ".offline" )
+    catalog_mtime = os.path.getmtime( cache.catalog_file )
+    second = CIP.data_array( "merra2", "tas", isel=dict( time=slice( 2, 8 ) ) )
+    assert np.array_equal( first.values, expected.values ) and np.array_equal( second.values, expected.values )
+    assert cache.dirty and os.path.getmtime( cache.catalog_file ) == catalog_mtime
+    cache.flush()
+    assert not cache.dirty and SubsetCache( cache.cache_dir ).catalog.keys() == cache.catalog.keys()
+
+def test_lru_eviction( cip_server ):
+    cache: SubsetCache = CIP.cache()
+    selections = [ dict( time=slice( i0, i0 + 6 ) ) for i0 in ( 0, 6, 12 ) ]
+    CIP.data_array( "merra2", "tas", isel=selections[0] )
+    entry_size = next( iter( cache.catalog.values() ) )['size']
+    cache.max_size = 2.5 * entry_size
+    CIP.data_array( "merra2", "tas", isel=selections[1] )
+    CIP.data_array( "merra2", "tas", isel=selections[0] )
+    CIP.data_array( "merra2", "tas", isel=selections[2] )
+    keys = [ cache.key( CIP.address( "merra2", "tas" ), "tas", selection ) for selection in selections ]
+    assert keys[1] not in cache.catalog and not os.path.isfile( cache.file_path( keys[1] ) )
+    assert keys[0] in cache.catalog and keys[2] in cache.catalog
+    assert set( SubsetCache( cache.cache_dir ).catalog.keys() ) == { keys[0], keys[2] }
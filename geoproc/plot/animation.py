@@ -7,6 +7,7 @@ from matplotlib.colors import LinearSegmentedColormap, Normalize, ListedColormap
 import matplotlib.pyplot as plt
 from threading import  Thread
 from geoproc.util.configuration import sanitize, ConfigurableObject as BaseOp
+from geoproc.plot.pyramid import OverviewPyramid, PyramidImage
 from matplotlib.figure import Figure
 from matplotlib.image import AxesImage
 import matplotlib as mpl
@@ -217,6 +218,13 @@ class SliceAnimation:
         self.nPlots = len(self.data)
         self.metrics: Dict = kwargs.get("metrics", {})
         self.frame_marker: Line2D = None
+        self.cache_frames = kwargs.pop( "cache_frames", False )
+        self.blit = kwargs.pop( "blit", self.cache_frames )
+        self.frame_cache: Dict[int,np.ndarray] = {}
+        self.use_pyramid = kwargs.pop( "pyramid", False )
+        self.pyramid_images: Dict[int,PyramidImage] = {}
+        self.frame_indices: List[np.ndarray] = [ self.get_frame_indices( iPlot ) for iPlot in range( self.nPlots ) ]
+        self._background = None
         self.setup_plots(**kwargs)
         self.z_axis = kwargs.pop('z', 0)
         self.z_axis_name = self.data[0].dims[ self.z_axis ]
@@ -227,6 +235,8 @@ class SliceAnimation:
 
         self.add_plots( **kwargs )
         self.add_slider( **kwargs )
+        if self.cache_frames: self.build_frame_cache()
+        if self.blit: self.setup_blitting()
         self._update(0)
 
     def preprocess_inputs(self, data_arrays: Union[xa.DataArray,List[xa.DataArray]]  ) -> List[xa.DataArray]:
@@ -281,6 +291,72 @@ class SliceAnimation:
         data = self.data[iPlot]
         return data.coords[ data.dims[iCoord] ].values
 
+    def get_frame_indices(self, iPlot: int ) -> np.ndarray:
+        """ Index along axis 0 of plot iPlot nearest to each animation frame ( the mapping data.sel(..., method='nearest') would compute per step ) """
+        coord = self.get_anim_coord( iPlot )
+        if coord.size == self.nFrames and np.array_equal( coord, self.frames ): return np.arange( self.nFrames )
+        if coord.size == 1: return np.zeros( self.nFrames, dtype=np.int64 )
+        i1 = np.clip( np.searchsorted( coord, self.frames ), 1, coord.size - 1 )
+        i0 = i1 - 1
+        return np.where( np.abs( self.frames - coord[i0] ) <= np.abs( coord[i1] - self.frames ), i0, i1 )
+
+    def get_frame_stride(self, iPlot: int ) -> int:
+        """ Downsampling step that brings the frames of plot iPlot down to ( about ) the screen resolution of its subplot """
+        extent = self.getSubplot( iPlot ).get_window_extent()
+        ny, nx = self.data[iPlot].shape[-2:]
+        return max( 1, int( min( ny / max( extent.height, 1 ), nx / max( extent.width, 1 ) ) ) )
+
+    def build_frame_cache(self):
+        """ Renders every frame of every plot once, through the colormap and norm of its image, into a contiguous
+            ( frame, y, x, rgba ) uint8 buffer, downsampled to screen resolution ( nearest, so class maps are preserved ) """
+        t0 = time.time()
+        for iPlot in range( self.nPlots ):
+            data: xa.DataArray = self.data[iPlot]
+            aname, image = self.images[iPlot]
+            stride = self.get_frame_stride( iPlot )
+            frame_indices = self.frame_indices[iPlot]
+            ny, nx = ( math.ceil( n / stride ) for n in data.shape[-2:] )
+            frames = np.empty( [ self.nFrames, ny, nx, 4 ], dtype=np.uint8 )
+            for iFrame, iData in enumerate( frame_indices ):
+                if iFrame and ( iData == frame_indices[iFrame-1] ):
+                    frames[iFrame] = frames[iFrame-1]
+                else:
+                    frame_data = data[ iData, ::stride, ::stride ].values
+                    frames[iFrame] = image.to_rgba( np.ma.masked_invalid( frame_data ), bytes=True )
+            self.frame_cache[iPlot] = frames
+        print( f"Cached {self.nFrames} frames for {self.nPlots} plots in {time.time()-t0:.2f} sec" )
+
+    def setup_blitting(self):
+        """ Marks the per-frame artists as animated so that slider steps only redraw those over a saved background """
+        self.slider.drawon = False
+        for artist in self.animated_artists(): artist.set_animated( True )
+        self.figure.canvas.mpl_connect( 'draw_event', self._on_draw )
+
+    def animated_artists(self) -> List:
+        artists = []
+        for iPlot in range( self.nPlots ):
+            aname, image = self.images[iPlot]
+            artists.extend( [ image, self.getSubplot( iPlot ).title ] )
+        if self.auxplot is not None: artists.append( self.images[self.nPlots][1] )
+        if self.frame_marker is not None: artists.append( self.frame_marker )
+        return artists
+
+    def _on_draw(self, event ):
+        self._background = self.figure.canvas.copy_from_bbox( self.figure.bbox )
+        self._draw_animated()
+
+    def _draw_animated(self):
+        for artist in self.animated_artists(): self.figure.draw_artist( artist )
+
+    def blit_frame(self):
+        canvas = self.figure.canvas
+        if self._background is None: return canvas.draw_idle()
+        canvas.restore_region( self._background )
+        self.figure.draw_artist( self.slider_axes )
+        self._draw_animated()
+        canvas.blit( self.figure.bbox )
+        canvas.flush_events()
+
     def getSubplotShape(self, has_diagnostics: bool  ) -> List[int]:
         nCells = self.nPlots+1 if has_diagnostics else self.nPlots
         nrows = math.floor( math.sqrt( nCells ) )
@@ -320,7 +396,7 @@ class SliceAnimation:
             x = [iFrame, iFrame]
             y = [ axis.dataLim.y0, axis.dataLim.y1 ]
             if self.frame_marker == None:
-                self.frame_marker, = axis.plot( x, y, color="yellow", lw=3, alpha=0.5 )
+                self.frame_marker, = axis.plot( x, y, color="yellow", lw=3, alpha=0.5, animated=self.blit )
             else:
                 self.frame_marker.set_data( x, y )
 
@@ -333,9 +409,16 @@ class SliceAnimation:
         data: xa.DataArray = self.data[iPlot]
         subplot: Axes = self.getSubplot( iPlot )
         cm = self.create_cmap( data.attrs.get("cmap",{}) )
-        z: xa.DataArray =  data[ 0, :, : ]   # .transpose()
+        if self.use_pyramid and not self.cache_frames:
+            pyramid = OverviewPyramid( data )
+            level = pyramid.level_for_extent( subplot )
+            z: xa.DataArray = pyramid.level_array( 0, level )
+        else:
+            z: xa.DataArray =  data[ 0, :, : ]   # .transpose()
         color_tick_labels = cm.pop( 'tick_labels', None )
         image: AxesImage = z.plot.imshow( ax=subplot, **cm )
+        if self.use_pyramid and not self.cache_frames:
+            self.pyramid_images[iPlot] = PyramidImage( pyramid, image, level )
         if color_tick_labels is not None: image.colorbar.ax.set_xticklabels( color_tick_labels )
         overlays = kwargs.get( "overlays", {} )
         for color, overlay in overlays.items():
@@ -371,19 +454,19 @@ class SliceAnimation:
             axis.legend()
 
     def update_plots(self, iFrame: int ):
-        tval = self.frames[ iFrame ]
         for iPlot in range(self.nPlots):
             subplot: Axes = self.getSubplot(iPlot)
-            data = self.data[iPlot]
-            frame_image = data.sel( **{ data.dims[0]: tval }, method='nearest' )
-            try:                tval1 = frame_image.time.values
-            except Exception:   tval1 = tval
+            iData = self.frame_indices[iPlot][iFrame]
+            tval1 = self.get_anim_coord( iPlot )[ iData ]
             aname, current_image = self.images[iPlot]
-            current_image.set_data( frame_image )
+            if iPlot in self.frame_cache:       current_image.set_data( self.frame_cache[iPlot][iFrame] )
+            elif iPlot in self.pyramid_images:  self.pyramid_images[iPlot].set_frame( iData )
+            else:                               current_image.set_data( self.data[iPlot][ iData ] )
             stval = str(tval1).split("T")[0]
             subplot.title.set_text( f"{aname}: F-{iFrame} [{stval}]" )
         self.update_metrics( iFrame )
         self.update_aux_plot(iFrame)
+        if self.blit: self.blit_frame()
 
     def onMetricsClick(self, event):
         if event.xdata != None and event.ydata != None:
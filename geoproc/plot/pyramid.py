@@ -0,0 +1,141 @@
+from matplotlib.axes import Axes
+from matplotlib.image import AxesImage
+from collections import OrderedDict
+import xarray as xa
+import numpy as np
+from typing import List, Union, Dict, Tuple, Optional
+import math, json
+
+def block_mean( array: np.ndarray, factor: int ) -> np.ndarray:
+    """ Mean over factor x factor blocks of the last two axes, ignoring nans ( trailing partial blocks are trimmed ) """
+    ny, nx = ( n // factor for n in array.shape[-2:] )
+    blocks = array[ ..., :ny*factor, :nx*factor ].reshape( array.shape[:-2] + ( ny, factor, nx, factor ) ).astype( np.float32 )
+    valid = np.isfinite( blocks )
+    counts = valid.sum( axis=(-3,-1) )
+    sums = np.where( valid, blocks, 0 ).sum( axis=(-3,-1) )
+    return np.where( counts > 0, sums / np.maximum( counts, 1 ), np.nan ).astype( np.float32 )
+
+def block_mode( array: np.ndarray, factor: int, classes: np.ndarray ) -> np.ndarray:
+    """ Most frequent of the class values in each factor x factor block ( nan, or 0 for integer data, where a block has none ) """
+    ny, nx = ( n // factor for n in array.shape[-2:] )
+    blocks = array[ ..., :ny*factor, :nx*factor ].reshape( array.shape[:-2] + ( ny, factor, nx, factor ) )
+    result = np.full( array.shape[:-2] + ( ny, nx ), 0 if array.dtype.kind in 'iub' else np.nan, dtype=array.dtype )
+    best_counts = np.zeros( result.shape, dtype=np.int32 )
+    for class_value in classes:
+        counts = ( blocks == class_value ).sum( axis=(-3,-1) )
+        better = counts > best_counts
+        result[ better ] = class_value
+        best_counts[ better ] = counts[ better ]
+    return result
+
+def is_categorical( data: xa.DataArray ) -> bool:
+    """ Class maps are integer arrays, or arrays with a 'colors' ( class ) colormap spec as used by SliceAnimation """
+    cmap_spec = data.attrs.get( "cmap", {} )
+    if isinstance( cmap_spec, str ):
+        try:                cmap_spec = json.loads( cmap_spec )
+        except Exception:   cmap_spec = {}
+    return ( data.dtype.kind in 'iub' ) or ( isinstance( cmap_spec, dict ) and ( cmap_spec.get( "colors" ) is not None ) )
+
+class OverviewPyramid:
+    """
+    Overview levels of a [y,x] or [t,y,x] array for interactive viewing: level k is downsampled by 2**k ( block mode for
+    class maps, block mean for continuous data ) down to min_size pixels.  Levels are computed from the full resolution
+    frame on first access and kept in a bounded LRU cache of cache_size frames.
+    """
+
+    def __init__(self, data: xa.DataArray, **kwargs ):
+        self.data = data
+        self.categorical: bool = kwargs.get( "categorical", is_categorical( data ) )
+        self.classes: Optional[np.ndarray] = kwargs.get( "classes", None )
+        self.cache_size = kwargs.get( "cache_size", 64 )
+        min_size = kwargs.get( "min_size", 256 )
+        self.shape = data.shape[-2:]
+        self.nlevels = max( int( math.ceil( math.log2( max( self.shape ) / min_size ) ) ), 0 ) + 1
+        self._cache: OrderedDict = OrderedDict()
+
+    def factor(self, level: int ) -> int:
+        return 2 ** level
+
+    def get_classes(self, frame_data: np.ndarray ) -> np.ndarray:
+        """ The classes given to the constructor, otherwise the classes present in this frame """
+        if self.classes is not None: return self.classes
+        if frame_data.dtype.kind in 'ub': return np.flatnonzero( np.bincount( frame_data.ravel() ) )
+        return np.unique( frame_data[ np.isfinite( frame_data ) ] )
+
+    def frame(self, iFrame: int = 0, level: int = 0 ) -> np.ndarray:
+        full_frame = self.data[iFrame] if self.data.ndim == 3 else self.data
+        if level == 0: return full_frame.values
+        key = ( iFrame, level )
+        if key in self._cache:
+            self._cache.move_to_end( key )
+            return self._cache[key]
+        frame_data = full_frame.values
+        if self.categorical:    result = block_mode( frame_data, self.factor( level ), self.get_classes( frame_data ) )
+        else:                   result = block_mean( frame_data, self.factor( level ) )
+        self._cache[key] = result
+        if len( self._cache ) > self.cache_size: self._cache.popitem( last=False )
+        return result
+
+    def level_coord(self, dim: str, level: int ) -> np.ndarray:
+        coord = self.data.coords[ dim ].values if dim in self.data.coords else np.arange( self.data.sizes[dim], dtype=np.float64 )
+        factor = self.factor( level )
+        n = coord.size // factor
+        return coord[ :n*factor ].reshape( n, factor ).mean( axis=1 )
+
+    def level_array(self, iFrame: int = 0, level: int = 0 ) -> xa.DataArray:
+        ydim, xdim = self.data.dims[-2:]
+        coords = { ydim: self.level_coord( ydim, level ), xdim: self.level_coord( xdim, level ) }
+        return xa.DataArray( self.frame( iFrame, level ), dims=[ ydim, xdim ], coords=coords, name=self.data.name, attrs=self.data.attrs )
+
+    def extent(self, level: int, pixel_coords: bool = False ) -> Tuple[float,float,float,float]:
+        """ imshow extent ( left, right, bottom, top ) of a level, in data coordinates ( as set by xarray's imshow ) or pixel indices """
+        factor = self.factor( level )
+        axes = []
+        for dim, size in zip( self.data.dims[-2:], self.shape ):
+            if pixel_coords or ( dim not in self.data.coords ):  coord = np.arange( ( size // factor ) * factor, dtype=np.float64 )
+            else:                                               coord = self.data.coords[dim].values[ :( size // factor ) * factor ]
+            step = ( coord[-1] - coord[0] ) / ( coord.size - 1 ) if coord.size > 1 else 1.0
+            axes.append( ( coord[0] - step / 2, coord[-1] + step / 2 ) )
+        ( y0, y1 ), ( x0, x1 ) = axes
+        return ( x0, x1, y1, y0 )
+
+    def level_for_ratio(self, ratio: float ) -> int:
+        """ Coarsest level whose resolution still matches or exceeds ratio ( data pixels per screen pixel ) """
+        return int( np.clip( math.floor( math.log2( max( ratio, 1.0 ) ) ), 0, self.nlevels - 1 ) )
+
+    def level_for_extent(self, axes: Axes ) -> int:
+        """ Level for the full array shown in axes """
+        bbox = axes.get_window_extent()
+        return self.level_for_ratio( min( self.shape[1] / max( bbox.width, 1 ), self.shape[0] / max( bbox.height, 1 ) ) )
+
+    def level_for_view(self, axes: Axes, pixel_coords: bool = False ) -> int:
+        """ Level for the current ( zoomed ) view limits of axes """
+        bbox = axes.get_window_extent()
+        ( x0, x1, y1, y0 ) = self.extent( 0, pixel_coords )
+        xlim, ylim = axes.get_xlim(), axes.get_ylim()
+        npx = self.shape[1] * abs( xlim[1] - xlim[0] ) / abs( x1 - x0 )
+        npy = self.shape[0] * abs( ylim[1] - ylim[0] ) / abs( y1 - y0 )
+        return self.level_for_ratio( min( npx / max( bbox.width, 1 ), npy / max( bbox.height, 1 ) ) )
+
+class PyramidImage:
+    """ Keeps an AxesImage showing the pyramid level that matches the current zoom of its axes """
+
+    def __init__(self, pyramid: OverviewPyramid, image: AxesImage, level: int, iFrame: int = 0, pixel_coords: bool = False ):
+        self.pyramid = pyramid
+        self.image = image
+        self.level = level
+        self.iFrame = iFrame
+        self.pixel_coords = pixel_coords
+        image.axes.callbacks.connect( 'xlim_changed', self.on_view_changed )
+        image.axes.callbacks.connect( 'ylim_changed', self.on_view_changed )
+
+    def set_frame(self, iFrame: int ):
+        self.iFrame = iFrame
+        self.image.set_data( self.pyramid.frame( iFrame, self.level ) )
+
+    def on_view_changed(self, axes: Axes ):
+        level = self.pyramid.level_for_view( axes, self.pixel_coords )
+        if level != self.level:
+            self.level = level
+            self.image.set_data( self.pyramid.frame( self.iFrame, level ) )
+            self.image.set_extent( self.pyramid.extent( level, self.pixel_coords ) )
@@ -0,0 +1,4 @@
+import os, tempfile
+
+# geoproc.util.configuration requires ILAB_HOME at import time
+os.environ.setdefault( "ILAB_HOME", tempfile.mkdtemp( prefix="ilab-" ) )
@@ -0,0 +1,53 @@
+import numpy as np
+import xarray as xa
+import pytest
+import matplotlib as mpl
+mpl.use( "Agg" )
+import matplotlib.pyplot as plt
+from geoproc.plot.animation import SliceAnimation
+
+def series( times: np.ndarray, shape=( 20, 30 ), seed: int = 0, name: str = "data" ) -> xa.DataArray:
+    data = np.random.default_rng( seed ).normal( size=( times.size, ) + shape ).astype( np.float32 )
+    data[ :, 3:5, 7:11 ] = np.nan
+    coords = dict( time=times, y=np.arange( shape[0] ), x=np.arange( shape[1] ) )
+    return xa.DataArray( data, dims=[ "time", "y", "x" ], coords=coords, name=name )
+
+@pytest.fixture
+def animation_inputs():
+    times = np.datetime64( "2020-01-01" ) + np.arange( 8 ) * np.timedelta64( 5, "D" )
+    sparse = np.datetime64( "2020-01-02" ) + np.array( [ 0, 11, 12, 30 ] ) * np.timedelta64( 1, "D" )
+    yield [ series( times, name="full" ), series( sparse, seed=1, name="sparse" ) ]
+    plt.close( "all" )
+
+def test_frame_indices_match_nearest_selection( animation_inputs ):
+    animation = SliceAnimation( animation_inputs )
+    for iPlot, data in enumerate( animation.data ):
+        expected = [ int( np.flatnonzero( data.time.values == data.sel( time=frame, method="nearest" ).time.values )[0] ) for frame in animation.frames ]
+        assert list( animation.frame_indices[iPlot] ) == expected
+    assert list( animation.frame_indices[0] ) == list( range( animation.nFrames ) )
+
+def test_frame_cache_matches_matplotlib_colors( animation_inputs ):
+    animation = SliceAnimation( animation_inputs, cache_frames=True )
+    assert animation.blit and sorted( animation.frame_cache.keys() ) == [ 0, 1 ]
+    for iPlot, data in enumerate( animation.data ):
+        aname, image = animation.images[iPlot]
+        assert animation.get_frame_stride( iPlot ) == 1
+        cache = animation.frame_cache[iPlot]
+        assert cache.shape == ( animation.nFrames, ) + data.shape[1:] + ( 4, ) and cache.dtype == np.uint8
+        for iFrame, frame in enumerate( animation.frames ):
+            frame_data = data.sel( time=frame, method="nearest" ).values
+            expected = image.cmap( image.norm( np.ma.masked_invalid( frame_data ) ), bytes=True )
+            assert np.array_equal( cache[iFrame], expected )
+    animation.slider.set_val( 5 )
+    for iPlot in range( animation.nPlots ):
+        assert np.array_equal( animation.images[iPlot][1].get_array(), animation.frame_cache[iPlot][5] )
+
+def test_frame_cache_stride_downsamples( animation_inputs ):
+    animation = SliceAnimation( animation_inputs, cache_frames=True )
+    animation.get_frame_stride = lambda iPlot: 3
+    animation.build_frame_cache()
+    data, ( aname, image ) = animation.data[1], animation.images[1]
+    cache = animation.frame_cache[1]
+    assert cache.shape[1:3] == ( 7, 10 )
+    expected = image.cmap( image.norm( np.ma.masked_invalid( data[ animation.frame_indices[1][2], ::3, ::3 ].values ) ), bytes=True )
+    assert np.array_equal( cache[2], expected )
@@ -0,0 +1,25 @@
+import xarray as xa
+import numpy as np
+from geoproc.plot.pyramid import OverviewPyramid, block_mean, block_mode
+
+def test_block_reductions_match_loops():
+    rng = np.random.default_rng( 0 )
+    data = rng.integers( 0, 4, size=( 9, 13 ) ).astype( np.float32 )
+    data[ 1, 1 ] = np.nan
+    means, modes = block_mean( data, 2 ), block_mode( data, 2, np.arange( 4.0 ) )
+    for iy in range( 4 ):
+        for ix in range( 6 ):
+            block = data[ 2*iy: 2*iy+2, 2*ix: 2*ix+2 ]
+            assert np.isclose( means[ iy, ix ], np.nanmean( block ) )
+            counts = [ np.sum( block == value ) for value in range( 4 ) ]
+            assert modes[ iy, ix ] == np.argmax( counts )
+
+def test_classes_first_seen_in_later_frames():
+    frames = np.zeros( ( 2, 8, 8 ), dtype=np.float32 )
+    frames[ 0, :4 ] = 1.0
+    frames[ 1, :4 ] = 5.0
+    data = xa.DataArray( frames, dims=[ 'time', 'y', 'x' ], attrs=dict( cmap=dict( colors=[ ( 0, 'land', 'green' ) ] ) ) )
+    pyramid = OverviewPyramid( data, min_size=2 )
+    assert pyramid.categorical
+    assert np.array_equal( np.unique( pyramid.frame( 0, 1 ) ), [ 0.0, 1.0 ] )
+    assert np.array_equal( np.unique( pyramid.frame( 1, 1 ) ), [ 0.0, 5.0 ] )
@@ -433,7 +433,7 @@ class WaterMapGenerator(ConfigurableObject):
             patched_water_maps.name = f"Lake {lake_index}"
             result: xr.DataArray = sanitize(patched_water_maps).xgeo.to_utm( [250.0, 250.0] )
             self.write_water_area_results( result, patched_water_maps_file + ".txt" )
-            if format ==  'tif':    result.xgeo.to_tif( result_file )
+            if format ==  'tif':    result.xgeo.to_cog( result_file, dtype=np.uint8, compress=kwargs.get('compress','DEFLATE') )
             else:                   result.to_netcdf( result_file )
             print( f"Saving patched_water_maps for lake {lake_index} to {patched_water_maps_file}")
             return patched_water_maps.assign_attrs( roi = self.roi_bounds )
@@ -0,0 +1,90 @@
+import numpy as np
+import os, json, pickle, time
+from typing import List, Dict, Optional, Any
+
+class ArtifactStore:
+    """
+    Directory-based store for model results: large arrays ( embeddings, weights, ... ) are saved as .npy files that are
+    memory-mapped on first access, small values go to a JSON metadata record, and the ( optional ) fitted model object is
+    pickled separately so it is only unpickled when actually needed.
+    """
+
+    MetadataFile = "metadata.json"
+    ModelFile = "model.pkl"
+
+    def __init__(self, path: str ):
+        self.path = path
+        self._arrays: Dict[str,np.ndarray] = {}
+        self._model = None
+        self._metadata: Optional[Dict] = None
+
+    @classmethod
+    def save( cls, path: str, arrays: Dict[str,np.ndarray] = None, model: Any = None, **metadata ) -> "ArtifactStore":
+        os.makedirs( path, exist_ok=True )
+        arrays = {} if arrays is None else arrays
+        for name in cls( path ).saved_arrays():
+            if name not in arrays: os.remove( os.path.join( path, f"{name}.npy" ) )
+        for name, array in arrays.items():
+            np.save( os.path.join( path, f"{name}.npy" ), np.asarray( array ) )
+        model_file = os.path.join( path, cls.ModelFile )
+        if model is not None:
+            with open( model_file, "wb" ) as f: pickle.dump( model, f, protocol=pickle.HIGHEST_PROTOCOL )
+        elif os.path.isfile( model_file ):
+            os.remove( model_file )
+        record = dict( arrays={ name: dict( shape=list(np.shape(array)), dtype=str(np.asarray(array).dtype) ) for name, array in arrays.items() },
+                       model=( model is not None ), created=time.time(), metadata=metadata )
+        with open( os.path.join( path, cls.MetadataFile ), "w" ) as f: json.dump( record, f, indent=1, default=str )
+        print( f"Saved artifacts {list(arrays.keys())} to {path}" )
+        return cls( path )
+
+    @classmethod
+    def save_umap( cls, path: str, mapper, save_model: bool = True, **metadata ) -> "ArtifactStore":
+        """ Saves a fitted umap.UMAP: the training embedding as a memory-mappable array, the mapper itself ( needed for transform ) optionally """
+        metadata.update( n_components=mapper.n_components, n_neighbors=mapper.n_neighbors )
+        return cls.save( path, dict( training_embedding=mapper.embedding_ ), mapper if save_model else None, **metadata )
+
+    def path_for(self, name: str ) -> str:
+        return os.path.join( self.path, f"{name}.npy" )
+
+    def saved_arrays(self) -> List[str]:
+        """ Names of the arrays in the record currently on disk ( empty for a new store ) """
+        if not os.path.isfile( os.path.join( self.path, self.MetadataFile ) ): return []
+        self._metadata = None
+        return [ name for name in self.keys() if os.path.isfile( self.path_for( name ) ) ]
+
+    def register(self, name: str ):
+        """ Adds an array that was written directly into the store ( e.g. as a .npy memmap at path_for(name) ) to the metadata record """
+        self._metadata = None
+        array = np.load( self.path_for( name ), mmap_mode='r' )
+        self.record['arrays'][name] = dict( shape=list(array.shape), dtype=str(array.dtype) )
+        with open( os.path.join( self.path, self.MetadataFile ), "w" ) as f: json.dump( self.record, f, indent=1, default=str )
+        self._arrays.pop( name, None )
+
+    @property
+    def record(self) -> Dict:
+        if self._metadata is None:
+            with open( os.path.join( self.path, self.MetadataFile ) ) as f: self._metadata = json.load( f )
+        return self._metadata
+
+    @property
+    def metadata(self) -> Dict:
+        return self.record['metadata']
+
+    def keys(self) -> List[str]:
+        return list( self.record['arrays'].keys() )
+
+    def __contains__(self, name: str ) -> bool:
+        return name in self.record['arrays']
+
+    def __getitem__(self, name: str ) -> np.ndarray:
+        if name not in self._arrays:
+            if name not in self: raise KeyError( f"No array '{name}' in artifact store {self.path}" )
+            self._arrays[name] = np.load( os.path.join( self.path, f"{name}.npy" ), mmap_mode='r' )
+        return self._arrays[name]
+
+    @property
+    def model(self):
+        if self._model is None:
+            if not self.record['model']: raise Exception( f"No model saved in artifact store {self.path}" )
+            with open( os.path.join( self.path, self.ModelFile ), "rb" ) as f: self._model = pickle.load( f )
+        return self._model
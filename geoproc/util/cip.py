@@ -1,16 +1,20 @@
 import xarray as xa
-
-CreateIPServer = "https://dataserver.nccs.nasa.gov/thredds/dodsC/bypass/CREATE-IP/"
-
-CIP_addresses = {
-    "merra2": CreateIPServer + "/reanalysis/MERRA2/mon/atmos/{}.ncml",
-    "merra": CreateIPServer + "/reanalysis/MERRA/mon/atmos/{}.ncml",
-    "ecmwf": CreateIPServer + "/reanalysis/ECMWF/mon/atmos/{}.ncml",
-    "cfsr": CreateIPServer + "/reanalysis/CFSR/mon/atmos/{}.ncml",
-    "20crv": CreateIPServer + "/reanalysis/20CRv2c/mon/atmos/{}.ncml",
-    "jra": CreateIPServer + "/reanalysis/JMA/JRA-55/mon/atmos/{}.ncml",
+import os
+from typing import Dict
+
+CreateIPServer = os.environ.get( "CIP_SERVER", "https://dataserver.nccs.nasa.gov/thredds/dodsC/bypass/CREATE-IP/" )
+
+CIP_paths = {
+    "merra2": "/reanalysis/MERRA2/mon/atmos/{}.ncml",
+    "merra": "/reanalysis/MERRA/mon/atmos/{}.ncml",
+    "ecmwf": "/reanalysis/ECMWF/mon/atmos/{}.ncml",
+    "cfsr": "/reanalysis/CFSR/mon/atmos/{}.ncml",
+    "20crv": "/reanalysis/20CRv2c/mon/atmos/{}.ncml",
+    "jra": "/reanalysis/JMA/JRA-55/mon/atmos/{}.ncml",
 }
 
+CIP_addresses = { model: CreateIPServer + path for model, path in CIP_paths.items() }
+
 Local_paths = {
     "merra2-daily": "/Users/tpmaxwel/Dropbox/Tom/Data/MERRA/DAILY/2005/JAN/*.nc",
     "merra2-2d_asm": "/Users/tpmaxwel/Dropbox/Tom/Data/MERRA/MERRA2/inst1_2d_asm_Nx.2018-7/*.nc*"
@@ -18,20 +22,37 @@ Local_paths = {
 }
 
 class CIP:
+    """ Access to the CREATE-IP reanalysis collections.  The server ( $CIP_SERVER ) can be a local directory with the same
+        layout standing in for the THREDDS server; fetched subsets are kept in a local SubsetCache ( $CIP_CACHE_DIR ). """
+
+    server = CreateIPServer
+    _cache = None
 
     @classmethod
     def address(cls,  model: str, varName: str) -> str:
-        return CIP_addresses[model.lower()].format(varName)
+        return cls.server + CIP_paths[model.lower()].format(varName)
+
+    @classmethod
+    def cache(cls):
+        from geoproc.data.subset_cache import SubsetCache
+        if cls._cache is None:
+            cache_dir = os.environ.get( "CIP_CACHE_DIR", os.path.expanduser( "~/.geoproc/cip_cache" ) )
+            cls._cache = SubsetCache( cache_dir, float( os.environ.get( "CIP_CACHE_SIZE", 20e9 ) ) )
+        return cls._cache
 
     @classmethod
-    def data_array(cls,  model: str, varName: str) -> xa.DataArray:
+    def data_array(cls,  model: str, varName: str, isel: Dict = None, sel: Dict = None, cache: bool = True ) -> xa.DataArray:
+        """ Variable varName of the model's collection, subset by isel/sel ( index / coordinate selections per dim ) """
         data_address = cls.address( model, varName )
+        if cache: return cls.cache().get( data_address, varName, isel, sel )
         print( f"Reading data from address {data_address}")
-        dataset = xa.open_dataset(data_address)
-        return dataset[ varName ]
+        data_array = xa.open_dataset(data_address)[ varName ]
+        if isel: data_array = data_array.isel( **isel )
+        if sel:  data_array = data_array.sel( **sel )
+        return data_array
 
     @classmethod
     def local_data_array(cls,  model: str, varName: str) -> xa.DataArray:
         data_address = Local_paths[model.lower()]
         dataset = xa.open_mfdataset(data_address)
-        return dataset[varName]
\ No newline at end of file
+        return dataset[varName]
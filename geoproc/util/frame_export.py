@@ -0,0 +1,107 @@
+import matplotlib as mpl
+from matplotlib.colors import Normalize, Colormap, BoundaryNorm
+import numpy as np
+from typing import List, Tuple, Union, Dict, Iterable, Iterator, Optional
+from multiprocessing import Pool, cpu_count
+import subprocess, time
+
+_renderer = None
+
+def _init_renderer( renderer: "FrameRenderer" ):
+    global _renderer
+    _renderer = renderer
+
+def _render_frame( frame: Tuple[np.ndarray,str] ) -> np.ndarray:
+    return _renderer.render( *frame )
+
+class FrameRenderer:
+    """
+    Offscreen ( Agg ) frame renderer for movie export: each 2D frame is colored with a colormap lookup table ( 256 entries
+    across the norm range, or one per color for a BoundaryNorm, which maps class codes to colormap indices ) and drawn with its label and the overlays on a figure
+    that is created once per process, returning the canvas as an ( h, w, 3 ) uint8 RGB array.
+    """
+
+    def __init__(self, cmap: Union[str,Colormap], norm: Normalize = None, **kwargs ):
+        cmap = mpl.colormaps[cmap] if isinstance( cmap, str ) else cmap
+        self.norm = norm
+        lut_values = np.arange( cmap.N ) if isinstance( norm, BoundaryNorm ) else ( np.arange( 256 ) + 0.5 ) / 256
+        self.lut: np.ndarray = np.concatenate( [ cmap( lut_values, bytes=True ), cmap( [ np.nan ], bytes=True ) ] )
+        self.overlays: Dict = kwargs.get( 'overlays', {} )
+        self.figsize = kwargs.get( 'figsize', None )
+        self.dpi = kwargs.get( 'dpi', 100 )
+        self.canvas = None
+
+    def codes(self, data: np.ndarray ) -> np.ndarray:
+        """ Lookup table indices: 0-255 across the norm range ( colormap indices for a BoundaryNorm ), and the last entry
+            ( the colormap's 'bad' color ) for nan """
+        data = np.asarray( data, dtype=np.float32 )
+        nbad = self.lut.shape[0] - 1
+        if isinstance( self.norm, BoundaryNorm ):
+            indices = self.norm( np.ma.masked_invalid( data ) )
+            codes = np.clip( np.ma.filled( indices, 0 ), 0, nbad - 1 )
+            codes[ np.ma.getmaskarray( indices ) ] = nbad
+            return codes.astype( np.uint16 )
+        if self.norm is None:   scaled = ( data - np.nanmin( data ) ) / max( float( np.nanmax( data ) - np.nanmin( data ) ), 1e-20 )
+        elif type( self.norm ) == Normalize:  scaled = ( data - self.norm.vmin ) / ( self.norm.vmax - self.norm.vmin )
+        else:                   scaled = np.ma.filled( self.norm( data ).astype( np.float32 ), np.nan )
+        codes = np.clip( scaled * 256, 0, 255 )
+        codes[ np.isnan( codes ) ] = nbad
+        return codes.astype( np.uint16 )
+
+    def setup(self, shape: Tuple[int,int] ):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        figure = Figure( figsize=self.figsize, dpi=self.dpi )
+        self.canvas = FigureCanvasAgg( figure )
+        axes = figure.add_subplot( 1, 1, 1 )
+        axes.set_yticklabels([]); axes.set_xticklabels([])
+        self.image = axes.imshow( np.zeros( shape + (4,), dtype=np.uint8 ) )
+        for color, overlay in self.overlays.items():
+            overlay.plot( ax=axes, color=color, linewidth=2 )
+        self.label = axes.annotate( "", (0,0) )
+
+    def render(self, frame_data: np.ndarray, label: str = "" ) -> np.ndarray:
+        rgba = self.lut[ self.codes( frame_data ) ]
+        if self.canvas is None: self.setup( rgba.shape[:2] )
+        self.image.set_data( rgba )
+        self.label.set_text( label )
+        self.canvas.draw()
+        return np.asarray( self.canvas.buffer_rgba() )[ :, :, :3 ].copy()
+
+def write_gif( file_path: str, frames: Iterator[np.ndarray], fps: float ):
+    from PIL import Image
+    images = ( Image.fromarray( frame ) for frame in frames )
+    first_image = next( images )
+    first_image.save( file_path, save_all=True, append_images=images, duration=int( 1000.0 / fps ), loop=0 )
+
+def write_video( file_path: str, frames: Iterator[np.ndarray], fps: float, codec: str = "h264" ):
+    """ Streams the frames as raw rgb24 through a pipe into ffmpeg """
+    first_frame = next( frames )
+    height, width = first_frame.shape[:2]
+    command = [ mpl.rcParams['animation.ffmpeg_path'], '-y', '-loglevel', 'error', '-f', 'rawvideo', '-vcodec', 'rawvideo',
+                '-s', f'{width}x{height}', '-pix_fmt', 'rgb24', '-r', str(fps), '-i', 'pipe:',
+                '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', '-vcodec', codec, '-pix_fmt', 'yuv420p', file_path ]
+    process = subprocess.Popen( command, stdin=subprocess.PIPE )
+    try:
+        process.stdin.write( first_frame.tobytes() )
+        for frame in frames: process.stdin.write( frame.tobytes() )
+    finally:
+        process.stdin.close()
+        process.wait()
+    if process.returncode != 0: raise Exception( f"ffmpeg failed with return code {process.returncode} writing {file_path}" )
+
+def export_frames( file_path: str, frames: Iterable[Tuple[np.ndarray,str]], renderer: FrameRenderer, fps: float = 1.0, **kwargs ):
+    """
+    Renders ( frame_data, label ) pairs in a pool of processes, in order, and streams the rendered frames to the encoder:
+    PIL for .gif files, ffmpeg otherwise.  kwargs: nproc ( default cpu_count ), chunksize, codec ( ffmpeg only ).
+    """
+    t0 = time.time()
+    nproc = kwargs.get( 'nproc', cpu_count() )
+    chunksize = kwargs.get( 'chunksize', 4 )
+    encode = write_gif if file_path.lower().endswith( ".gif" ) else lambda fpath, rendered, fps: write_video( fpath, rendered, fps, kwargs.get( 'codec', "h264" ) )
+    if nproc > 1:
+        with Pool( processes=nproc, initializer=_init_renderer, initargs=( renderer, ) ) as pool:
+            encode( file_path, pool.imap( _render_frame, frames, chunksize ), fps )
+    else:
+        encode( file_path, ( renderer.render( *frame ) for frame in frames ), fps )
+    print( f" Exported frames to {file_path} in {time.time()-t0:.2f} sec" )
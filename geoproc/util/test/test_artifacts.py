@@ -0,0 +1,57 @@
+import os
+import numpy as np
+import pytest
+from geoproc.util.artifacts import ArtifactStore
+
+class Model:
+    def __init__(self, weights ): self.weights = weights
+
+def test_round_trip( tmp_path ):
+    path = str( tmp_path / "store" )
+    embedding = np.random.default_rng(0).normal( size=(40,3) ).astype( np.float32 )
+    labels = np.arange( 40, dtype=np.int16 )
+    ArtifactStore.save( path, dict( embedding=embedding, labels=labels ), Model( [1,2,3] ), version="v1", n_neighbors=15 )
+    store = ArtifactStore( path )
+    assert sorted( store.keys() ) == [ 'embedding', 'labels' ]
+    assert 'embedding' in store and 'weights' not in store
+    assert isinstance( store['embedding'], np.memmap )
+    np.testing.assert_array_equal( store['embedding'], embedding )
+    assert store['labels'].dtype == np.int16
+    assert store.record['arrays']['embedding'] == dict( shape=[40,3], dtype='float32' )
+    assert store.metadata == dict( version="v1", n_neighbors=15 )
+    assert store._model is None
+    assert store.model.weights == [1,2,3]
+
+def test_register( tmp_path ):
+    path = str( tmp_path / "store" )
+    store = ArtifactStore.save( path, dict( a=np.zeros(4) ) )
+    out = np.lib.format.open_memmap( store.path_for( 'direct' ), mode='w+', dtype=np.float32, shape=(2,5) )
+    out[:] = np.arange( 10 ).reshape( 2, 5 )
+    out.flush()
+    store.register( 'direct' )
+    reopened = ArtifactStore( path )
+    assert sorted( reopened.keys() ) == [ 'a', 'direct' ]
+    np.testing.assert_array_equal( reopened['direct'], np.arange( 10 ).reshape( 2, 5 ) )
+
+def test_stale_keys_are_dropped_on_resave( tmp_path ):
+    path = str( tmp_path / "store" )
+    old_store = ArtifactStore.save( path, dict( a=np.zeros(4), b=np.ones(4) ), Model( 1 ) )
+    assert 'b' in old_store and old_store.model.weights == 1
+    ArtifactStore.save( path, dict( a=np.full( 4, 2.0 ) ) )
+    store = ArtifactStore( path )
+    assert store.keys() == [ 'a' ]
+    assert 'b' not in store
+    with pytest.raises( KeyError ): store['b']
+    assert not os.path.exists( store.path_for( 'b' ) )
+    assert not os.path.exists( os.path.join( path, ArtifactStore.ModelFile ) )
+    with pytest.raises( Exception, match="No model" ): store.model
+    np.testing.assert_array_equal( store['a'], 2.0 )
+
+def test_register_does_not_restore_stale_keys( tmp_path ):
+    path = str( tmp_path / "store" )
+    old_store = ArtifactStore.save( path, dict( a=np.zeros(4), b=np.ones(4) ) )
+    old_store.keys()
+    ArtifactStore.save( path, dict( a=np.zeros(4) ) )
+    np.save( old_store.path_for( 'c' ), np.arange(3) )
+    old_store.register( 'c' )
+    assert sorted( ArtifactStore( path ).keys() ) == [ 'a', 'c' ]
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+import matplotlib as mpl
+mpl.use( "Agg" )
+from matplotlib.colors import Normalize, LogNorm, BoundaryNorm, ListedColormap, LinearSegmentedColormap
+from geoproc.util.frame_export import FrameRenderer, export_frames, write_gif
+
+def frame_data( nframes: int = 5, shape=( 20, 30 ), seed: int = 0 ) -> np.ndarray:
+    data = np.random.default_rng( seed ).uniform( 0.1, 4.0, size=( nframes, ) + shape ).astype( np.float32 )
+    data[ :, 2:4, 5:9 ] = np.nan
+    return data
+
+def lake_cmap():
+    return LinearSegmentedColormap.from_list( "lake-map", [ (0.0, 0.0, 0.1), (0.05, 0.7, 0.2), (0, 0, 1), (1, 1, 0) ], N=4 )
+
+@pytest.mark.parametrize( "cmap,norm", [ ( "jet", None ), ( "jet", Normalize( 1.0, 3.0 ) ), ( "viridis", LogNorm( 0.5, 3.0 ) ), ( lake_cmap(), Normalize( 0, 4 ) ),
+                                         ( ListedColormap( [ "red", "green", "blue", "yellow" ] ), BoundaryNorm( [ -0.5, 0.5, 1.5, 2.5, 3.5 ], 4 ) ) ] )
+def test_lut_colors_match_matplotlib( cmap, norm ):
+    data = frame_data( 1 )[0]
+    if isinstance( norm, BoundaryNorm ): data = np.where( np.isnan( data ), np.nan, np.floor( data ) - 1 )
+    renderer = FrameRenderer( cmap, norm )
+    colormap = mpl.colormaps[cmap] if isinstance( cmap, str ) else cmap
+    reference_norm = Normalize( np.nanmin( data ), np.nanmax( data ) ) if norm is None else norm
+    expected = colormap( reference_norm( np.ma.masked_invalid( data ) ), bytes=True )
+    assert np.array_equal( renderer.lut[ renderer.codes( data ) ], expected )
+
+def test_parallel_export_matches_serial( tmp_path ):
+    from PIL import Image
+    data = frame_data()
+    frames = lambda: ( ( data[iF], f"frame[{iF}]" ) for iF in range( data.shape[0] ) )
+    renderer = FrameRenderer( "jet", Normalize( 0.0, 4.0 ), figsize=( 3, 2 ), dpi=50 )
+    rendered = [ FrameRenderer( "jet", Normalize( 0.0, 4.0 ), figsize=( 3, 2 ), dpi=50 ).render( *frame ) for frame in frames() ]
+    assert rendered[0].shape == ( 100, 150, 3 ) and rendered[0].dtype == np.uint8
+    movies = []
+    for nproc in [ 1, 2 ]:
+        path = str( tmp_path / f"movie{nproc}.gif" )
+        export_frames( path, frames(), renderer, fps=4, nproc=nproc, chunksize=2 )
+        with Image.open( path ) as movie:
+            assert movie.n_frames == data.shape[0]
+            movies.append( [ np.asarray( movie.seek( iF ) or movie.convert( "RGB" ) ) for iF in range( movie.n_frames ) ] )
+    assert all( np.array_equal( serial, parallel ) for serial, parallel in zip( *movies ) )
+    reference = str( tmp_path / "reference.gif" )
+    write_gif( reference, iter( rendered ), 4 )
+    with Image.open( reference ) as movie:
+        assert all( np.array_equal( np.asarray( movie.seek( iF ) or movie.convert( "RGB" ) ), frame ) for iF, frame in enumerate( movies[1] ) )
@@ -100,7 +100,14 @@ class ArrayAnimation(ConfigurableObject):
 
         if savePath is not None:
             if ( overwrite or not os.path.exists( savePath )):
-                anim.save( savePath, fps=fps )
+                if roi is None:
+                    from geoproc.util.frame_export import FrameRenderer, export_frames
+                    from multiprocessing import cpu_count
+                    renderer = FrameRenderer( color_map, norm, overlays=overlays, figsize=figure.get_size_inches(), dpi=figure.dpi )
+                    frames = ( ( da.values, f"{da.name}[{iF}]" ) for iF, da in enumerate(data_arrays) )
+                    export_frames( savePath, frames, renderer, fps, nproc=kwargs.get( 'nproc', cpu_count() ) )
+                else:
+                    anim.save( savePath, fps=fps )
                 print( f" Animation saved to {savePath}" )
             else:
                 print( f" Animation file already exists at '{savePath}'', set 'overwrite = True'' if you wish to overwrite it." )
@@ -0,0 +1,35 @@
+import numpy as np
+import xarray as xr
+from scipy.ndimage import convolve1d
+from geoproc.wavelet.transform import B3_spline, atrous_smooth_axis, atrous_smooth, atrous_decompose, XWavelet
+
+def atrous_kernel( scale: int ) -> np.ndarray:
+    """ B3 spline kernel with 2**scale - 1 zeros ( holes ) inserted between the taps """
+    kernel = np.zeros( 4 * 2 ** scale + 1 )
+    kernel[ ::2 ** scale ] = B3_spline
+    return kernel
+
+def test_smooth_axis_matches_convolution():
+    data = np.random.default_rng( 0 ).normal( size=( 3, 40, 37 ) )
+    for scale in range( 3 ):
+        for axis in ( 1, 2 ):
+            expected = convolve1d( data, atrous_kernel( scale ), axis=axis, mode='reflect' )
+            assert np.allclose( atrous_smooth_axis( data, scale, axis ), expected )
+
+def test_decomposition_reconstructs_input():
+    data = np.random.default_rng( 1 ).normal( size=( 5, 32, 48 ) ).astype( np.float32 )
+    planes = atrous_decompose( data, 3, batch_size=2 )
+    assert planes.shape == ( 4, ) + data.shape
+    assert np.allclose( planes.sum( axis=0 ), data, atol=1e-5 )
+    assert np.allclose( planes[-1], atrous_smooth( atrous_smooth( atrous_smooth( data, 0 ), 1 ), 2 ), atol=1e-5 )
+
+def test_accessor_on_coordinate_free_array():
+    data = np.random.default_rng( 2 ).normal( size=( 24, 2, 20 ) )
+    array = xr.DataArray( data, dims=[ 'lat', 'time', 'lon' ] )
+    assert array.wavelet.spatial_axes() == [ 0, 2 ]
+    decomposition = array.wavelet.decompose( 2 )
+    assert decomposition.dims == ( 'scale', 'lat', 'time', 'lon' ) and decomposition.attrs['smooth_plane'] == 3
+    assert np.allclose( decomposition.sum( 'scale' ).values, data )
+    generic = xr.DataArray( data[:,0], dims=[ 'row', 'col' ] )
+    assert generic.wavelet.spatial_axes() == [ 0, 1 ]
+    assert np.allclose( generic.wavelet.smooth( 1 ).values, atrous_smooth( data[:,0], 0 ) )
@@ -2,15 +2,13 @@ import numpy as np
 import xarray as xr
 import os
 import matplotlib.pyplot as plt
-from typing import List, Union, Tuple
+from typing import List, Union, Tuple, Sequence, Optional
 from matplotlib.colors import LinearSegmentedColormap, Normalize
 from geoproc.util.cip import CIP
 import matplotlib.colors as colors
-# from astropy.convolution import convolve
-from scipy.signal import convolve
 DATA_DIR = '/Users/tpmaxwel/Dropbox/Tom/InnovationLab/results/Wavelet'
-use_cache= True
-scale = 0.3
+
+B3_spline = np.array( [ 1, 4, 6, 4, 1 ] ) / 16.0
 
 def centered_norm( image: xr.DataArray, iattrs = None ) -> xr.DataArray:
     centered_image = image - image.mean()
@@ -22,29 +20,90 @@ def norm( image: xr.DataArray ) -> xr.DataArray:
     return image / image.mean()
 
 def get_input_array( collection, variable, index, **kwargs ) -> xr.DataArray:
-    cache_file_name = os.path.join( DATA_DIR, f"{collection}.{variable}.{index}.nc")
-    cache = kwargs.get( 'use_cache', True )
-    if os.path.isfile( cache_file_name ) and cache:
-        dataset = xr.open_dataset(cache_file_name)
-        print( f"Reading cached array from {cache_file_name}")
-        return dataset[ variable ]
-    else:
-        input_array: xr.DataArray = CIP.data_array( collection, variable )
-        norm_array: xr.DataArray = input_array[index]
-        norm_array.to_netcdf( cache_file_name )
-        return norm_array
-
-cubic_spline_mask = np.array( [ [ 1, 4, 6, 4, 1 ], [ 4, 16, 24, 16, 4 ], [ 6, 24, 36, 24, 6 ], [ 4, 16, 24, 16, 4 ], [ 1, 4, 6, 4, 1 ] ] ) / 256.0
-input_array: xr.DataArray = get_input_array( "merra2", "tas", 0, use_cache=use_cache )
-convolve_input = input_array.values
-smoothed: np.ndarray = convolve( convolve_input, cubic_spline_mask, mode="same" )
-wavelet_transform: np.ndarray =  convolve_input - smoothed
-result = xr.DataArray( wavelet_transform, dims=input_array.dims, coords=input_array.coords )
-
-#rnormalize = colors.LogNorm( vmin=0.001, vmax=1.0 )
-
-rnormalize = Normalize( -scale, scale )
-result.plot.imshow( cmap="jet", norm=rnormalize)
-plt.show()
+    return CIP.data_array( collection, variable, isel=dict( time=index ), cache=kwargs.get( 'use_cache', True ) )
+
+def atrous_smooth_axis( data: np.ndarray, scale: int, axis: int, kernel: np.ndarray = B3_spline ) -> np.ndarray:
+    """ 1-D a trous convolution along axis: the kernel taps are 2**scale samples apart, so only kernel.size shifted ( view )
+        slices of the mirror-padded array are summed, whatever the scale """
+    step = 2 ** scale
+    half = kernel.size // 2
+    axis = axis % data.ndim
+    size = data.shape[axis]
+    pad_width = [ (0,0) ] * data.ndim
+    pad_width[axis] = ( half * step, half * step )
+    padded = np.pad( data, pad_width, mode='symmetric' )
+    result = np.zeros( data.shape, dtype=np.result_type( data.dtype, np.float32 ) )
+    for iTap, weight in enumerate( kernel ):
+        result += weight * padded[ ( slice(None), ) * axis + ( slice( iTap * step, iTap * step + size ), ) ]
+    return result
+
+def atrous_smooth( data: np.ndarray, scale: int, axes: Sequence[int] = ( -2, -1 ) ) -> np.ndarray:
+    """ Separable B3 cubic spline smoothing at the given scale over the ( spatial ) axes, broadcast over all other axes """
+    result = data
+    for axis in axes: result = atrous_smooth_axis( result, scale, axis )
+    return result
+
+def atrous_decompose( data: np.ndarray, nscales: int, axes: Sequence[int] = ( -2, -1 ), batch_size: int = 32 ) -> np.ndarray:
+    """
+    Starlet ( isotropic undecimated, a trous ) wavelet transform over the spatial axes.  Returns an array of shape
+    ( nscales + 1, ) + data.shape holding the wavelet planes w_1..w_nscales followed by the final smooth plane c_nscales,
+    so that the planes sum to the input.  Leading ( e.g. time ) axes are processed batch_size entries at a time.
+    """
+    axes = [ axis % data.ndim for axis in axes ]
+    result = np.empty( ( nscales + 1, ) + data.shape, dtype=np.result_type( data.dtype, np.float32 ) )
+    batch_axis = next( ( axis for axis in range( data.ndim ) if axis not in axes ), None )
+    batches = [ slice(None) ] if batch_axis is None else [ slice( i0, i0 + batch_size ) for i0 in range( 0, data.shape[batch_axis], batch_size ) ]
+    for batch in batches:
+        index = ( slice(None), ) * ( batch_axis or 0 ) + ( batch, )
+        smooth = data[ index ]
+        for scale in range( nscales ):
+            next_smooth = atrous_smooth( smooth, scale, axes )
+            result[ ( scale, ) + index ] = smooth - next_smooth
+            smooth = next_smooth
+        result[ ( nscales, ) + index ] = smooth
+    return result
+
+@xr.register_dataarray_accessor('wavelet')
+class XWavelet(object):
+    """  This is an extension for xarray DataArrays providing multi-scale ( a trous / starlet ) wavelet decompositions.
+         It only needs the array itself: no coordinates, crs or GDAL ( unlike XExtension ). """
+
+    SpatialDimNames = { 'x': [ 'x', 'lon', 'longitude' ], 'y': [ 'y', 'lat', 'latitude' ] }
+
+    def __init__(self, xarray_obj: xr.DataArray):
+        self._obj: xr.DataArray = xarray_obj
+
+    def spatial_dim(self, axis: str ) -> Optional[str]:
+        return next( ( str(dim) for dim in self._obj.dims if str(dim).lower() in self.SpatialDimNames[axis] ), None )
+
+    def spatial_axes(self) -> List[int]:
+        """ Axes of the y and x dims ( by name ), otherwise the last two axes """
+        ydim, xdim = self.spatial_dim('y'), self.spatial_dim('x')
+        if ( ydim is not None ) and ( xdim is not None ):
+            return [ self._obj.get_axis_num( ydim ), self._obj.get_axis_num( xdim ) ]
+        return [ self._obj.ndim - 2, self._obj.ndim - 1 ]
+
+    def decompose(self, nscales: int = 4, **kwargs ) -> xr.DataArray:
+        """ ( scale, ... ) array of the wavelet planes at scales 1..nscales, followed ( scale = nscales + 1 ) by the smooth plane """
+        planes = atrous_decompose( self._obj.values, nscales, self.spatial_axes(), kwargs.get( 'batch_size', 32 ) )
+        result = xr.DataArray( planes, dims=( "scale", ) + self._obj.dims, coords=dict( scale=np.arange( 1, nscales + 2 ), **self._obj.coords ),
+                               name=self._obj.name, attrs=dict( self._obj.attrs, smooth_plane=nscales + 1 ) )
+        return result
+
+    def smooth(self, scale: int ) -> xr.DataArray:
+        """ The input smoothed to the given scale ( c_scale ) """
+        smoothed = self._obj.values
+        for iScale in range( scale ): smoothed = atrous_smooth( smoothed, iScale, self.spatial_axes() )
+        return self._obj.copy( data=smoothed )
+
+if __name__ == '__main__':
+    use_cache= True
+    scale = 0.3
+    input_array: xr.DataArray = get_input_array( "merra2", "tas", 0, use_cache=use_cache )
+    result = input_array.wavelet.decompose( 1 )[0]
 
+    #rnormalize = colors.LogNorm( vmin=0.001, vmax=1.0 )
 
+    rnormalize = Normalize( -scale, scale )
+    result.plot.imshow( cmap="jet", norm=rnormalize)
+    plt.show()
@@ -184,6 +184,23 @@ class XGeo(XExtension):
         gdalGrid = self.to_gdalGrid()
         gdalGrid.to_tif( file_path )
 
+    def to_cog(self, file_path: str, **kwargs ):
+        """ Streams each time slice into a band of a tiled, compressed, overviewed Cloud-Optimized GeoTIFF.  When float data
+            is written as integer class codes, nan values are written as nodata ( default: the largest value of the dtype ) """
+        from geoproc.data.cog import COGWriter
+        dtype = np.dtype( kwargs.pop( 'dtype', self._obj.dtype ) )
+        nodata_value = kwargs.pop( 'nodata', self._obj.attrs.get('nodatavals',[None])[0] )
+        if dtype.kind in 'iu':
+            if ( nodata_value is not None ) and np.isnan( nodata_value ): nodata_value = None
+            if ( nodata_value is None ) and ( self._obj.dtype.kind == 'f' ): nodata_value = int( np.iinfo( dtype ).max )
+        num_bands, y_size, x_size = self._obj.shape if self._obj.ndim == 3 else (1,) + self._obj.shape
+        with COGWriter( file_path, x_size, y_size, num_bands, self._geotransform, self._crs.ExportToWkt(), dtype, nodata=nodata_value, **kwargs ) as writer:
+            if self._obj.ndim == 3:
+                for iBand in range( num_bands ):
+                    writer.write_band( iBand + 1, self._obj[iBand].values )
+            else:
+                writer.write_band( 1, self._obj.values )
+
 if __name__ == '__main__':
     from geoproc.data.mwp import MWPDataManager
     import matplotlib.pyplot as plt
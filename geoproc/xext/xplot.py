@@ -3,6 +3,7 @@ from typing import List, Union, Tuple
 from matplotlib import pyplot as plt
 from geoproc.xext.xextension import XExtension
 from geoproc.plot.animation import SliceAnimation
+from geoproc.plot.pyramid import OverviewPyramid, PyramidImage
 from matplotlib.colors import LinearSegmentedColormap, Normalize
 
 @xr.register_dataarray_accessor('xplot')
@@ -13,6 +14,7 @@ class XPlot(XExtension):
         XExtension.__init__( self, xarray_obj )
 
     def animate(self, **kwargs ):
+        kwargs['pyramid'] = kwargs.get( 'pyramid', True )
         animation = SliceAnimation( self._obj, **kwargs )
         animation.show()
 
@@ -20,10 +22,14 @@ class XPlot(XExtension):
         figure, axes = plt.subplots( nrows, ncols )
         if vrange is None: vrange = ( self._obj[0].min(), self._obj[0].max() )
         norm = Normalize(vrange[0], vrange[1])
+        pyramid = OverviewPyramid( self._obj )
+        self._pyramid_images: List[PyramidImage] = []
         for ir in range(nrows):
             for ic in range(ncols):
                 iF = ic + ir* ncols
-                axes[ir,ic].imshow( self._obj[iF].values, cmap=cmap, norm=norm )
+                level = pyramid.level_for_extent( axes[ir,ic] )
+                image = axes[ir,ic].imshow( pyramid.frame( iF, level ), cmap=cmap, norm=norm, extent=pyramid.extent( level, True ) )
+                self._pyramid_images.append( PyramidImage( pyramid, image, level, iF, pixel_coords=True ) )
         plt.suptitle( self._obj.name )
         plt.show()
 
@@ -37,6 +43,7 @@ class XPlotDS:
     def animate(self, **kwargs ):
         vars = kwargs.get( "vars", self.get_data_vars() )
         data_arrays = [ self._dset[vname] for vname in vars ]
+        kwargs['pyramid'] = kwargs.get( 'pyramid', True )
         animation = SliceAnimation( data_arrays, **kwargs )
         animation.show()
 
@@ -54,13 +54,25 @@ class XRio(XExtension):
         return self._obj.sel(**sel_args)
 
     def clip(self, geodf: GeoDataFrame, **kwargs )-> xr.DataArray:
+        from geoproc.data.mask_cache import apply_mask
         cargs = argfilter( kwargs, all_touched = True, drop = True )
         mask_value = int( kwargs.pop( 'mask_value', 255  ) )
         self._obj.rio.set_nodata(mask_value)
-        result = self._obj.rio.clip( geodf.geometry.apply(mapping), geodf.crs, **cargs )
-        result.attrs['mask_value'] = mask_value
-        result.encoding = self._obj.encoding
-        return result
+        region_mask = self.region_mask( geodf, cargs['all_touched'] )
+        return apply_mask( self._obj, region_mask, mask_value, cargs['drop'] )
+
+    def region_mask(self, geodf: GeoDataFrame, all_touched: bool = True )-> np.ndarray:
+        """ Boolean [y,x] mask of the geodf geometries on this array's grid, rasterized once per ( geometry, transform, shape ) """
+        from geoproc.data.mask_cache import mask_cache, geometry_key, rasterize
+        from rioxarray.exceptions import NoDataInBounds
+        crs, transform, shape = self._obj.rio.crs, self._obj.rio.transform(), self._obj.shape[-2:]
+        def compute():
+            geometries = geodf if ( crs is None ) or ( geodf.crs is None ) else geodf.to_crs( crs )
+            return rasterize( list( geometries.geometry.values ), transform, shape, all_touched )
+        key = ( geometry_key( geodf.geometry.values, geodf.crs, crs, all_touched ), tuple( transform )[:6], tuple( shape ) )
+        region_mask = mask_cache.get( key, compute )
+        if not region_mask.any(): raise NoDataInBounds( "No data found in bounds." )
+        return region_mask
 
     @classmethod
     def print_array_dims( cls, filePaths: Union[ str, List[str] ], **kwargs ):